@@ -3,14 +3,64 @@
 pyinstaller spec file for claude workflow setup tool.
 
 builds standalone executable for mac, windows, linux.
+
+two build profiles, picked with $CLAUDE_SETUP_BUILD:
+
+    full (default)  onefile + upx, every pyside6 data file
+    slim            onedir without upx, only the qt modules and plugins
+                    the window uses - nothing to unpack or decompress at
+                    launch, for sub-second cold starts
+                    (measure with scripts/profile-startup.py)
 """
 
+import os
 import sys
-from pathlib import Path
+from pathlib import Path, PurePath
 from PyInstaller.utils.hooks import collect_data_files
 
 block_cipher = None
 
+build_profile = os.environ.get('CLAUDE_SETUP_BUILD', 'full')
+if build_profile not in ('full', 'slim'):
+    raise SystemExit(f"unknown CLAUDE_SETUP_BUILD: {build_profile} (full or slim)")
+slim = build_profile == 'slim'
+print(f"build profile: {build_profile}")
+
+# qt modules ClaudeSetupWindow never imports (it needs QtCore, QtGui and
+# QtWidgets only); excluded so their libraries stay out of the slim bundle
+unused_qt_modules = [
+    f'PySide6.{name}' for name in (
+        'Qt3DAnimation', 'Qt3DCore', 'Qt3DExtras', 'Qt3DInput', 'Qt3DLogic', 'Qt3DRender',
+        'QtBluetooth', 'QtCharts', 'QtConcurrent', 'QtDataVisualization', 'QtDBus',
+        'QtDesigner', 'QtGraphs', 'QtHelp', 'QtHttpServer', 'QtLocation', 'QtMultimedia',
+        'QtMultimediaWidgets', 'QtNetwork', 'QtNetworkAuth', 'QtNfc', 'QtOpenGL',
+        'QtOpenGLWidgets', 'QtPdf', 'QtPdfWidgets', 'QtPositioning', 'QtPrintSupport',
+        'QtQml', 'QtQuick', 'QtQuick3D', 'QtQuickControls2', 'QtQuickWidgets',
+        'QtRemoteObjects', 'QtScxml', 'QtSensors', 'QtSerialBus', 'QtSerialPort',
+        'QtSpatialAudio', 'QtSql', 'QtStateMachine', 'QtSvg', 'QtSvgWidgets', 'QtTest',
+        'QtTextToSpeech', 'QtUiTools', 'QtWebChannel', 'QtWebEngineCore',
+        'QtWebEngineQuick', 'QtWebEngineWidgets', 'QtWebSockets', 'QtXml',
+    )
+]
+
+# qt plugin directories a widgets window needs to start and look native
+qt_plugins_kept = {'platforms', 'platformthemes', 'styles', 'xcbglintegrations'}
+
+
+def qt_needed(entry) -> bool:
+    """false for qt plugins, translations and qml the slim bundle leaves out."""
+    parts = PurePath(entry[0]).parts
+    if 'PySide6' not in parts:
+        return True
+    rest = parts[parts.index('PySide6') + 1:]
+    if rest[:1] == ('Qt',):
+        rest = rest[1:]
+    if rest[:1] in (('translations',), ('qml',)):
+        return False
+    if rest[:1] == ('plugins',) and len(rest) > 2:
+        return rest[1] in qt_plugins_kept
+    return True
+
 # determine icon path based on platform
 if sys.platform == 'darwin':
     # macos
@@ -28,12 +78,36 @@ if icon_path and not Path(icon_path).exists():
     print("run: python3 scripts/convert-icon.py")
     icon_path = None
 
-# collect pyside6 data files
-pyside6_datas = collect_data_files('PySide6')
+# collect pyside6 data files; the slim build relies on pyinstaller's
+# pyside6 hooks for the plugins the imported modules need
+pyside6_datas = [] if slim else collect_data_files('PySide6')
 
-# include .claude/ folder in the bundle
+# precompute the .claude/ content manifest so the app can verify
+# deploys without re-walking the tree, and pack .claude/ into a single
+# compressed file so onefile launches unpack one file instead of the
+# whole tree
+sys.path.insert(0, SPECPATH)
+from claude_setup import MANIFEST_NAME, PACK_NAME, pack_claude_folder, write_manifest
+
+manifest_path = Path(SPECPATH) / 'build' / MANIFEST_NAME
+manifest = write_manifest(
+    Path('.claude'),
+    manifest_path,
+    version=Path('version.txt').read_text().strip(),
+)
+print(f"manifest: {len(manifest.entries)} files, digest {manifest.digest}")
+
+pack_path = Path(SPECPATH) / 'build' / PACK_NAME
+pack_claude_folder(Path('.claude'), pack_path)
+print(f"pack: {pack_path.stat().st_size} bytes")
+
+# include .claude/ pack and its manifest in the bundle
 # (source, destination_in_bundle)
-claude_datas = [('.claude', '.claude')]
+claude_datas = [
+    (str(pack_path), '.'),
+    (str(manifest_path), '.'),
+    ('install-profiles.json', '.'),
+]
 
 a = Analysis(
     ['claude_setup.py'],
@@ -44,33 +118,33 @@ a = Analysis(
         'PySide6.QtCore',
         'PySide6.QtGui',
         'PySide6.QtWidgets',
+        # imported lazily by claude_setup.main()
+        'claude_setup_gui',
     ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=(unused_qt_modules + ['tkinter']) if slim else [],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
     noarchive=False,
 )
 
+if slim:
+    a.binaries = [entry for entry in a.binaries if qt_needed(entry)]
+    a.datas = [entry for entry in a.datas if qt_needed(entry)]
+
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
+exe_options = dict(
     name='claude-workflow-setup',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # upx-compressed qt libraries are decompressed on every launch
+    upx=not slim,
     upx_exclude=[],
-    runtime_tmpdir=None,
     console=False,  # no console window
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -80,9 +154,34 @@ exe = EXE(
     icon=icon_path,  # platform-specific icon
 )
 
+if slim:
+    # onedir: libraries are loaded in place instead of unpacked to a temp dir
+    exe = EXE(pyz, a.scripts, [], exclude_binaries=True, **exe_options)
+    bundled = COLLECT(
+        exe,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        strip=False,
+        upx=False,
+        name='claude-workflow-setup',
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        [],
+        runtime_tmpdir=None,
+        **exe_options,
+    )
+    bundled = exe
+
 # macos app bundle
 app = BUNDLE(
-    exe,
+    bundled,
     name='Claude Workflow Setup.app',
     icon=icon_path if sys.platform == 'darwin' else None,
     bundle_identifier='com.claude-code.workflow-setup',
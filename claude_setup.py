@@ -2,26 +2,278 @@
 """
 claude workflow setup tool.
 
-gui application to copy .claude/ folder (commands, skills, hooks, settings)
-to new or existing project directories.
+copies the .claude/ folder (commands, skills, hooks, settings) to new or
+existing project directories. this module holds the copy engine and the
+headless commands and does not import qt; the gui lives in
+claude_setup_gui.py and is only loaded when the window is requested.
 """
 
 from __future__ import annotations
 
+import abc
+import argparse
+import atexit
+import calendar
+import errno
+import filecmp
+import fnmatch
+import functools
+import hashlib
+import heapq
+import json
+import os
+import re
+import shlex
 import shutil
+import sqlite3
+import stat
+import struct
 import sys
-from pathlib import Path
-
-from PySide6.QtWidgets import (
-    QApplication,
-    QFileDialog,
-    QLabel,
-    QMainWindow,
-    QMessageBox,
-    QPushButton,
-    QVBoxLayout,
-    QWidget,
-)
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Callable, Iterator
+
+
+# env var naming a trace file; enables tracing for the gui and every command
+PROFILE_ENV = "CLAUDE_SETUP_PROFILE"
+
+# slowest files kept per phase in a trace
+HOTSPOT_COUNT = 5
+
+
+class PhaseStats:
+    """
+    counters a traced phase fills in while it runs.
+
+    a disabled phase (tracing off) accepts the same calls and does nothing
+    with them, so instrumented code does not need to branch.
+    """
+
+    __slots__ = ("enabled", "args", "files", "bytes", "_hotspots", "_lock")
+
+    def __init__(self, enabled: bool, args: dict[str, object]) -> None:
+        self.enabled = enabled
+        self.args = args
+        self.files = 0
+        self.bytes = 0
+        self._hotspots: list[tuple[float, str]] = []
+        # add() is called from copy worker threads
+        self._lock = threading.Lock()
+
+    def clock(self) -> float:
+        """start time for add(); free when tracing is off."""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def add(self, path: str, size: int, started: float = 0.0) -> None:
+        """count one processed file, timed from started if given."""
+        item = (time.perf_counter() - started, path) if self.enabled and started else None
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+            if item is None:
+                return
+            if len(self._hotspots) < HOTSPOT_COUNT:
+                heapq.heappush(self._hotspots, item)
+            elif item > self._hotspots[0]:
+                heapq.heapreplace(self._hotspots, item)
+
+    @property
+    def hotspots(self) -> list[dict[str, object]]:
+        """slowest files of the phase, slowest first."""
+        return [
+            {"path": path, "seconds": round(seconds, 6)}
+            for seconds, path in sorted(self._hotspots, reverse=True)
+        ]
+
+
+class Tracer:
+    """
+    records timed phases as json lines or a chrome trace.
+
+    a path ending in .json gets the chrome trace event format (open it in
+    chrome://tracing or perfetto), anything else gets one json object per
+    line, written as each phase ends.
+    """
+
+    def __init__(self, path: Path, fmt: str | None = None) -> None:
+        self.path = path
+        self.format = fmt or ("chrome" if path.suffix == ".json" else "jsonl")
+        if self.format not in ("chrome", "jsonl"):
+            raise ValueError(f"unknown trace format: {self.format}")
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._events: list[dict[str, object]] = []
+        self._threads: dict[int, str] = {}
+        self._file = open(path, "w") if self.format == "jsonl" else None
+        # phase name -> count, total wall time and total wait time
+        self.totals: dict[str, dict[str, float]] = {}
+
+    def record(
+        self, name: str, started: float, elapsed: float, cpu: float, stats: PhaseStats
+    ) -> None:
+        """add one finished phase (thread safe)."""
+        thread = threading.current_thread()
+        args = dict(stats.args)
+        args.update(
+            files=stats.files, bytes=stats.bytes, cpu=round(cpu, 6),
+            # wall time not spent on cpu: blocked in syscalls or on locks
+            wait=round(max(elapsed - cpu, 0.0), 6),
+        )
+        if stats.hotspots:
+            args["hotspots"] = stats.hotspots
+
+        with self._lock:
+            total = self.totals.setdefault(name, {"count": 0, "elapsed": 0.0, "wait": 0.0})
+            total["count"] += 1
+            total["elapsed"] += elapsed
+            total["wait"] += args["wait"]  # type: ignore[operator]
+
+            if self._file is not None:
+                event = {
+                    "name": name,
+                    "start": round(started - self._origin, 6),
+                    "elapsed": round(elapsed, 6),
+                    "thread": thread.name,
+                    **args,
+                }
+                self._file.write(json.dumps(event) + "\n")
+                self._file.flush()
+            else:
+                self._threads.setdefault(thread.ident or 0, thread.name)
+                self._events.append({
+                    "name": name,
+                    "ph": "X",
+                    "ts": round((started - self._origin) * 1e6, 1),
+                    "dur": round(elapsed * 1e6, 1),
+                    "pid": os.getpid(),
+                    "tid": thread.ident or 0,
+                    "args": args,
+                })
+
+    def close(self) -> None:
+        """write the chrome trace file or close the json lines file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                return
+            names = [
+                {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                 "args": {"name": name}}
+                for tid, name in self._threads.items()
+            ]
+            self.path.write_text(json.dumps({"traceEvents": names + self._events}) + "\n")
+
+
+_tracer: Tracer | None = None
+
+
+def start_trace(path: Path, fmt: str | None = None) -> Tracer:
+    """
+    start recording phases to path; stop_trace() (or exit) writes it out.
+
+    args:
+        path: output file; .json selects a chrome trace, else json lines
+        fmt: "chrome" or "jsonl" to override the choice by extension
+    """
+    global _tracer
+    stop_trace()
+    _tracer = Tracer(path, fmt)
+    atexit.register(stop_trace)
+    return _tracer
+
+
+def stop_trace() -> None:
+    """stop tracing and flush the trace file, if tracing is active."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+
+
+def start_trace_from_env() -> Tracer | None:
+    """start tracing to $CLAUDE_SETUP_PROFILE, if set and not already tracing."""
+    path = os.environ.get(PROFILE_ENV)
+    if not path or _tracer is not None:
+        return _tracer
+    return start_trace(Path(path))
+
+
+# when set, the app records startup milestones, writes them to this json
+# file and quits once the first window is up (see scripts/profile-startup.py)
+STARTUP_ENV = "CLAUDE_SETUP_STARTUP"
+
+_startup_marks: dict[str, float] = {}
+
+
+def mark_startup(name: str) -> None:
+    """record the wall time a startup milestone was first reached, if profiling."""
+    if STARTUP_ENV in os.environ:
+        _startup_marks.setdefault(name, time.time())
+
+
+def write_startup_report() -> bool:
+    """
+    write the recorded milestones to $CLAUDE_SETUP_STARTUP.
+
+    in a onefile build the bootloader unpacks the bundle into a fresh
+    _MEI* directory before python starts; the newest mtime in it is
+    reported as "extracted", when unpacking finished.
+
+    returns:
+        true if a report was written, i.e. the app should quit now
+    """
+    path = os.environ.get(STARTUP_ENV)
+    if not path:
+        return False
+
+    marks = dict(_startup_marks)
+    bundle = getattr(sys, "_MEIPASS", None)
+    if bundle and Path(bundle).name.startswith("_MEI"):
+        marks["extracted"] = max(
+            os.lstat(os.path.join(dirpath, name)).st_mtime
+            for dirpath, _, names in os.walk(bundle) for name in names
+        )
+    Path(path).write_text(json.dumps({
+        "marks": marks,
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "modules": len(sys.modules),
+    }, indent=2) + "\n")
+    return True
+
+
+@contextmanager
+def trace_phase(name: str, **args: object) -> Iterator[PhaseStats]:
+    """
+    time a deploy phase (validate, copy, remove, verify, ...).
+
+    yields a PhaseStats for the block to count files and bytes into.
+    records wall time, thread cpu time and the slowest files when tracing
+    is active; costs next to nothing otherwise.
+    """
+    tracer = _tracer
+    stats = PhaseStats(tracer is not None, args)
+    if tracer is None:
+        yield stats
+        return
+
+    started = time.perf_counter()
+    cpu_started = time.thread_time()
+    try:
+        yield stats
+    except BaseException as e:
+        stats.args["error"] = type(e).__name__
+        raise
+    finally:
+        tracer.record(
+            name, started, time.perf_counter() - started,
+            time.thread_time() - cpu_started, stats,
+        )
 
 
 def get_source_claude_dir() -> Path:
@@ -53,356 +305,4738 @@ def get_source_claude_dir() -> Path:
     return claude_dir
 
 
+def get_source() -> Path:
+    """
+    locate what to deploy from: the bundled pack if present, else .claude/.
+
+    a frozen build ships .claude/ as a single compressed pack (see
+    pack_claude_folder), which is streamed straight into targets.
+
+    returns:
+        path to the pack file or the .claude/ directory
+
+    raises:
+        FileNotFoundError: if neither is found
+    """
+    if getattr(sys, 'frozen', False):
+        pack = Path(sys._MEIPASS) / PACK_NAME
+        if pack.exists():
+            return cached_bundle(pack, get_source_manifest()) or pack
+
+    return get_source_claude_dir()
+
+
+BUNDLE_CACHE_NAME = "bundle"
+
+
+def cached_bundle(pack: Path, manifest: Manifest | None) -> Path | None:
+    """
+    the bundled pack extracted to a directory that later launches reuse.
+
+    keyed by the manifest's version and digest, so each build is
+    extracted once. afterwards the app and deploys read a plain
+    directory, and can reflink or copy_file_range from it instead of
+    inflating the pack. a cache whose metadata signature changed is
+    extracted again; caches of other builds are removed.
+
+    returns:
+        path to the cached .claude/ directory, or None without a
+        manifest or if the cache cannot be written
+    """
+    if manifest is None:
+        return None
+    root = get_state_dir() / BUNDLE_CACHE_NAME
+    key = f"{manifest.version or 'dev'}-{manifest.digest[:16]}"
+    claude_dir = root / key / ".claude"
+    signature = root / key / "signature"
+
+    with trace_phase("bundle_cache", key=key) as phase:
+        try:
+            if signature.read_text() == deployed_signature(claude_dir):
+                phase.args["hit"] = True
+                return claude_dir
+        except OSError:
+            pass
+
+        phase.args["hit"] = False
+        try:
+            if not copy_claude_folder(
+                pack, root / key, overwrite=True, manifest=manifest, background_cleanup=False
+            ):
+                return None
+            signature.write_text(deployed_signature(claude_dir))
+            for other in root.iterdir():
+                if other.name != key:
+                    _remove_path(other)
+        except (OSError, shutil.Error, ValueError):
+            return None
+    return claude_dir
+
+
 def validate_target_dir(target: Path) -> tuple[bool, str]:
     """
     check if target directory is valid for copying.
 
+    always proves writability with a probe file: this guards a single
+    deploy, where one file is cheap and os.access can be wrong (acls,
+    read-only bind mounts, root squash).
+
     args:
         target: path to target directory
 
     returns:
         (is_valid, message) - validation result and descriptive message
     """
+    with trace_phase("validate", target=str(target)):
+        result = preflight_target(target, probe="always")
+        return result.ok, result.message
+
+
+# filesystems where permission bits can't be trusted locally, so preflight
+# still proves writability with a probe file
+NETWORK_FILESYSTEMS = frozenset({
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs",
+    "fuse.sshfs", "fuse.rclone", "fuse.s3fs", "davfs", "lustre", "gpfs",
+})
+
+
+# seconds a parsed mount table is reused: long enough for one batch
+# preflight over thousands of targets, short enough that a long-running
+# watch sees mounts come and go
+MOUNT_TABLE_TTL = 5.0
+
+_mounts: tuple[float, tuple[tuple[str, str], ...]] | None = None
+
+
+def _mount_table() -> tuple[tuple[str, str], ...]:
+    """(mount point, fs type) pairs from /proc/self/mounts, longest first."""
+    global _mounts
+    now = time.monotonic()
+    if _mounts is not None and now - _mounts[0] < MOUNT_TABLE_TTL:
+        return _mounts[1]
+    try:
+        lines = Path("/proc/self/mounts").read_text().splitlines()
+    except OSError:
+        lines = []
+    mounts = []
+    for line in lines:
+        fields = line.split()
+        if len(fields) >= 3:
+            # mount points escape spaces as \040
+            mounts.append((fields[1].replace("\\040", " "), fields[2]))
+    table = tuple(sorted(mounts, key=lambda m: len(m[0]), reverse=True))
+    _mounts = (now, table)
+    return table
+
+
+def filesystem_type(path: Path) -> str:
+    """filesystem type holding path (linux), "unknown" elsewhere."""
+    resolved = os.path.realpath(path)
+    for mount_point, fstype in _mount_table():
+        if resolved == mount_point or resolved.startswith(mount_point.rstrip("/") + "/"):
+            return fstype
+    return "unknown"
+
+
+@dataclass
+class PreflightResult:
+    """whether one target can take a deploy, and why not."""
+
+    target: str
+    verdict: str  # "ok", "invalid", "read-only", "no-access" or "no-space"
+    message: str
+    fs: str = "unknown"
+    free_bytes: int | None = None
+    required_bytes: int | None = None
+    probed: bool = False
+
+    @property
+    def ok(self) -> bool:
+        """true if a deploy to this target is expected to succeed."""
+        return self.verdict == "ok"
+
+
+def _probe_writable(directory: Path) -> str | None:
+    """create and delete a probe file; return an error message on failure."""
+    # unique name so concurrent validations of one parent don't collide
+    test_file = directory / f".write_test-{os.getpid()}-{threading.get_ident()}"
+    try:
+        test_file.touch()
+        test_file.unlink()
+    except OSError as e:
+        return f"no write permission: {e}"
+    return None
+
+
+def _preflight(
+    target: Path,
+    tree: SourceTree | None,
+    probe: str,
+    footprint: Callable[[int], int] | None = None,
+) -> PreflightResult:
+    """preflight_target() body; footprint overrides tree.disk_footprint."""
+    result = PreflightResult(str(target), "ok", "valid target directory")
+
     # check if parent exists (for new folder creation)
     if not target.exists():
         parent = target.parent
         if not parent.exists():
-            return False, f"parent directory does not exist: {parent}"
+            return replace(
+                result, verdict="invalid",
+                message=f"parent directory does not exist: {parent}",
+            )
         if not parent.is_dir():
-            return False, f"parent path is not a directory: {parent}"
-
-    # check if target exists and is a directory
-    if target.exists() and not target.is_dir():
-        return False, f"target path exists but is not a directory: {target}"
+            return replace(
+                result, verdict="invalid",
+                message=f"parent path is not a directory: {parent}",
+            )
+        check_path = parent
+    elif not target.is_dir():
+        return replace(
+            result, verdict="invalid",
+            message=f"target path exists but is not a directory: {target}",
+        )
+    else:
+        check_path = target
 
-    # check write permissions on target or parent
-    check_path = target if target.exists() else target.parent
-    if not check_path.exists():
-        return False, f"cannot access directory: {check_path}"
+    result.fs = filesystem_type(check_path)
 
-    # attempt to verify write permissions
+    # one statvfs answers read-only, free space and free inodes
+    block_size, free_inodes, read_only = 4096, None, False
     try:
-        test_file = check_path / ".write_test"
-        test_file.touch()
-        test_file.unlink()
-    except (OSError, PermissionError) as e:
-        return False, f"no write permission: {e}"
+        if hasattr(os, "statvfs"):
+            vfs = os.statvfs(check_path)
+            block_size = vfs.f_frsize or vfs.f_bsize or block_size
+            result.free_bytes = vfs.f_bavail * block_size
+            read_only = bool(vfs.f_flag & os.ST_RDONLY)
+            # f_files == 0 means the filesystem doesn't count inodes
+            free_inodes = vfs.f_favail if vfs.f_files else None
+        else:
+            result.free_bytes = shutil.disk_usage(check_path).free
+    except OSError as e:
+        return replace(
+            result, verdict="no-access",
+            message=f"cannot access directory: {check_path} ({e})",
+        )
+
+    if read_only:
+        return replace(
+            result, verdict="read-only", message=f"read-only filesystem: {check_path}"
+        )
+
+    if not os.access(check_path, os.W_OK | os.X_OK):
+        return replace(
+            result, verdict="no-access", message=f"no write permission: {check_path}"
+        )
+
+    # permission bits only tell the truth locally; prove it elsewhere
+    if probe == "always" or (
+        probe == "auto"
+        and (result.fs in NETWORK_FILESYSTEMS or not hasattr(os, "statvfs"))
+    ):
+        result.probed = True
+        error = _probe_writable(check_path)
+        if error is not None:
+            return replace(result, verdict="no-access", message=error)
+
+    if tree is not None:
+        result.required_bytes = (footprint or tree.disk_footprint)(block_size)
+        if result.free_bytes is not None and result.free_bytes < result.required_bytes:
+            return replace(
+                result, verdict="no-space",
+                message=f"not enough free space: need {result.required_bytes} bytes, "
+                        f"{result.free_bytes} available",
+            )
+        needed_inodes = len(tree.files) + len(tree.dirs) + 1
+        if free_inodes is not None and free_inodes < needed_inodes:
+            return replace(
+                result, verdict="no-space",
+                message=f"not enough free inodes: need {needed_inodes}, {free_inodes} available",
+            )
 
-    return True, "valid target directory"
+    return result
 
 
-def copy_claude_folder(source: Path, target: Path, overwrite: bool = False) -> bool:
+def preflight_target(
+    target: Path, tree: SourceTree | None = None, probe: str = "always"
+) -> PreflightResult:
     """
-    copy .claude/ folder to target directory.
+    check that target can take a deploy.
+
+    uses stat, statvfs and a probe file. with probe="auto" the probe file
+    is only created on network filesystems, where permission bits can't
+    be trusted locally, or on platforms without statvfs, and os.access
+    decides elsewhere; that shortcut is meant for preflight_many().
 
     args:
-        source: source .claude/ directory
-        target: target project directory
-        overwrite: if true, overwrite existing .claude/ folder
+        target: target project directory (may not exist yet)
+        tree: source snapshot; if given, free space and inodes are checked
+            against what a full staged copy of it needs
+        probe: "always", "auto" or "never" create the probe file
 
     returns:
-        true if copy successful, false otherwise
+        verdict for this target
+    """
+    if probe not in ("auto", "always", "never"):
+        raise ValueError(f"unknown probe mode: {probe}")
+    return _preflight(target, tree, probe)
 
-    raises:
-        FileExistsError: if target/.claude/ exists and overwrite=False
+
+def preflight_many(
+    targets: list[Path],
+    source: Path | SourceTree | None = None,
+    jobs: int = 32,
+    probe: str = "auto",
+) -> list[PreflightResult]:
     """
-    target_claude = target / ".claude"
+    preflight many targets concurrently.
 
-    # check if .claude/ already exists in target
-    if target_claude.exists():
-        if not overwrite:
-            raise FileExistsError(
-                f".claude/ already exists in {target}\n"
-                "use overwrite=True to replace it"
-            )
-        # remove existing .claude/ folder
-        shutil.rmtree(target_claude)
+    the checks are metadata-only and mostly wait on the filesystem, so a
+    wide thread pool pays off on network mounts.
 
-    # copy .claude/ folder to target
-    shutil.copytree(source, target_claude)
+    args:
+        targets: target project directories
+        source: optional source .claude/ directory, pack file or snapshot,
+            for the free-space check
+        jobs: maximum number of concurrent checks
+        probe: "auto" (default), "always" or "never" create the probe file,
+            see preflight_target
 
-    # verify copy succeeded
-    if not target_claude.exists():
-        return False
+    returns:
+        verdicts in the same order as targets
+    """
+    if probe not in ("auto", "always", "never"):
+        raise ValueError(f"unknown probe mode: {probe}")
 
-    # verify key files exist
-    required_files = [
-        target_claude / "settings.json",
-        target_claude / "commands",
-        target_claude / "skills",
-        target_claude / "hooks",
-    ]
+    def run(tree: SourceTree | None) -> list[PreflightResult]:
+        # the footprint only depends on the block size, compute it once per size
+        footprint = functools.lru_cache(maxsize=None)(tree.disk_footprint) if tree else None
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            return list(pool.map(
+                lambda target: _preflight(target, tree, probe, footprint), targets
+            ))
 
-    for required in required_files:
-        if not required.exists():
-            return False
+    if source is None:
+        return run(None)
+    with _opened(source) as tree:
+        return run(tree)
 
-    return True
 
+class CopyCancelled(Exception):
+    """raised when a copy is cancelled; the target is left unchanged."""
 
-class ClaudeSetupWindow(QMainWindow):
-    """main window for claude workflow setup tool."""
 
-    def __init__(self) -> None:
-        """initialize the setup window."""
-        super().__init__()
+@dataclass
+class CopyProgress:
+    """file-level progress of a running copy."""
 
-        self.source_claude_dir: Path | None = None
+    files_done: int = 0
+    files_total: int = 0
+    bytes_done: int = 0
+    bytes_total: int = 0
+    current: str = ""
+    elapsed: float = 0.0
 
-        # attempt to locate source .claude/ folder
-        try:
-            self.source_claude_dir = get_source_claude_dir()
-        except FileNotFoundError as e:
-            QMessageBox.critical(
-                self,
-                "Error",
-                f"failed to locate .claude/ folder:\n\n{e}",
-            )
-            sys.exit(1)
-
-        self.init_ui()
-
-    def init_ui(self) -> None:
-        """initialize user interface components."""
-        self.setWindowTitle("claude workflow setup")
-        self.setMinimumWidth(500)
-
-        # create central widget and layout
-        central_widget = QWidget()
-        self.setCentralWidget(central_widget)
-        layout = QVBoxLayout(central_widget)
-
-        # title label
-        title = QLabel("claude workflow setup")
-        title.setStyleSheet("font-size: 18px; font-weight: bold; margin: 10px;")
-        layout.addWidget(title)
-
-        # description label
-        description = QLabel(
-            "copy .claude/ folder (commands, skills, hooks, settings)\n"
-            "to a new or existing project directory.\n\n"
-            "the .claude/ folder contains:\n"
-            "• 31 slash commands for development tasks\n"
-            "• 3 ai skills (pydev-workflow, pydev-feature, project-audit)\n"
-            "• automation hooks for formatting and git setup\n"
-            "• project settings"
-        )
-        description.setWordWrap(True)
-        description.setStyleSheet("margin: 10px; color: #666;")
-        layout.addWidget(description)
-
-        # source folder info
-        source_info = QLabel(f"source: {self.source_claude_dir}")
-        source_info.setStyleSheet("margin: 10px; font-family: monospace; color: #333;")
-        layout.addWidget(source_info)
-
-        # button: select existing folder
-        select_btn = QPushButton("select existing project folder")
-        select_btn.clicked.connect(self.select_existing_folder)
-        select_btn.setMinimumHeight(40)
-        layout.addWidget(select_btn)
-
-        # button: create new folder
-        create_btn = QPushButton("create new project folder")
-        create_btn.clicked.connect(self.create_new_folder)
-        create_btn.setMinimumHeight(40)
-        layout.addWidget(create_btn)
-
-        # status label
-        self.status_label = QLabel("")
-        self.status_label.setWordWrap(True)
-        self.status_label.setStyleSheet("margin: 10px; padding: 10px;")
-        layout.addWidget(self.status_label)
-
-        layout.addStretch()
-
-    def select_existing_folder(self) -> None:
-        """handle select existing folder button click."""
-        folder = QFileDialog.getExistingDirectory(
-            self,
-            "select project folder",
-            str(Path.home()),
-            QFileDialog.Option.ShowDirsOnly,
-        )
+    @property
+    def throughput(self) -> float:
+        """bytes per second so far."""
+        return self.bytes_done / self.elapsed if self.elapsed > 0 else 0.0
 
-        if folder:
-            self.copy_to_target(Path(folder))
 
-    def create_new_folder(self) -> None:
-        """handle create new folder button click."""
-        folder = QFileDialog.getExistingDirectory(
-            self,
-            "select parent directory for new project",
-            str(Path.home()),
-            QFileDialog.Option.ShowDirsOnly,
+class _ProgressTracker:
+    """counts files and bytes, reports progress and honours cancellation."""
+
+    def __init__(
+        self,
+        files: list[SourceFile],
+        callback: Callable[[CopyProgress], None] | None,
+        cancel: threading.Event | None,
+    ) -> None:
+        self.state = CopyProgress(
+            files_total=len(files),
+            bytes_total=sum(entry.size for entry in files),
         )
+        self.callback = callback
+        self.cancel = cancel
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
 
-        if not folder:
-            return
+    def check_cancel(self) -> None:
+        """raise CopyCancelled if cancellation was requested."""
+        if self.cancel is not None and self.cancel.is_set():
+            raise CopyCancelled("copy cancelled")
 
-        # prompt for new folder name
-        from PySide6.QtWidgets import QInputDialog
+    def step(self, rel: str, size: int) -> None:
+        """record one processed file; safe to call from copy worker threads."""
+        self.check_cancel()
+        with self._lock:
+            self.state.files_done += 1
+            self.state.bytes_done += size
+            self.state.current = rel
+            self.state.elapsed = time.perf_counter() - self.start
+            if self.callback is not None:
+                self.callback(replace(self.state))
 
-        name, ok = QInputDialog.getText(
-            self,
-            "new project folder",
-            "enter project folder name:",
-        )
 
-        if ok and name:
-            new_folder = Path(folder) / name
-            try:
-                new_folder.mkdir(parents=True, exist_ok=False)
-                self.copy_to_target(new_folder)
-            except FileExistsError:
-                QMessageBox.warning(
-                    self,
-                    "folder exists",
-                    f"folder already exists: {new_folder}\n\n"
-                    "use 'select existing folder' instead.",
-                )
-            except (OSError, PermissionError) as e:
-                QMessageBox.critical(
-                    self,
-                    "error",
-                    f"failed to create folder:\n\n{e}",
-                )
+# errnos meaning "this strategy does not work here" rather than a real failure
+_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.ENOTTY,
+    errno.EPERM,
+    errno.EMLINK,
+}
+
+# linux FICLONE ioctl (_IOW(0x94, 9, int)), supported by btrfs, xfs, bcachefs
+_FICLONE = 0x40049409
 
-    def copy_to_target(self, target: Path) -> None:
-        """
-        copy .claude/ folder to target directory.
 
+def _copy_reflink(src: Path, dst: Path) -> None:
+    """copy-on-write clone: FICLONE on linux, clonefile(2) on macos."""
+    if sys.platform == "darwin":
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(dst))
+    elif sys.platform.startswith("linux"):
+        import fcntl
+
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+    else:
+        raise OSError(errno.EOPNOTSUPP, "reflink not supported on this platform")
+    shutil.copystat(src, dst)
+
+
+def _copy_file_range(src: Path, dst: Path) -> None:
+    """in-kernel copy with os.copy_file_range (linux)."""
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range not available")
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+    shutil.copystat(src, dst)
+
+
+def _copy_hardlink(src: Path, dst: Path) -> None:
+    """share the source inode; only safe when targets are never edited."""
+    os.link(src, dst)
+
+
+def _copy_plain(src: Path, dst: Path) -> None:
+    """regular copy (shutil uses sendfile/fcopyfile internally where it can)."""
+    shutil.copy2(src, dst)
+
+
+_COPY_FUNCS: dict[str, Callable[[Path, Path], None]] = {
+    "reflink": _copy_reflink,
+    "copy_file_range": _copy_file_range,
+    "hardlink": _copy_hardlink,
+    "copy": _copy_plain,
+}
+
+# strategy name -> functions tried in order, plain copy always last
+COPY_STRATEGIES: dict[str, tuple[str, ...]] = {
+    "auto": ("reflink", "copy_file_range", "copy"),
+    "reflink": ("reflink", "copy"),
+    "copy_file_range": ("copy_file_range", "copy"),
+    "hardlink": ("hardlink", "copy"),
+    "copy": ("copy",),
+}
+
+
+class FileCopier:
+    """
+    copies single files with the fastest strategy that works.
+
+    a strategy that fails with an "unsupported" errno is disabled for the
+    rest of the copier's life, so the probe cost is paid once per deploy.
+    `used` counts how many files each strategy actually copied.
+    """
+
+    def __init__(self, strategy: str = "auto") -> None:
+        """
         args:
-            target: target project directory
+            strategy: one of COPY_STRATEGIES. "hardlink" is opt-in only,
+                for read-only installs - edits in the target would change
+                the source.
+
+        raises:
+            ValueError: if strategy is unknown
         """
-        # validate target directory
-        is_valid, message = validate_target_dir(target)
-        if not is_valid:
-            self.status_label.setText(f"❌ error: {message}")
-            self.status_label.setStyleSheet(
-                "margin: 10px; padding: 10px; background-color: #ffebee; color: #c62828;"
+        if strategy not in COPY_STRATEGIES:
+            raise ValueError(
+                f"unknown copy strategy: {strategy} "
+                f"(choose from {', '.join(COPY_STRATEGIES)})"
             )
-            QMessageBox.critical(self, "invalid target", message)
-            return
+        self.strategy = strategy
+        self.chain = list(COPY_STRATEGIES[strategy])
+        self.disabled: set[str] = set()
+        self.used: dict[str, int] = {}
+        self._lock = threading.Lock()
 
-        # check if .claude/ already exists
-        target_claude = target / ".claude"
-        overwrite = False
-
-        if target_claude.exists():
-            reply = QMessageBox.question(
-                self,
-                "folder exists",
-                f".claude/ folder already exists in:\n{target}\n\n"
-                "do you want to overwrite it?",
-                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-                QMessageBox.StandardButton.No,
-            )
+    def copy(self, src: Path, dst: Path) -> str:
+        """
+        copy src to dst (which must not exist yet), preserving mode and times.
 
-            if reply == QMessageBox.StandardButton.No:
-                self.status_label.setText("❌ cancelled - .claude/ folder already exists")
-                self.status_label.setStyleSheet(
-                    "margin: 10px; padding: 10px; background-color: #fff3e0; color: #e65100;"
-                )
-                return
+        returns:
+            name of the strategy that succeeded
+        """
+        for name in self.chain:
+            if name in self.disabled:
+                continue
+            try:
+                _COPY_FUNCS[name](src, dst)
+            except OSError as e:
+                if name == "copy" or e.errno not in _UNSUPPORTED_ERRNOS:
+                    raise
+                self.disabled.add(name)
+                if dst.exists() or dst.is_symlink():
+                    dst.unlink()
+                continue
+            self.record(name)
+            return name
+        raise AssertionError("plain copy is always in the chain")
 
-            overwrite = True
+    def record(self, name: str) -> None:
+        """count one file copied by strategy `name`."""
+        with self._lock:
+            self.used[name] = self.used.get(name, 0) + 1
 
-        # copy .claude/ folder
-        try:
-            print(f"\n[DEBUG] copying from: {self.source_claude_dir}")
-            print(f"[DEBUG] copying to: {target}")
-            print(f"[DEBUG] target .claude/ will be at: {target_claude}")
-
-            success = copy_claude_folder(
-                self.source_claude_dir,  # type: ignore
-                target,
-                overwrite=overwrite,
-            )
+    @property
+    def summary(self) -> str:
+        """strategies used, most files first, e.g. "reflink" or "reflink+copy"."""
+        ranked = sorted(self.used.items(), key=lambda item: -item[1])
+        return "+".join(name for name, _ in ranked) or "none"
 
-            print(f"[DEBUG] copy success: {success}")
-            if success:
-                print(f"[DEBUG] verifying .claude/ exists at: {target_claude}")
-                print(f"[DEBUG] exists: {target_claude.exists()}")
-                if target_claude.exists():
-                    files = list(target_claude.rglob("*"))
-                    print(f"[DEBUG] total items in .claude/: {len(files)}")
-                    print(f"[DEBUG] first 10 items:")
-                    for f in files[:10]:
-                        print(f"[DEBUG]   - {f.relative_to(target_claude)}")
-
-            if success:
-                # build detailed success message with file list
-                target_claude = target / ".claude"
-                file_count = sum(1 for _ in target_claude.rglob("*") if _.is_file())
-
-                self.status_label.setText(
-                    f"✅ success!\n\n"
-                    f".claude/ folder copied to:\n{target}/.claude\n\n"
-                    f"copied {file_count} files\n\n"
-                    f"your project now has:\n"
-                    f"• 31 slash commands\n"
-                    f"• 3 ai skills (pydev-workflow, pydev-feature, project-audit)\n"
-                    f"• automation hooks for formatting and git setup\n\n"
-                    f"note: .claude is a hidden folder\n"
-                    f"press cmd+shift+. in finder to view hidden files"
-                )
-                self.status_label.setStyleSheet(
-                    "margin: 10px; padding: 10px; background-color: #e8f5e9; color: #2e7d32;"
-                )
 
-                # show success dialog with option to open folder
-                msg = QMessageBox(self)
-                msg.setIcon(QMessageBox.Icon.Information)
-                msg.setWindowTitle("success")
-                msg.setText(
-                    f"claude workflow setup complete!\n\n"
-                    f".claude/ folder copied to:\n{target}\n\n"
-                    f"copied {file_count} files\n\n"
-                    f"includes: 31 commands, 3 skills, automation hooks\n\n"
-                    f"note: .claude is a HIDDEN folder (starts with .)\n"
-                    f"in finder: press cmd+shift+. to show hidden files"
-                )
-                msg.setStandardButtons(
-                    QMessageBox.StandardButton.Ok | QMessageBox.StandardButton.Open
-                )
-                msg.button(QMessageBox.StandardButton.Open).setText("open folder")
+class SourceFile:
+    """one entry (file or directory) of a source tree."""
+
+    __slots__ = ("path", "size", "mode", "mtime_ns")
+
+    def __init__(self, path: str, size: int, mode: int, mtime_ns: int) -> None:
+        self.path = path  # relative posix path under .claude/
+        self.size = size
+        self.mode = mode  # full st_mode, including file type bits
+        self.mtime_ns = mtime_ns
+
+    def __repr__(self) -> str:
+        return f"SourceFile({self.path!r}, size={self.size}, mode={self.mode:o})"
+
+
+# top-level entries every deployable .claude/ tree must have
+REQUIRED_ENTRIES = ("settings.json", "commands", "skills", "hooks")
+
+
+class SourceTree(abc.ABC):
+    """
+    in-memory snapshot of the tree being deployed (directory or pack).
+
+    built once, then reused for staging, sync decisions, verification,
+    file counts and the gui summary - including across every target of a
+    batch deploy - so the source is only walked a single time.
+
+    subclasses fill in dirs, files and root_entry and implement how file
+    content is read: copy_file(), open() and file_digest().
+    """
+
+    dirs: list[SourceFile]
+    files: list[SourceFile]
+    root_entry: SourceFile
+
+    # false when entry mtimes are only approximate, so a matching size and
+    # mtime can't be trusted to mean unchanged content
+    exact_mtimes: bool = True
+
+    @property
+    def total_bytes(self) -> int:
+        """sum of all file sizes."""
+        return sum(entry.size for entry in self.files)
+
+    def disk_footprint(self, block_size: int) -> int:
+        """bytes a copy of the tree takes on a filesystem with block_size."""
+        blocks = sum(-(-entry.size // block_size) for entry in self.files)
+        return (blocks + len(self.dirs) + 1) * block_size
+
+    def required_entries(self) -> tuple[str, ...]:
+        """paths a deploy of this tree must contain."""
+        return REQUIRED_ENTRIES
+
+    def has_required(self) -> bool:
+        """true if the tree has every entry in required_entries()."""
+        present = {entry.path for entry in self.dirs}
+        present.update(entry.path for entry in self.files)
+        return all(name in present for name in self.required_entries())
+
+    def skill_names(self) -> list[str]:
+        """names of the skill directories under skills/."""
+        return [
+            e.path.split("/")[1] for e in self.dirs
+            if e.path.startswith("skills/") and e.path.count("/") == 1
+        ]
+
+    def summary(self) -> dict[str, int]:
+        """
+        counts for display: command files, skills, hooks and total files.
+        """
+        return {
+            "commands": sum(
+                1 for e in self.files
+                if e.path.startswith("commands/") and e.path.endswith(".md")
+            ),
+            "skills": len(self.skill_names()),
+            "hooks": sum(1 for e in self.files if e.path.startswith("hooks/")),
+            "files": len(self.files),
+        }
+
+    @abc.abstractmethod
+    def copy_file(self, entry: SourceFile, dst: Path, copier: FileCopier) -> None:
+        """write entry to dst (which must not exist), with mode and times."""
+
+    @abc.abstractmethod
+    def open(self, entry: SourceFile) -> BinaryIO:
+        """open the entry's content for streaming reads."""
+
+    @abc.abstractmethod
+    def file_digest(self, entry: SourceFile) -> str:
+        """blake2b hex digest of the entry's content."""
+
+    def same_content(self, entry: SourceFile, dst: Path) -> bool:
+        """true if dst has exactly the entry's content."""
+        return self.file_digest(entry) == _file_digest(dst)
+
+    def apply_stat(self, entry: SourceFile, dst: Path) -> None:
+        """copy the entry's mode and times onto dst."""
+        os.chmod(dst, stat.S_IMODE(entry.mode))
+        os.utime(dst, ns=(entry.mtime_ns, entry.mtime_ns))
+
+    def close(self) -> None:
+        """release any open resources."""
+
+    def __enter__(self) -> SourceTree:
+        return self
 
-                reply = msg.exec()
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
 
-                # open folder in finder if requested
-                if reply == QMessageBox.StandardButton.Open:
-                    import subprocess
-                    subprocess.run(["open", str(target)])
+
+class DirSnapshot(SourceTree):
+    """
+    snapshot of a .claude/ directory.
+
+    built with os.scandir in a single pass: one stat per entry, and
+    symlinked files and directories are followed, as shutil.copytree does.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.dirs = []
+        self.files = []
+
+        root_stat = os.stat(root)
+        self.root_entry = SourceFile(".", 0, root_stat.st_mode, root_stat.st_mtime_ns)
+
+        pending = [(os.fspath(root), "")]
+        while pending:
+            directory, prefix = pending.pop()
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+            subdirs = []
+            for dir_entry in entries:
+                st = dir_entry.stat()
+                rel = prefix + dir_entry.name
+                if stat.S_ISDIR(st.st_mode):
+                    self.dirs.append(SourceFile(rel, 0, st.st_mode, st.st_mtime_ns))
+                    subdirs.append((dir_entry.path, rel + "/"))
+                else:
+                    self.files.append(SourceFile(rel, st.st_size, st.st_mode, st.st_mtime_ns))
+            # depth-first, in name order
+            pending.extend(reversed(subdirs))
+
+    def copy_file(self, entry: SourceFile, dst: Path, copier: FileCopier) -> None:
+        copier.copy(self.root / entry.path, dst)
+
+    def open(self, entry: SourceFile) -> BinaryIO:
+        return open(self.root / entry.path, "rb")
+
+    def file_digest(self, entry: SourceFile) -> str:
+        return _file_digest(self.root / entry.path)
+
+    def apply_stat(self, entry: SourceFile, dst: Path) -> None:
+        shutil.copystat(self.root / entry.path, dst)
+
+
+class PackSnapshot(SourceTree):
+    """
+    source tree backed by a zip pack built with pack_claude_folder().
+
+    the zip central directory is the index; entries are streamed straight
+    from the pack into the target without extracting it first.
+
+    mtimes come from the exact utc timestamp pack_claude_folder() stores
+    with each entry. zips written by other tools only carry the 2-second,
+    local-time dos timestamp, so their mtimes are marked inexact and every
+    sync compares content.
+    """
+
+    def __init__(self, pack: Path) -> None:
+        self.pack = pack
+        self.zf = zipfile.ZipFile(pack)
+        self.dirs = []
+        self.files = []
+        self.exact_mtimes = True
+        self._infos: dict[str, zipfile.ZipInfo] = {}
+        self._digests: dict[str, str] = {}
+
+        for info in self.zf.infolist():
+            rel = info.filename.rstrip("/")
+            parts = PurePosixPath(rel).parts
+            if not parts or rel.startswith("/") or ".." in parts:
+                raise ValueError(f"unsafe path in pack {pack}: {info.filename}")
+
+            mode = info.external_attr >> 16
+            if info.is_dir():
+                mode = mode or (stat.S_IFDIR | 0o755)
             else:
-                raise RuntimeError("copy verification failed")
+                mode = mode or (stat.S_IFREG | 0o644)
+            mtime_ns = _pack_mtime_ns(info)
+            if mtime_ns is None:
+                if not info.is_dir():
+                    self.exact_mtimes = False
+                mtime_ns = int(time.mktime(info.date_time + (0, 0, -1))) * 1_000_000_000
 
-        except Exception as e:
-            self.status_label.setText(f"❌ error during copy:\n{e}")
-            self.status_label.setStyleSheet(
-                "margin: 10px; padding: 10px; background-color: #ffebee; color: #c62828;"
-            )
-            QMessageBox.critical(
-                self,
-                "copy failed",
-                f"failed to copy .claude/ folder:\n\n{e}",
-            )
+            entry = SourceFile(rel, info.file_size, mode, mtime_ns)
+            (self.dirs if info.is_dir() else self.files).append(entry)
+            self._infos[rel] = info
 
+        # zips written by other tools may omit directory entries
+        known = {entry.path for entry in self.dirs}
+        for entry in list(self.files):
+            for parent in PurePosixPath(entry.path).parents:
+                rel = parent.as_posix()
+                if rel != "." and rel not in known:
+                    known.add(rel)
+                    self.dirs.append(SourceFile(rel, 0, stat.S_IFDIR | 0o755, entry.mtime_ns))
+        self.dirs.sort(key=lambda entry: entry.path.count("/"))
 
-def main() -> None:
-    """main entry point for claude setup tool."""
-    app = QApplication(sys.argv)
+        self.root_entry = SourceFile(".", 0, stat.S_IFDIR | 0o755, time.time_ns())
+
+    def copy_file(self, entry: SourceFile, dst: Path, copier: FileCopier) -> None:
+        with self.zf.open(self._infos[entry.path]) as fsrc, open(dst, "wb") as fdst:
+            shutil.copyfileobj(fsrc, fdst, 1 << 20)
+        self.apply_stat(entry, dst)
+        copier.record("pack")
+
+    def open(self, entry: SourceFile) -> BinaryIO:
+        return self.zf.open(self._infos[entry.path])
+
+    def file_digest(self, entry: SourceFile) -> str:
+        # cached: a batch sync compares every target against the same
+        # members, and each one is only inflated once
+        cached = self._digests.get(entry.path)
+        if cached is not None:
+            return cached
+        digest = hashlib.blake2b()
+        with self.zf.open(self._infos[entry.path]) as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        self._digests[entry.path] = digest.hexdigest()
+        return self._digests[entry.path]
+
+    def close(self) -> None:
+        self.zf.close()
+
+
+def snapshot_source(source: Path) -> SourceTree:
+    """
+    snapshot a source .claude/ directory or a .claude pack file.
+
+    the result can be passed as `source` to copy_claude_folder(),
+    sync_claude_folder() and deploy_many() to skip re-walking the tree;
+    close() it (or use it as a context manager) when done.
+    """
+    with trace_phase("scan", source=str(source)) as phase:
+        tree = PackSnapshot(source) if source.is_file() else DirSnapshot(source)
+        phase.files = len(tree.files)
+        phase.bytes = tree.total_bytes
+        return tree
+
+
+@contextmanager
+def _opened(source: Path | SourceTree) -> Iterator[SourceTree]:
+    """yield a snapshot for source, closing it only if we opened it here."""
+    if isinstance(source, SourceTree):
+        yield source
+        return
+    with snapshot_source(source) as tree:
+        yield tree
+
+
+PROFILES_NAME = "install-profiles.json"
+
+# parts of the tree a profile selects from, each a top-level directory
+PROFILE_KINDS = ("commands", "skills", "hooks")
+
+
+class ProfileError(ValueError):
+    """raised for an unknown or invalid install profile."""
+
+
+@dataclass
+class InstallProfile:
+    """
+    named selection of commands, skills and hooks to install.
+
+    each kind is a list of names or globs - command categories (or
+    category/NAME for single commands), skill directories and hook files.
+    None selects everything of that kind, an empty list nothing.
+    settings.json is always installed, with any hook it references.
+    """
+
+    name: str
+    description: str = ""
+    commands: list[str] | None = None
+    skills: list[str] | None = None
+    hooks: list[str] | None = None
+
+    @classmethod
+    def from_dict(cls, name: str, data: dict) -> InstallProfile:
+        """build a profile from its entry in a profiles file."""
+        unknown = set(data) - {"description", *PROFILE_KINDS}
+        if unknown:
+            raise ProfileError(f"profile {name}: unknown keys {', '.join(sorted(unknown))}")
+        for kind in PROFILE_KINDS:
+            names = data.get(kind)
+            if names is not None and not (
+                isinstance(names, list) and all(isinstance(n, str) for n in names)
+            ):
+                raise ProfileError(f"profile {name}: {kind} must be a list of names")
+        return cls(name, **data)
+
+    @property
+    def is_full(self) -> bool:
+        """true if the profile selects the whole tree."""
+        return all(getattr(self, kind) is None for kind in PROFILE_KINDS)
+
+    def selects(self, kind: str, rel: str) -> bool:
+        """
+        true if the file at kind/rel belongs to the profile.
+
+        rel is matched by its first component (category, skill or hook
+        name) and, for commands, also as category/NAME without .md.
+        """
+        patterns = getattr(self, kind)
+        if patterns is None:
+            return True
+        first = rel.split("/", 1)[0]
+        candidates = (first, rel[:-3]) if kind == "commands" and rel.endswith(".md") else (first,)
+        return any(
+            fnmatch.fnmatchcase(candidate, pattern)
+            for pattern in patterns for candidate in candidates
+        )
+
+
+def get_profiles_path() -> Path:
+    """install-profiles.json shipped with the tool."""
+    if getattr(sys, 'frozen', False):
+        return Path(sys._MEIPASS) / PROFILES_NAME
+    return Path(__file__).parent / PROFILES_NAME
+
+
+def load_profiles(path: Path | None = None) -> dict[str, InstallProfile]:
+    """
+    read install profiles; "full" (everything) is always available.
+
+    args:
+        path: profiles file (default: get_profiles_path()); a missing
+            default file just leaves "full"
+
+    raises:
+        ProfileError: if the file is malformed
+    """
+    profiles = {"full": InstallProfile("full", "every command, skill and hook")}
+    profiles_path = path or get_profiles_path()
+    try:
+        data = json.loads(profiles_path.read_text())
+    except FileNotFoundError:
+        if path is not None:
+            raise
+        return profiles
+    except ValueError as e:
+        raise ProfileError(f"{profiles_path}: {e}") from None
+    if not isinstance(data, dict):
+        raise ProfileError(f"{profiles_path}: expected an object of profiles")
+    for name, entry in data.items():
+        profiles[name] = InstallProfile.from_dict(name, entry)
+    return profiles
+
+
+def source_index(tree: SourceTree) -> dict[str, list[str]]:
+    """names a profile can select: command categories, skills and hook files."""
+    index: dict[str, set[str]] = {kind: set() for kind in PROFILE_KINDS}
+    for entry in tree.files:
+        kind, sep, rel = entry.path.partition("/")
+        if sep and kind in index:
+            index[kind].add(rel.split("/", 1)[0])
+    return {kind: sorted(names) for kind, names in index.items()}
+
+
+def _hook_commands(settings_text: str) -> list[str]:
+    """
+    every hook command configured in a settings.json.
+
+    collects the "command" strings anywhere under the top-level "hooks"
+    key, e.g. hooks.PostToolUse[].hooks[].command.
+
+    raises:
+        ProfileError: if the text is not a json object
+    """
+    try:
+        settings = json.loads(settings_text)
+    except ValueError as e:
+        raise ProfileError(f"settings.json is not valid json: {e}") from None
+    if not isinstance(settings, dict):
+        raise ProfileError("settings.json is not a json object")
+
+    commands = []
+    pending = [settings.get("hooks")]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "command" and isinstance(value, str):
+                    commands.append(value)
+                else:
+                    pending.append(value)
+        elif isinstance(node, list):
+            pending.extend(node)
+    return commands
+
+
+def _command_references(command: str, path: str) -> bool:
+    """
+    true if a hook command runs the file at path (relative to .claude/).
+
+    matches whole shell words, so hooks/lint.sh is not referenced by
+    hooks/lint.sh.bak or hooks/pre-lint.sh.
+    """
+    try:
+        words = shlex.split(command)
+    except ValueError:  # unbalanced quotes
+        words = command.split()
+    return any(
+        word in (path, f".claude/{path}") or word.endswith(f"/.claude/{path}")
+        for word in words
+    )
+
+
+class ProfileView(SourceTree):
+    """
+    the part of a source tree an install profile selects.
+
+    a filtered view sharing the underlying snapshot, so deploys, syncs
+    and verification only ever see the selected files - and a sync
+    removes files a target has from outside the profile. closing the
+    view leaves the underlying tree open.
+    """
+
+    def __init__(self, base: SourceTree, profile: InstallProfile) -> None:
+        self.base = base
+        self.profile = profile
+        self.root_entry = base.root_entry
+        self.exact_mtimes = base.exact_mtimes
+
+        # everything the profile names explicitly must arrive in the target
+        required = list(REQUIRED_ENTRIES)
+        for kind in PROFILE_KINDS:
+            for name in getattr(profile, kind) or []:
+                if any(ch in name for ch in "*?["):
+                    continue
+                # category/NAME picks a single command file
+                suffix = ".md" if kind == "commands" and "/" in name else ""
+                required.append(f"{kind}/{name}{suffix}")
+        self._required = tuple(required)
+
+        present = {entry.path for entry in base.dirs}
+        present.update(entry.path for entry in base.files)
+        missing = [path for path in self._required[len(REQUIRED_ENTRIES):] if path not in present]
+        if missing:
+            raise ProfileError(
+                f"profile {profile.name}: not in the source: {', '.join(missing)}"
+            )
+
+        # hooks wired up in settings.json must exist or claude code fails to run them
+        settings = next((e for e in base.files if e.path == "settings.json"), None)
+        commands: list[str] = []
+        if settings is not None:
+            with base.open(settings) as f:
+                commands = _hook_commands(f.read().decode("utf-8", "replace"))
+
+        self.files = []
+        for entry in base.files:
+            kind, sep, rel = entry.path.partition("/")
+            if (
+                not sep
+                or kind not in PROFILE_KINDS
+                or profile.selects(kind, rel)
+                or (
+                    kind == "hooks"
+                    and any(_command_references(command, entry.path) for command in commands)
+                )
+            ):
+                self.files.append(entry)
+
+        needed = {"commands", "skills", "hooks"}
+        for entry in self.files:
+            needed.update(parent.as_posix() for parent in PurePosixPath(entry.path).parents)
+        self.dirs = [entry for entry in base.dirs if entry.path in needed]
+
+    def required_entries(self) -> tuple[str, ...]:
+        return self._required
+
+    def copy_file(self, entry: SourceFile, dst: Path, copier: FileCopier) -> None:
+        self.base.copy_file(entry, dst, copier)
+
+    def open(self, entry: SourceFile) -> BinaryIO:
+        return self.base.open(entry)
+
+    def file_digest(self, entry: SourceFile) -> str:
+        return self.base.file_digest(entry)
+
+    def same_content(self, entry: SourceFile, dst: Path) -> bool:
+        return self.base.same_content(entry, dst)
+
+    def apply_stat(self, entry: SourceFile, dst: Path) -> None:
+        self.base.apply_stat(entry, dst)
+
+
+def select_profile(
+    tree: SourceTree, manifest: Manifest | None, profile: InstallProfile | None
+) -> tuple[SourceTree, Manifest | None]:
+    """
+    narrow a source tree and its manifest to an install profile.
+
+    returns:
+        (tree, manifest) unchanged for no profile or "full", else a
+        ProfileView and the manifest subset for it
+    """
+    if profile is None or profile.is_full:
+        return tree, manifest
+    view = ProfileView(tree, profile)
+    return view, manifest.subset(view) if manifest is not None else None
+
+
+# files rendered by a TemplateStage unless other patterns are given
+TEMPLATE_PATTERNS = ("settings.json", "*CLAUDE*.md", "*CLAUDE*.MD")
+
+# {{ name }} or {{ name | json }}; anything else is left as literal text
+_PLACEHOLDER = re.compile(rb"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*(\|\s*json\s*)?\}\}")
+
+# longest placeholder the streaming parser has to hold back between chunks
+_PLACEHOLDER_MAX = 256
+
+_TEMPLATE_CHUNK = 1 << 16
+
+
+class TemplateError(ValueError):
+    """raised when a template uses a variable that has no value."""
+
+
+class CompiledTemplate:
+    """
+    a template parsed into segments, without holding its text.
+
+    each segment is (length, name, json): a run of `length` source bytes
+    that is either copied as-is (name is None) or replaced by the value
+    of variable `name`, json string-escaped if `json` is true. rendering
+    replays the segments against a fresh read of the source, so neither
+    parsing nor rendering keeps more than a chunk of the file in memory.
+    """
+
+    __slots__ = ("segments", "names")
+
+    def __init__(self, segments: list[tuple[int, str | None, bool]]) -> None:
+        self.segments = segments
+        self.names = frozenset(name for _, name, _ in segments if name is not None)
+
+    @classmethod
+    def parse(cls, f: BinaryIO) -> CompiledTemplate:
+        """parse a template from a binary stream, one chunk at a time."""
+        segments: list[tuple[int, str | None, bool]] = []
+        buf = b""
+        offset = 0  # source offset of buf[0]
+        literal_start = 0
+        while True:
+            chunk = f.read(_TEMPLATE_CHUNK)
+            buf += chunk
+            consumed = 0
+            for match in _PLACEHOLDER.finditer(buf):
+                start = offset + match.start()
+                if start > literal_start:
+                    segments.append((start - literal_start, None, False))
+                segments.append(
+                    (match.end() - match.start(), match.group(1).decode(), bool(match.group(2)))
+                )
+                literal_start = offset + match.end()
+                consumed = match.end()
+            if not chunk:
+                break
+            # keep only a tail that may hold the start of a split placeholder
+            keep_from = max(consumed, len(buf) - _PLACEHOLDER_MAX)
+            offset += keep_from
+            buf = buf[keep_from:]
+
+        end = offset + len(buf)
+        if end > literal_start:
+            segments.append((end - literal_start, None, False))
+        return cls(segments)
+
+    def render(
+        self, fsrc: BinaryIO, fdst: BinaryIO, values: dict[tuple[str, bool], bytes]
+    ) -> None:
+        """stream the source through the segments into fdst."""
+        for length, name, as_json in self.segments:
+            if name is None:
+                while length:
+                    chunk = fsrc.read(min(length, _TEMPLATE_CHUNK))
+                    if not chunk:
+                        raise TemplateError("source changed while rendering")
+                    fdst.write(chunk)
+                    length -= len(chunk)
+            else:
+                fsrc.read(length)
+                fdst.write(values[name, as_json])
+
+
+def _project_python_version(target: Path) -> str:
+    """python version pinned by target's .python-version, else the running one."""
+    try:
+        pinned = (target / ".python-version").read_text().split()
+    except OSError:
+        pinned = []
+    if pinned:
+        return pinned[0]
+    return f"{sys.version_info.major}.{sys.version_info.minor}"
+
+
+class TemplateStage:
+    """
+    optional copy stage that renders templated files per target.
+
+    files whose path under .claude/ matches one of `patterns` are written
+    with every {{ name }} replaced by the target's value for name;
+    {{ name | json }} inserts it json string-escaped, for use inside
+    quoted strings in settings.json. every other file is copied as-is.
+
+    each template is parsed once and cached by path, size and mtime, so a
+    batch deploy parses it once no matter how many targets it renders
+    into. the stage is safe to share between deploy threads.
+
+    built-in variables, which `variables` and `per_target` override:
+    project_name, project_dir, python_version and date (yyyy-mm-dd).
+    """
+
+    def __init__(
+        self,
+        variables: dict[str, str] | None = None,
+        per_target: dict[str, dict[str, str]] | None = None,
+        patterns: tuple[str, ...] | list[str] = TEMPLATE_PATTERNS,
+    ) -> None:
+        self.variables = dict(variables or {})
+        self.per_target = {
+            str(Path(target).expanduser().resolve()): dict(values)
+            for target, values in (per_target or {}).items()
+        }
+        self.patterns = tuple(patterns)
+        self._compiled: dict[tuple[str, int, int], CompiledTemplate] = {}
+        self._lock = threading.Lock()
+
+    def matches(self, rel: str) -> bool:
+        """true if the file at rel (relative to .claude/) is a template."""
+        return any(fnmatch.fnmatchcase(rel, pattern) for pattern in self.patterns)
+
+    def rendered_paths(self, tree: SourceTree) -> frozenset[str]:
+        """paths in tree that this stage renders."""
+        return frozenset(entry.path for entry in tree.files if self.matches(entry.path))
+
+    def variables_for(self, target: Path) -> dict[str, str]:
+        """every variable value for one target."""
+        resolved = target.expanduser().resolve()
+        values = {
+            "project_name": resolved.name,
+            "project_dir": str(resolved),
+            "python_version": _project_python_version(resolved),
+            "date": time.strftime("%Y-%m-%d"),
+        }
+        values.update(self.variables)
+        values.update(self.per_target.get(str(resolved), {}))
+        return values
+
+    def compile(self, tree: SourceTree, entry: SourceFile) -> CompiledTemplate:
+        """parsed template for entry, from the cache when unchanged."""
+        key = (entry.path, entry.size, entry.mtime_ns)
+        with self._lock:
+            compiled = self._compiled.get(key)
+        if compiled is None:
+            with tree.open(entry) as f:
+                compiled = CompiledTemplate.parse(f)
+            with self._lock:
+                compiled = self._compiled.setdefault(key, compiled)
+        return compiled
+
+    def render(
+        self, tree: SourceTree, entry: SourceFile, dst: Path, variables: dict[str, str]
+    ) -> None:
+        """
+        render entry into dst (which must not exist), with the entry's mode.
+
+        raises:
+            TemplateError: if the template uses a variable without a value
+        """
+        compiled = self.compile(tree, entry)
+        missing = sorted(compiled.names - variables.keys())
+        if missing:
+            raise TemplateError(f"{entry.path}: no value for {', '.join(missing)}")
+
+        values: dict[tuple[str, bool], bytes] = {}
+        for name in compiled.names:
+            value = str(variables[name])
+            values[name, False] = value.encode("utf-8")
+            values[name, True] = json.dumps(value)[1:-1].encode("utf-8")
+
+        with tree.open(entry) as fsrc, open(dst, "wb") as fdst:
+            compiled.render(fsrc, fdst, values)
+        os.chmod(dst, stat.S_IMODE(entry.mode))
+
+
+# copy threads per target when not given: on network filesystems each file
+# mostly waits on open/create/close round-trips, which overlap well
+COPY_JOBS_NETWORK = 16
+COPY_JOBS_LOCAL = 4
+
+
+def default_copy_jobs(path: Path) -> int:
+    """copy threads to use for a target at path, by its filesystem type."""
+    if filesystem_type(path) in NETWORK_FILESYSTEMS:
+        return COPY_JOBS_NETWORK
+    return COPY_JOBS_LOCAL
+
+
+def _for_each(items: list, fn: Callable[[object], None], jobs: int) -> None:
+    """
+    call fn(item) for every item on up to jobs threads.
+
+    the first exception (including CopyCancelled) stops items that have
+    not started yet and is re-raised once running ones have finished.
+    """
+    if jobs <= 1 or len(items) < 2:
+        for item in items:
+            fn(item)
+        return
+
+    failed = threading.Event()
+
+    def run(item: object) -> None:
+        if failed.is_set():
+            return
+        try:
+            fn(item)
+        except BaseException:
+            failed.set()
+            raise
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run, item) for item in items]
+        errors = [future.exception() for future in futures]
+    for error in errors:
+        if error is not None:
+            raise error
+
+
+STORE_NAME = "store"
+# how store objects get into targets; both fall back to a plain copy
+STORE_LINKS = ("hardlink", "reflink")
+
+
+@dataclass
+class StoreStats:
+    """size of an object store and how much linking saves."""
+
+    objects: int = 0
+    bytes: int = 0
+    links: int = 0  # target files sharing an object's inode
+    saved_bytes: int = 0  # bytes those links would take as copies
+    unreferenced: int = 0  # objects no target links to
+
+
+class ObjectStore:
+    """
+    user-level content-addressed store shared by every target.
+
+    each file is kept once under objects/, named by its blake2b digest,
+    mode and mtime, and linked into targets instead of copied. hardlinks
+    share one inode (and its page cache) between all targets; reflinks
+    share only the blocks, so targets stay independently editable. when
+    a link is not possible, e.g. the store is on another filesystem, the
+    file is copied from the store.
+
+    a hardlinked target file *is* the store object - editing it in place
+    edits it in every target. verify() finds objects changed that way.
+    """
+
+    def __init__(self, root: Path | None = None, link: str = "hardlink") -> None:
+        """
+        args:
+            root: store directory (default: <state dir>/store)
+            link: one of STORE_LINKS
+
+        raises:
+            ValueError: if link is unknown
+        """
+        if link not in STORE_LINKS:
+            raise ValueError(f"unknown store link: {link} (choose from {', '.join(STORE_LINKS)})")
+        self.root = root or get_state_dir() / STORE_NAME
+        self.link = link
+        self.objects = self.root / "objects"
+        self.tmp = self.root / "tmp"
+        # (tree, path, size, mtime, mode) -> object, so a batch deploy
+        # hashes each source file once, not once per target
+        self._known: dict[tuple[int, str, int, int, int], Path] = {}
+        # one copier per target filesystem: a failed link only disables
+        # linking on the device it failed on
+        self._linkers: dict[int, FileCopier] = {}
+        # never hardlinks, so the source itself does not end up in the store
+        self._ingester = FileCopier()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def object_name(digest: str, mode: int, mtime_ns: int) -> str:
+        """
+        object file name; mode and mtime are part of it because every
+        hardlink of an object shares them.
+        """
+        return f"{digest}-{stat.S_IMODE(mode):o}-{mtime_ns}"
+
+    def object_path(self, name: str) -> Path:
+        """where an object lives, fanned out by the first digest byte."""
+        return self.objects / name[:2] / name
+
+    def ingest(self, tree: SourceTree, entry: SourceFile) -> Path:
+        """
+        make sure the store has entry's content, mode and times.
+
+        an existing object whose size or mtime no longer match its name
+        was edited through a hardlinked target and is replaced.
+
+        returns:
+            path of the object
+        """
+        key = (id(tree), entry.path, entry.size, entry.mtime_ns, entry.mode)
+        with self._lock:
+            known = self._known.get(key)
+        if known is not None:
+            return known
+
+        name = self.object_name(tree.file_digest(entry), entry.mode, entry.mtime_ns)
+        path = self.object_path(name)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            st = None
+        if st is None or st.st_size != entry.size or st.st_mtime_ns != entry.mtime_ns:
+            self.tmp.mkdir(parents=True, exist_ok=True)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.tmp / f"{os.getpid()}-{threading.get_ident()}-{name}"
+            tmp.unlink(missing_ok=True)
+            try:
+                tree.copy_file(entry, tmp, self._ingester)
+                if st is not None:
+                    os.replace(tmp, path)
+                else:
+                    try:
+                        os.link(tmp, path)
+                    except FileExistsError:
+                        pass  # added by another thread or deploy meanwhile
+            finally:
+                tmp.unlink(missing_ok=True)
+
+        with self._lock:
+            self._known[key] = path
+        return path
+
+    def place(self, tree: SourceTree, entry: SourceFile, dst: Path, copier: FileCopier) -> None:
+        """
+        put entry at dst (which must not exist) by linking its store object.
+
+        the method used is recorded on copier as "store-<strategy>".
+        """
+        obj = self.ingest(tree, entry)
+        device = dst.parent.stat().st_dev
+        with self._lock:
+            linker = self._linkers.get(device)
+            if linker is None:
+                linker = self._linkers[device] = FileCopier(self.link)
+        copier.record(f"store-{linker.copy(obj, dst)}")
+
+    def iter_objects(self) -> Iterator[tuple[Path, os.stat_result]]:
+        """every object in the store with its lstat."""
+        try:
+            fanout = sorted(os.scandir(self.objects), key=lambda e: e.name)
+        except FileNotFoundError:
+            return
+        for bucket in fanout:
+            if not bucket.is_dir(follow_symlinks=False):
+                continue
+            for item in sorted(os.scandir(bucket.path), key=lambda e: e.name):
+                if item.is_file(follow_symlinks=False):
+                    yield Path(item.path), item.stat(follow_symlinks=False)
+
+    def stats(self) -> StoreStats:
+        """count objects, bytes and the links targets hold to them."""
+        result = StoreStats()
+        for _, st in self.iter_objects():
+            result.objects += 1
+            result.bytes += st.st_size
+            result.links += st.st_nlink - 1
+            result.saved_bytes += st.st_size * (st.st_nlink - 1)
+            if st.st_nlink == 1:
+                result.unreferenced += 1
+        return result
+
+    def gc(self, grace: float = 3600.0, dry_run: bool = False) -> tuple[int, int]:
+        """
+        delete objects no target links to any more.
+
+        an object with a single link is unreferenced: removing it only
+        loses sharing for future deploys (reflinked and copied targets
+        have their own inodes). objects whose link count changed within
+        `grace` seconds are kept, so a deploy in progress does not lose
+        an object it is about to link. leftover temp files are removed
+        on the same terms.
+
+        returns:
+            (objects removed, bytes freed)
+        """
+        cutoff = time.time() - grace
+        removed = freed = 0
+        for path, st in self.iter_objects():
+            if st.st_nlink > 1 or st.st_ctime > cutoff:
+                continue
+            if not dry_run:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+            removed += 1
+            freed += st.st_size
+        if not dry_run and self.tmp.is_dir():
+            for item in self.tmp.iterdir():
+                try:
+                    if item.lstat().st_ctime <= cutoff:
+                        item.unlink()
+                except OSError:
+                    pass
+        return removed, freed
+
+    def verify(self, jobs: int = 4, delete: bool = False) -> dict[str, str]:
+        """
+        rehash every object and check it against its name.
+
+        args:
+            jobs: objects hashed concurrently
+            delete: remove bad objects from the store, so later deploys
+                re-add good copies (targets already linked to them keep
+                the bad content - redeploy them)
+
+        returns:
+            object name -> problem, for every bad object
+        """
+        problems: dict[str, str] = {}
+        lock = threading.Lock()
+
+        def check(item: tuple[Path, os.stat_result]) -> None:
+            path, st = item
+            digest, _, rest = path.name.partition("-")
+            mode, _, mtime_ns = rest.partition("-")
+            try:
+                if _file_digest(path) != digest:
+                    problem = "content changed"
+                elif f"{stat.S_IMODE(st.st_mode):o}" != mode:
+                    problem = f"mode is {stat.S_IMODE(st.st_mode):o}, not {mode}"
+                elif str(st.st_mtime_ns) != mtime_ns:
+                    problem = "mtime changed"
+                else:
+                    return
+            except OSError as e:
+                problem = str(e)
+            if st.st_nlink > 1:
+                problem += f" ({st.st_nlink - 1} linked target files)"
+            with lock:
+                problems[path.name] = problem
+            if delete:
+                path.unlink(missing_ok=True)
+
+        _for_each(list(self.iter_objects()), check, jobs)
+        return dict(sorted(problems.items()))
+
+
+def _make_staging_dir(parent: Path) -> Path:
+    """create a hidden staging directory next to the final .claude/."""
+    parent.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(prefix=".claude.partial-", dir=parent))
+
+
+# renameat2(2) / renamex_np(2) flags
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 1 << 1  # linux
+_RENAME_SWAP = 0x2  # macos
+
+
+def _exchange_paths(a: Path, b: Path) -> bool:
+    """
+    atomically swap two existing paths in one syscall.
+
+    uses renameat2(RENAME_EXCHANGE) on linux and renamex_np(RENAME_SWAP)
+    on macos.
+
+    returns:
+        true if swapped, false if the platform or filesystem can't do it
+    """
+    import ctypes
+
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        if sys.platform.startswith("linux"):
+            rc = libc.renameat2(
+                _AT_FDCWD, os.fsencode(a), _AT_FDCWD, os.fsencode(b), _RENAME_EXCHANGE
+            )
+        elif sys.platform == "darwin":
+            rc = libc.renamex_np(os.fsencode(a), os.fsencode(b), _RENAME_SWAP)
+        else:
+            return False
+    except (AttributeError, OSError):
+        # libc without renameat2 (glibc < 2.28, musl) or no ctypes libc
+        return False
+
+    if rc == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in _UNSUPPORTED_ERRNOS:
+        return False
+    raise OSError(err, os.strerror(err), str(b))
+
+
+def _swap_into_place(staging: Path, target_claude: Path) -> Path | None:
+    """
+    move a fully staged tree to target_claude.
+
+    with an atomic exchange, readers see either the old or the new tree,
+    never neither. otherwise the old tree is renamed aside first, which
+    leaves only the gap between two renames.
+
+    returns:
+        path holding the retired tree (to be removed), or None
+    """
+    retired = target_claude.with_name(f".claude.old-{staging.name.rsplit('-', 1)[-1]}")
+
+    if not (target_claude.exists() or target_claude.is_symlink()):
+        os.rename(staging, target_claude)
+        return None
+
+    if _exchange_paths(staging, target_claude):
+        # staging now holds the old tree; give it a name that marks it as retired
+        os.rename(staging, retired)
+        return retired
+
+    os.rename(target_claude, retired)
+    os.rename(staging, target_claude)
+    return retired
+
+
+def _remove_path(path: Path) -> None:
+    """remove a file, symlink or directory tree, ignoring errors."""
+    with trace_phase("remove", path=str(path)):
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+_cleanup_pool: ThreadPoolExecutor | None = None
+_cleanup_futures: set[Future[None]] = set()
+_cleanup_lock = threading.Lock()
+
+
+def remove_in_background(path: Path) -> Future[None]:
+    """
+    delete a retired tree on a background thread.
+
+    the pool's threads are joined at interpreter exit, so pending removals
+    still finish when the process ends normally.
+    """
+    global _cleanup_pool
+    with _cleanup_lock:
+        if _cleanup_pool is None:
+            _cleanup_pool = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix="claude-cleanup"
+            )
+        future = _cleanup_pool.submit(_remove_path, path)
+        _cleanup_futures.add(future)
+    future.add_done_callback(_cleanup_futures.discard)
+    return future
+
+
+def wait_for_cleanup() -> None:
+    """block until all background removals have finished."""
+    with _cleanup_lock:
+        pending = list(_cleanup_futures)
+    for future in pending:
+        future.result()
+
+
+def remove_stale_staging(parent: Path, max_age: float = 3600.0) -> list[Path]:
+    """
+    remove leftovers of interrupted deploys next to .claude/.
+
+    retired `.claude.old-*` trees are always removed; `.claude.partial-*`
+    staging dirs only when older than max_age seconds, since a concurrent
+    deploy may still be filling them.
+
+    returns:
+        paths that were removed
+    """
+    removed = []
+    now = time.time()
+    for path in parent.glob(".claude.*"):
+        if path.name.startswith(".claude.old-"):
+            stale = True
+        elif path.name.startswith(".claude.partial-"):
+            try:
+                stale = now - path.stat().st_mtime > max_age
+            except FileNotFoundError:
+                continue
+        else:
+            continue
+        if stale:
+            _remove_path(path)
+            removed.append(path)
+    return removed
+
+
+GENERATIONS_DIR = ".claude.gen"
+GENERATION_LINK = "reflink"  # falls back to a real copy, never a hardlink
+
+
+@dataclass
+class GenerationPolicy:
+    """
+    how many previous .claude/ trees to keep per target.
+
+    where the filesystem supports reflinks a kept generation shares the
+    blocks of unchanged files with the live tree, so it costs little more
+    than the files that actually changed; elsewhere it is a real copy.
+    generations never hardlink, so an in-place edit of a live file can
+    not reach back into them.
+    """
+
+    keep: int = 5
+    max_age: float | None = None  # seconds; older generations are pruned
+
+    def __post_init__(self) -> None:
+        if self.keep < 1:
+            raise ValueError("keep must be at least 1")
+
+
+@dataclass
+class Generation:
+    """one kept previous .claude/ tree of a target."""
+
+    name: str  # <utc timestamp>-<reason>, sorts oldest first
+    path: Path
+    created: float
+    reason: str  # "overwrite", "sync" or "rollback"
+
+
+def _parse_generation(path: Path) -> Generation | None:
+    """the generation at path, or None if the name is not one of ours."""
+    stamp, _, reason = path.name.partition("-")
+    seconds, _, micro = stamp.rstrip("Z").partition(".")
+    try:
+        created = calendar.timegm(time.strptime(seconds, "%Y%m%dT%H%M%S"))
+        created += int(micro or 0) / 1e6
+    except ValueError:
+        return None
+    return Generation(path.name, path, created, reason)
+
+
+def list_generations(target: Path) -> list[Generation]:
+    """kept generations of target, newest first."""
+    try:
+        names = [
+            name for name in os.listdir(target / GENERATIONS_DIR)
+            if not name.startswith(".")  # partial snapshots
+        ]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+    parsed = (_parse_generation(target / GENERATIONS_DIR / name) for name in names)
+    return sorted((g for g in parsed if g is not None), key=lambda g: g.name, reverse=True)
+
+
+def _new_generation(target: Path, reason: str) -> Generation:
+    """a new generation of target at an unused path (not created yet)."""
+    parent = target / GENERATIONS_DIR
+    parent.mkdir(exist_ok=True)
+    ignore = parent / ".gitignore"
+    if not ignore.exists():
+        # keep generations out of the project's git status
+        ignore.write_text("# generated by claude-workflow-setup\n*\n")
+    while True:
+        now = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now))
+        name = f"{stamp}.{int(now * 1e6) % 1_000_000:06d}Z-{reason}"
+        if not (parent / name).exists():
+            return Generation(name, parent / name, now, reason)
+
+
+def _link_tree(src: Path, dst: Path, copier: FileCopier) -> None:
+    """recreate the tree at src as dst (which must not exist), linking files with copier."""
+    for dirpath, dirnames, filenames in os.walk(src):
+        out = dst / Path(dirpath).relative_to(src)
+        out.mkdir()
+        for name in list(dirnames):
+            if os.path.islink(os.path.join(dirpath, name)):
+                os.symlink(os.readlink(os.path.join(dirpath, name)), out / name)
+                dirnames.remove(name)
+        for name in filenames:
+            path = Path(dirpath) / name
+            if path.is_symlink():
+                os.symlink(os.readlink(path), out / name)
+            else:
+                copier.copy(path, out / name)
+    # directory modes and times last, once their contents are in place
+    for dirpath, _, _ in os.walk(src, topdown=False):
+        shutil.copystat(dirpath, dst / Path(dirpath).relative_to(src))
+
+
+def snapshot_generation(target: Path, reason: str) -> Generation:
+    """
+    keep the current target/.claude/ as a new generation by copying it.
+
+    used before an in-place sync. files are reflinked where the
+    filesystem supports it, so the snapshot costs almost nothing until
+    files change, and copied otherwise.
+
+    returns:
+        the new generation
+    """
+    generation = _new_generation(target, reason)
+    partial = generation.path.with_name(f".{generation.name}")
+    with trace_phase("generation", target=str(target), reason=reason):
+        try:
+            _link_tree(target / ".claude", partial, FileCopier(GENERATION_LINK))
+        except BaseException:
+            shutil.rmtree(partial, ignore_errors=True)
+            raise
+        os.rename(partial, generation.path)
+    return generation
+
+
+def keep_generation(retired: Path, target: Path, reason: str) -> Generation:
+    """
+    move a retired .claude/ tree into target's generations.
+
+    a rename, so nothing is copied. where the filesystem supports
+    reflinks, files the new live tree has unchanged (same size, mtime,
+    mode and content) are then replaced by reflinks of the live files, so
+    the generation only holds blocks that really changed.
+
+    returns:
+        the new generation
+    """
+    generation = _new_generation(target, reason)
+    path = generation.path
+    os.rename(retired, path)
+
+    live = target / ".claude"
+    copier = FileCopier(GENERATION_LINK)
+    with trace_phase("generation", target=str(target), reason=reason) as phase:
+        for dirpath, _, filenames in os.walk(path):
+            for name in filenames:
+                kept = Path(dirpath) / name
+                current = live / kept.relative_to(path)
+                try:
+                    old, new = kept.lstat(), current.lstat()
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+                if (
+                    not stat.S_ISREG(old.st_mode)
+                    or (old.st_dev, old.st_ino) == (new.st_dev, new.st_ino)
+                    or (old.st_size, old.st_mtime_ns, old.st_mode)
+                    != (new.st_size, new.st_mtime_ns, new.st_mode)
+                    or not filecmp.cmp(kept, current, shallow=False)
+                ):
+                    continue
+                tmp = kept.with_name(f".{name}.link")
+                copier.copy(current, tmp)
+                os.replace(tmp, kept)
+                phase.files += 1
+            if GENERATION_LINK in copier.disabled:
+                break  # no reflinks here; keep the full copy
+        phase.args["strategy"] = copier.summary
+    return generation
+
+
+def prune_generations(target: Path, policy: GenerationPolicy) -> list[Generation]:
+    """
+    remove target's generations beyond policy.keep or older than policy.max_age.
+
+    returns:
+        the generations that were removed
+    """
+    generations = list_generations(target)
+    cutoff = time.time() - policy.max_age if policy.max_age is not None else None
+    pruned = [
+        generation for index, generation in enumerate(generations)
+        if index >= policy.keep or (cutoff is not None and generation.created < cutoff)
+    ]
+    for generation in pruned:
+        _remove_path(generation.path)
+    return pruned
+
+
+def rollback(
+    target: Path, name: str | None = None, policy: GenerationPolicy | None = None
+) -> tuple[Generation, Generation | None]:
+    """
+    make a kept generation target's live .claude/ again.
+
+    the generation is renamed into place - swapped atomically where the
+    platform can - and the tree it replaces is kept as a "rollback"
+    generation, so a rollback can itself be undone.
+
+    args:
+        target: project directory
+        name: generation to restore (default: the newest)
+        policy: retention applied afterwards (default: GenerationPolicy())
+
+    returns:
+        (restored generation, generation now holding the replaced tree or
+        None if target had no .claude/)
+
+    raises:
+        FileNotFoundError: if target has no such generation
+    """
+    policy = policy or GenerationPolicy()
+    generations = list_generations(target)
+    chosen = next(
+        (generation for generation in generations if name in (None, generation.name)), None
+    )
+    if chosen is None:
+        what = f"generation {name}" if name else "generations"
+        raise FileNotFoundError(f"{target} has no {what}")
+
+    live = target / ".claude"
+    with trace_phase("rollback", target=str(target), generation=chosen.name):
+        if not (live.exists() or live.is_symlink()):
+            os.rename(chosen.path, live)
+            return chosen, None
+
+        replaced = _new_generation(target, "rollback")
+        if _exchange_paths(chosen.path, live):
+            os.rename(chosen.path, replaced.path)
+        else:
+            os.rename(live, replaced.path)
+            os.rename(chosen.path, live)
+
+    # the replaced tree is the newest generation, so keep >= 1 never prunes it
+    prune_generations(target, policy)
+    return chosen, replaced
+
+
+@dataclass
+class SyncSummary:
+    """result of an incremental sync, as relative paths under .claude/."""
+
+    created: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        """true if the sync touched anything in the target."""
+        return bool(self.created or self.updated or self.deleted)
+
+
+def _file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """return blake2b hex digest of a file, read in chunks."""
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _same_file(
+    tree: SourceTree, entry: SourceFile, dst_stat: os.stat_result, dst: Path, checksum: bool
+) -> bool:
+    """
+    decide if dst already matches a source entry.
+
+    size mismatch is always a change. matching size and mtime is treated
+    as unchanged unless checksum=True or the tree's mtimes are inexact.
+    otherwise fall back to comparing blake2b content hashes.
+    """
+    if dst_stat.st_size != entry.size:
+        return False
+
+    if not checksum and tree.exact_mtimes and dst_stat.st_mtime_ns == entry.mtime_ns:
+        return True
+
+    return tree.same_content(entry, dst)
+
+
+def sync_claude_folder(
+    source: Path | SourceTree,
+    target: Path,
+    checksum: bool = False,
+    progress: Callable[[CopyProgress], None] | None = None,
+    cancel: threading.Event | None = None,
+    copier: FileCopier | None = None,
+    templates: TemplateStage | None = None,
+    jobs: int | None = None,
+    store: ObjectStore | None = None,
+    generations: GenerationPolicy | None = None,
+) -> SyncSummary:
+    """
+    incrementally sync .claude/ folder into target directory.
+
+    only new or changed files are copied and only stale entries are
+    removed, so unchanged files keep their inode and mtime. changed files
+    are first staged next to the target and only moved into place once
+    every one of them has been copied, so a cancelled or failed sync
+    leaves the existing .claude/ untouched.
+
+    args:
+        source: source .claude/ directory, pack file or snapshot
+        target: target project directory
+        checksum: if true, always compare content hashes instead of
+            trusting matching size and mtime
+        progress: optional callback receiving a CopyProgress per file
+        cancel: optional event; when set, the sync stops and raises
+        copier: file copier to use (default: FileCopier("auto"))
+        templates: optional stage rendering templated files for target;
+            a rendered file counts as unchanged when the target already
+            has exactly the rendered content
+        jobs: files compared and staged concurrently (default:
+            default_copy_jobs(target))
+        store: if given, new and changed files are linked from this
+            object store instead of copied
+        generations: if given, the existing .claude/ is kept as a linked
+            snapshot before the sync changes anything (see GenerationPolicy)
+
+    returns:
+        summary of created, updated, deleted and skipped paths
+
+    raises:
+        CopyCancelled: if cancel was set before the commit phase
+        TemplateError: if a template uses a variable without a value
+    """
+    copier = copier or FileCopier()
+    with _opened(source) as tree:
+        return _sync_tree(
+            tree, target, checksum, progress, cancel, copier, templates, jobs, store,
+            generations,
+        )
+
+
+def _sync_tree(
+    tree: SourceTree,
+    target: Path,
+    checksum: bool,
+    progress: Callable[[CopyProgress], None] | None,
+    cancel: threading.Event | None,
+    copier: FileCopier,
+    templates: TemplateStage | None = None,
+    jobs: int | None = None,
+    store: ObjectStore | None = None,
+    generations: GenerationPolicy | None = None,
+) -> SyncSummary:
+    """sync_claude_folder() body, for an already opened source tree."""
+    target_claude = target / ".claude"
+    jobs = jobs or default_copy_jobs(target)
+    summary = SyncSummary()
+    tracker = _ProgressTracker(tree.files, progress, cancel)
+    variables = templates.variables_for(target) if templates is not None else {}
+
+    # phase 1: stage new and changed files (cancellable, target untouched)
+    staging = _make_staging_dir(target)
+    # per file, in tree order: "staged", "skipped" or "refresh"
+    outcomes: list[str] = [""] * len(tree.files)
+    try:
+        with trace_phase("copy", target=str(target), mode="sync", jobs=jobs) as phase:
+            def stage(index: int) -> None:
+                entry = tree.files[index]
+                tracker.step(entry.path, entry.size)
+                dst = target_claude / entry.path
+
+                try:
+                    dst_stat = dst.lstat()
+                except (FileNotFoundError, NotADirectoryError):
+                    dst_stat = None
+
+                if templates is not None and templates.matches(entry.path):
+                    # rendered content differs from the source, so compare
+                    # the rendered bytes with what the target has
+                    staged_file = staging / entry.path
+                    staged_file.parent.mkdir(parents=True, exist_ok=True)
+                    started = phase.clock()
+                    templates.render(tree, entry, staged_file, variables)
+                    phase.add(entry.path, entry.size, started)
+                    if (
+                        dst_stat is not None
+                        and stat.S_ISREG(dst_stat.st_mode)
+                        and filecmp.cmp(staged_file, dst, shallow=False)
+                    ):
+                        staged_file.unlink()
+                        if stat.S_IMODE(dst_stat.st_mode) != stat.S_IMODE(entry.mode):
+                            os.chmod(dst, stat.S_IMODE(entry.mode))
+                        outcomes[index] = "skipped"
+                    else:
+                        outcomes[index] = "staged"
+                    return
+
+                if (
+                    dst_stat is not None
+                    and stat.S_ISREG(dst_stat.st_mode)
+                    and _same_file(tree, entry, dst_stat, dst, checksum)
+                ):
+                    if (
+                        dst_stat.st_mode == entry.mode
+                        and dst_stat.st_mtime_ns == entry.mtime_ns
+                    ):
+                        outcomes[index] = "skipped"
+                        return
+                    # a store object's or generation's mode and times are
+                    # shared with this file, so relink instead of touching them
+                    if store is None and generations is None:
+                        outcomes[index] = "refresh"
+                        return
+
+                staged_file = staging / entry.path
+                staged_file.parent.mkdir(parents=True, exist_ok=True)
+                started = phase.clock()
+                if store is not None:
+                    store.place(tree, entry, staged_file, copier)
+                else:
+                    tree.copy_file(entry, staged_file, copier)
+                phase.add(entry.path, entry.size, started)
+                outcomes[index] = "staged"
+
+            # every file costs at least one stat of the target, so the
+            # comparisons run on the pool too, not just the copies
+            _for_each(list(range(len(tree.files))), stage, jobs)
+
+            tracker.check_cancel()
+            staged = [e for e, outcome in zip(tree.files, outcomes) if outcome == "staged"]
+            refresh = [e for e, outcome in zip(tree.files, outcomes) if outcome == "refresh"]
+            summary.skipped.extend(
+                e.path for e, outcome in zip(tree.files, outcomes) if outcome != "staged"
+            )
+            phase.args.update(skipped=len(summary.skipped), strategy=copier.summary)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # only a tree that exists before the commit is worth keeping
+    keep_policy = (
+        generations if target_claude.is_dir() and not target_claude.is_symlink() else None
+    )
+    kept: list[Generation] = []
+
+    def keep() -> None:
+        """snapshot the live tree once, right before the first change to it."""
+        if keep_policy is not None and not kept:
+            kept.append(snapshot_generation(target, "sync"))
+
+    # phase 2: commit - move staged files into place and prune stale entries
+    with trace_phase("commit", target=str(target), mode="sync") as phase:
+        try:
+            if target_claude.is_symlink() or (
+                target_claude.exists() and not target_claude.is_dir()
+            ):
+                target_claude.unlink()
+                summary.deleted.append(".")
+            target_claude.mkdir(exist_ok=True)
+
+            for entry in tree.dirs:
+                dst = target_claude / entry.path
+                if dst.is_symlink() or (dst.exists() and not dst.is_dir()):
+                    keep()
+                    dst.unlink()
+                    summary.deleted.append(entry.path)
+                if not dst.exists():
+                    keep()
+                    dst.mkdir()
+                    os.chmod(dst, stat.S_IMODE(entry.mode))
+                    summary.created.append(entry.path + "/")
+
+            if staged or refresh:
+                keep()
+            for entry in staged:
+                dst = target_claude / entry.path
+                if dst.is_dir() and not dst.is_symlink():
+                    shutil.rmtree(dst)
+                    summary.deleted.append(entry.path + "/")
+                existed = dst.exists() or dst.is_symlink()
+                os.replace(staging / entry.path, dst)
+                (summary.updated if existed else summary.created).append(entry.path)
+
+            for entry in refresh:
+                # content matches - only mode/times drifted
+                tree.apply_stat(entry, target_claude / entry.path)
+
+            expected = {entry.path for entry in tree.dirs}
+            expected.update(entry.path for entry in tree.files)
+
+            # remove anything in target that no longer exists in source
+            for dirpath, dirnames, filenames in os.walk(target_claude, topdown=True):
+                dst_dir = Path(dirpath)
+                rel_dir = dst_dir.relative_to(target_claude)
+
+                for name in list(dirnames):
+                    rel = (rel_dir / name).as_posix()
+                    if rel not in expected:
+                        keep()
+                        path = dst_dir / name
+                        if path.is_symlink():
+                            path.unlink()
+                        else:
+                            shutil.rmtree(path)
+                        summary.deleted.append(rel + "/")
+                        dirnames.remove(name)
+
+                for name in filenames:
+                    rel = (rel_dir / name).as_posix()
+                    if rel not in expected:
+                        keep()
+                        (dst_dir / name).unlink()
+                        summary.deleted.append(rel)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        phase.files = len(staged)
+        phase.args["deleted"] = len(summary.deleted)
+
+    if keep_policy is not None and kept:
+        prune_generations(target, keep_policy)
+    return summary
+
+
+def _staged_copy(
+    tree: SourceTree,
+    target_claude: Path,
+    progress: Callable[[CopyProgress], None] | None = None,
+    cancel: threading.Event | None = None,
+    copier: FileCopier | None = None,
+    background_cleanup: bool = True,
+    templates: TemplateStage | None = None,
+    jobs: int | None = None,
+    store: ObjectStore | None = None,
+    generations: GenerationPolicy | None = None,
+) -> None:
+    """
+    copy source into a staging directory, then swap it into target_claude.
+
+    an existing target_claude is only replaced after the staged copy is
+    complete, so cancellation or failure leaves it as it was. the swap is
+    a single rename (atomic exchange where supported) and the old tree is
+    deleted afterwards, in the background unless background_cleanup=False.
+    files matched by templates are rendered for target_claude's project.
+
+    the directory skeleton is created first, then files are copied on up
+    to `jobs` threads (default: default_copy_jobs()); each file keeps its
+    mode and times, so the result does not depend on jobs. with a store,
+    files are linked from it rather than copied from the tree. with
+    generations, a replaced tree is kept (see keep_generation) instead of
+    deleted.
+    """
+    copier = copier or FileCopier()
+    tracker = _ProgressTracker(tree.files, progress, cancel)
+    variables = (
+        templates.variables_for(target_claude.parent) if templates is not None else {}
+    )
+    jobs = jobs or default_copy_jobs(target_claude.parent)
+
+    staging = _make_staging_dir(target_claude.parent)
+    try:
+        with trace_phase(
+            "copy", target=str(target_claude.parent), mode="full", jobs=jobs
+        ) as phase:
+            for entry in tree.dirs:
+                (staging / entry.path).mkdir(exist_ok=True)
+
+            def copy(entry: SourceFile) -> None:
+                tracker.step(entry.path, entry.size)
+                started = phase.clock()
+                if templates is not None and templates.matches(entry.path):
+                    templates.render(tree, entry, staging / entry.path, variables)
+                elif store is not None:
+                    store.place(tree, entry, staging / entry.path, copier)
+                else:
+                    tree.copy_file(entry, staging / entry.path, copier)
+                phase.add(entry.path, entry.size, started)
+
+            _for_each(tree.files, copy, jobs)
+            # directory modes and times last, as copytree does
+            for entry in reversed(tree.dirs):
+                tree.apply_stat(entry, staging / entry.path)
+            tree.apply_stat(tree.root_entry, staging)
+            tracker.check_cancel()
+            phase.args["strategy"] = copier.summary
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    with trace_phase("swap", target=str(target_claude.parent)):
+        retired = _swap_into_place(staging, target_claude)
+    if retired is not None:
+        if generations is not None:
+            keep_generation(retired, target_claude.parent, "overwrite")
+            prune_generations(target_claude.parent, generations)
+        elif background_cleanup:
+            remove_in_background(retired)
+        else:
+            _remove_path(retired)
+
+
+def copy_claude_folder(
+    source: Path | SourceTree,
+    target: Path,
+    overwrite: bool = False,
+    sync: bool = False,
+    progress: Callable[[CopyProgress], None] | None = None,
+    cancel: threading.Event | None = None,
+    manifest: Manifest | None = None,
+    copier: FileCopier | None = None,
+    background_cleanup: bool = True,
+    templates: TemplateStage | None = None,
+    jobs: int | None = None,
+    store: ObjectStore | None = None,
+    generations: GenerationPolicy | None = None,
+) -> bool:
+    """
+    copy .claude/ folder to target directory.
+
+    args:
+        source: source .claude/ directory, pack file or snapshot (see
+            snapshot_source); passing a snapshot avoids re-walking the source
+        target: target project directory
+        overwrite: if true, overwrite existing .claude/ folder
+        sync: if true, update an existing .claude/ in place, copying only
+            new or changed files and removing stale ones (see
+            sync_claude_folder). implies overwrite.
+        progress: optional callback receiving a CopyProgress per file
+        cancel: optional event; when set, the copy stops, the target is
+            left unchanged and CopyCancelled is raised
+        manifest: if given, verify every copied file against it (size,
+            mode and content hash) instead of against the snapshot (size
+            and mode)
+        copier: file copier to use (default: FileCopier("auto")); inspect
+            its `used` counts afterwards to see which strategy ran
+        background_cleanup: if true, delete a replaced .claude/ on a
+            background thread after the swap (see wait_for_cleanup)
+        templates: optional stage rendering templated files (settings.json,
+            CLAUDE.md) with target's variables; rendered files are verified
+            for presence and mode only, since their content differs from
+            the source
+        jobs: files copied concurrently within the tree (default: more on
+            network filesystems, see default_copy_jobs)
+        store: if given, file contents are kept once in this object store
+            and linked into target (rendered files are still written per
+            target)
+        generations: if given, the replaced .claude/ is kept as a
+            generation that rollback() can restore, and old generations
+            are pruned by the policy
+
+    returns:
+        true if copy successful, false otherwise
+
+    raises:
+        FileExistsError: if target/.claude/ exists and overwrite=False
+        CopyCancelled: if cancel was set while copying
+        TemplateError: if a template uses a variable without a value
+    """
+    target_claude = target / ".claude"
+
+    # check if .claude/ already exists in target
+    if not sync and target_claude.exists() and not overwrite:
+        raise FileExistsError(
+            f".claude/ already exists in {target}\n"
+            "use overwrite=True to replace it"
+        )
+
+    with _opened(source) as tree:
+        if sync:
+            _sync_tree(
+                tree, target, False, progress, cancel, copier or FileCopier(), templates,
+                jobs, store, generations,
+            )
+        else:
+            # stage a full copy next to target, then swap it in
+            remove_stale_staging(target)
+            _staged_copy(
+                tree, target_claude, progress=progress, cancel=cancel,
+                copier=copier, background_cleanup=background_cleanup,
+                templates=templates, jobs=jobs, store=store, generations=generations,
+            )
+
+        rendered = templates.rendered_paths(tree) if templates is not None else frozenset()
+        return _verify_copy(target_claude, tree, manifest, rendered)
+
+
+def _verify_copy(
+    target_claude: Path,
+    tree: SourceTree,
+    manifest: Manifest | None,
+    rendered: frozenset[str] = frozenset(),
+) -> bool:
+    """verify against manifest when available, else against the snapshot."""
+    with trace_phase("verify", target=str(target_claude.parent)) as phase:
+        if manifest is not None:
+            phase.args["against"] = "manifest"
+            phase.files, phase.bytes = len(manifest.entries), manifest.total_bytes
+            return verify_manifest(target_claude, manifest, rendered=rendered).ok
+        phase.args["against"] = "snapshot"
+        phase.files = len(tree.files)
+        return tree.has_required() and verify_snapshot(target_claude, tree, rendered).ok
+
+
+MANIFEST_NAME = "claude-manifest.json"
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    """one file of the source .claude/ tree."""
+
+    path: str  # relative posix path under .claude/
+    size: int
+    mode: int  # permission bits (stat.S_IMODE)
+    hash: str  # blake2b hex digest
+
+
+@dataclass
+class Manifest:
+    """content manifest of a .claude/ tree, built once at build time."""
+
+    entries: list[ManifestEntry]
+    dirs: list[str] = field(default_factory=list)
+    version: str = ""
+    algorithm: str = "blake2b"
+
+    @property
+    def total_bytes(self) -> int:
+        """sum of all file sizes."""
+        return sum(entry.size for entry in self.entries)
+
+    def subset(self, tree: SourceTree) -> Manifest:
+        """the entries and dirs that are also in tree, e.g. a ProfileView."""
+        files = {entry.path for entry in tree.files}
+        dirs = {entry.path for entry in tree.dirs}
+        return Manifest(
+            entries=[entry for entry in self.entries if entry.path in files],
+            dirs=[path for path in self.dirs if path in dirs],
+            version=self.version,
+            algorithm=self.algorithm,
+        )
+
+    @property
+    def digest(self) -> str:
+        """single hash identifying the whole tree (paths, sizes, modes, hashes)."""
+        digest = hashlib.blake2b(digest_size=16)
+        for entry in self.entries:
+            digest.update(f"{entry.path}\0{entry.size}\0{entry.mode:o}\0{entry.hash}\n".encode())
+        return digest.hexdigest()
+
+    def to_json(self) -> str:
+        """serialize manifest to json."""
+        return json.dumps(
+            {
+                "version": self.version,
+                "algorithm": self.algorithm,
+                "digest": self.digest,
+                "dirs": self.dirs,
+                "files": [asdict(entry) for entry in self.entries],
+            },
+            indent=1,
+        )
+
+    @classmethod
+    def from_json(cls, text: str) -> Manifest:
+        """
+        parse manifest written by to_json().
+
+        raises:
+            ValueError: if text is not json or not a manifest
+        """
+        data = json.loads(text)
+        try:
+            return cls(
+                entries=[ManifestEntry(**entry) for entry in data["files"]],
+                dirs=list(data.get("dirs", [])),
+                version=data.get("version", ""),
+                algorithm=data.get("algorithm", "blake2b"),
+            )
+        except (AttributeError, KeyError, TypeError) as e:
+            raise ValueError(f"not a manifest: {e!r}") from None
+
+
+def build_manifest(source: Path | SourceTree, version: str = "") -> Manifest:
+    """
+    hash every file of a .claude/ tree into a manifest.
+
+    args:
+        source: source .claude/ directory, pack file or snapshot
+        version: version string to record (e.g. contents of version.txt)
+
+    returns:
+        manifest with entries in tree order
+    """
+    with _opened(source) as tree:
+        entries = [
+            ManifestEntry(
+                entry.path, entry.size, stat.S_IMODE(entry.mode), tree.file_digest(entry)
+            )
+            for entry in tree.files
+        ]
+        dirs = [entry.path for entry in tree.dirs]
+    return Manifest(entries=entries, dirs=dirs, version=version)
+
+
+def write_manifest(source: Path, output: Path, version: str = "") -> Manifest:
+    """build manifest for source and write it to output as json."""
+    manifest = build_manifest(source, version)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(manifest.to_json() + "\n")
+    return manifest
+
+
+def get_source_manifest() -> Manifest | None:
+    """
+    load the manifest shipped next to the source .claude/ folder.
+
+    returns:
+        manifest, or None when running from a checkout without one
+    """
+    if getattr(sys, 'frozen', False):
+        manifest_path = Path(sys._MEIPASS) / MANIFEST_NAME
+    else:
+        manifest_path = Path(__file__).parent / MANIFEST_NAME
+
+    if not manifest_path.exists():
+        return None
+    return Manifest.from_json(manifest_path.read_text())
+
+
+PACK_NAME = "claude-pack.zip"
+
+
+# zip extra field holding an entry's mtime as utc nanoseconds
+PACK_MTIME_EXTRA = 0x6E73
+
+
+def _pack_info(path: Path, entry: SourceFile) -> zipfile.ZipInfo:
+    """zip entry header for path, carrying its exact mtime."""
+    info = zipfile.ZipInfo.from_file(path, entry.path)
+    info.extra = struct.pack("<HHQ", PACK_MTIME_EXTRA, 8, entry.mtime_ns)
+    return info
+
+
+def _pack_mtime_ns(info: zipfile.ZipInfo) -> int | None:
+    """exact mtime stored by pack_claude_folder(), or None if absent."""
+    extra = info.extra
+    while len(extra) >= 4:
+        tag, size = struct.unpack("<HH", extra[:4])
+        if tag == PACK_MTIME_EXTRA and size == 8:
+            return struct.unpack("<Q", extra[4:12])[0]
+        extra = extra[4 + size:]
+    return None
+
+
+def pack_claude_folder(source: Path, output: Path, compresslevel: int = 9) -> int:
+    """
+    pack a .claude/ tree into one compressed zip.
+
+    directories are stored as explicit entries, and every entry keeps its
+    unix mode and its exact mtime (in a PACK_MTIME_EXTRA field, since the
+    zip timestamp is local time with 2-second resolution), so the pack can
+    be deployed and synced without unpacking it first. the zip central
+    directory serves as the index.
+
+    args:
+        source: source .claude/ directory
+        output: pack file to write (replaced atomically)
+        compresslevel: deflate level
+
+    returns:
+        number of files packed
+    """
+    output.parent.mkdir(parents=True, exist_ok=True)
+    partial = output.with_name(output.name + ".partial")
+
+    with DirSnapshot(source) as tree, zipfile.ZipFile(
+        partial, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel
+    ) as zf:
+        for entry in tree.dirs:
+            zf.writestr(_pack_info(source / entry.path, entry), b"")
+        for entry in tree.files:
+            zf.writestr(
+                _pack_info(source / entry.path, entry), (source / entry.path).read_bytes(),
+                compress_type=zipfile.ZIP_DEFLATED, compresslevel=compresslevel,
+            )
+        count = len(tree.files)
+
+    os.replace(partial, output)
+    return count
+
+
+@dataclass
+class VerifyResult:
+    """outcome of checking a deployed tree against a manifest."""
+
+    checked: int = 0
+    bytes_checked: int = 0
+    missing: list[str] = field(default_factory=list)
+    mismatched: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        """true if every manifest entry matched."""
+        return not self.missing and not self.mismatched
+
+
+def _check_entry(
+    target_claude: Path, entry: ManifestEntry, check_mode: bool, check_content: bool = True
+) -> str | None:
+    """
+    compare one deployed file with its manifest entry.
+
+    check_content=False skips the size and hash checks, for rendered files.
+
+    returns:
+        None if it matches, otherwise "missing" or a mismatch reason
+    """
+    path = target_claude / entry.path
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return "missing"
+
+    # cheap checks first, hash only when size already agrees
+    if check_content and st.st_size != entry.size:
+        return "size"
+    if check_mode and stat.S_IMODE(st.st_mode) != entry.mode:
+        return "mode"
+    if check_content and _file_digest(path) != entry.hash:
+        return "hash"
+    return None
+
+
+def verify_manifest(
+    target_claude: Path,
+    manifest: Manifest,
+    jobs: int = 1,
+    rendered: frozenset[str] = frozenset(),
+) -> VerifyResult:
+    """
+    verify a deployed .claude/ folder against a manifest.
+
+    each file is stat'ed and hashed once, in manifest order; with jobs > 1
+    files are checked on a thread pool.
+
+    args:
+        target_claude: deployed .claude/ directory
+        manifest: expected contents
+        jobs: number of threads used for hashing
+        rendered: paths written by a TemplateStage; only their presence and
+            mode are checked
+
+    returns:
+        verify result listing missing and mismatched paths
+    """
+    # windows does not carry posix permission bits
+    check_mode = os.name != "nt"
+    result = VerifyResult()
+
+    def check(entry: ManifestEntry) -> str | None:
+        return _check_entry(target_claude, entry, check_mode, entry.path not in rendered)
+
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            outcomes = list(pool.map(check, manifest.entries))
+    else:
+        outcomes = [check(entry) for entry in manifest.entries]
+
+    for entry, outcome in zip(manifest.entries, outcomes):
+        result.checked += 1
+        if outcome is None:
+            result.bytes_checked += entry.size
+        elif outcome == "missing":
+            result.missing.append(entry.path)
+        else:
+            result.mismatched.append(f"{entry.path} ({outcome})")
+
+    return result
+
+
+def verify_snapshot(
+    target_claude: Path, tree: SourceTree, rendered: frozenset[str] = frozenset()
+) -> VerifyResult:
+    """
+    verify a deployed .claude/ folder against a source snapshot.
+
+    a cheaper check than verify_manifest: one stat per file comparing type,
+    size and (outside windows) permission bits, no content hashing.
+
+    args:
+        target_claude: deployed .claude/ directory
+        tree: snapshot of the source that was deployed
+        rendered: paths written by a TemplateStage, whose size is not checked
+
+    returns:
+        verify result listing missing and mismatched paths
+    """
+    check_mode = os.name != "nt"
+    result = VerifyResult()
+
+    for entry in tree.files:
+        result.checked += 1
+        try:
+            st = os.stat(target_claude / entry.path)
+        except (FileNotFoundError, NotADirectoryError):
+            result.missing.append(entry.path)
+            continue
+
+        if not stat.S_ISREG(st.st_mode):
+            result.mismatched.append(f"{entry.path} (type)")
+        elif st.st_size != entry.size and entry.path not in rendered:
+            result.mismatched.append(f"{entry.path} (size)")
+        elif check_mode and stat.S_IMODE(st.st_mode) != stat.S_IMODE(entry.mode):
+            result.mismatched.append(f"{entry.path} (mode)")
+        else:
+            result.bytes_checked += entry.size
+
+    return result
+
+
+@dataclass
+class DeployResult:
+    """outcome of deploying .claude/ to one target."""
+
+    target: str
+    status: str  # "ok", "exists", "invalid" or "failed"
+    message: str
+    elapsed: float = 0.0
+    strategy: str = ""
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    skipped: int = 0
+
+    @property
+    def ok(self) -> bool:
+        """true if the target now has a verified .claude/ folder."""
+        return self.status == "ok"
+
+
+def deploy_to_target(
+    source: Path | SourceTree,
+    target: Path,
+    overwrite: bool = False,
+    sync: bool = False,
+    manifest: Manifest | None = None,
+    strategy: str = "auto",
+    templates: TemplateStage | None = None,
+    registry: DeployRegistry | None = None,
+    copy_jobs: int | None = None,
+    store: ObjectStore | None = None,
+    generations: GenerationPolicy | None = None,
+) -> DeployResult:
+    """
+    validate target and copy .claude/ into it, without raising.
+
+    args:
+        source: source .claude/ directory, pack file or snapshot
+        target: target project directory (created if only the parent exists)
+        overwrite: if true, replace an existing .claude/ folder
+        sync: if true, update an existing .claude/ incrementally
+        manifest: optional manifest of source used for verification
+        strategy: file copy strategy (see COPY_STRATEGIES)
+        templates: optional stage rendering templated files for target
+        registry: if given, a verified deploy is recorded in it
+        copy_jobs: files copied concurrently within this target (default:
+            by filesystem, see default_copy_jobs)
+        store: if given, files are linked from this object store
+        generations: if given, the previous .claude/ is kept for rollback
+
+    returns:
+        deploy result for this target
+    """
+    start = time.perf_counter()
+    copier = FileCopier(strategy)
+
+    with trace_phase("deploy", target=str(target), sync=sync) as phase:
+        def result(status: str, message: str, **counts: int) -> DeployResult:
+            phase.args.update(status=status, strategy=copier.summary)
+            return DeployResult(
+                str(target), status, message, time.perf_counter() - start,
+                copier.summary, **counts,
+            )
+
+        is_valid, message = validate_target_dir(target)
+        if not is_valid:
+            return result("invalid", message)
+
+        try:
+            target.mkdir(exist_ok=True)
+
+            with _opened(source) as tree:
+                rendered = (
+                    templates.rendered_paths(tree) if templates is not None else frozenset()
+                )
+                if sync:
+                    summary = sync_claude_folder(
+                        tree, target, copier=copier, templates=templates, jobs=copy_jobs,
+                        store=store, generations=generations,
+                    )
+                    counts = {
+                        "created": len(summary.created),
+                        "updated": len(summary.updated),
+                        "deleted": len(summary.deleted),
+                        "skipped": len(summary.skipped),
+                    }
+                    success = _verify_copy(target / ".claude", tree, manifest, rendered)
+                else:
+                    success = copy_claude_folder(
+                        tree, target, overwrite=overwrite, manifest=manifest,
+                        copier=copier, templates=templates, jobs=copy_jobs, store=store,
+                        generations=generations,
+                    )
+                    counts = {}
+
+                if not success:
+                    return result("failed", "copy verification failed", **counts)
+                if registry is not None:
+                    try:
+                        registry.record_deploy(target, tree, manifest, rendered)
+                    except sqlite3.Error as e:
+                        return result("ok", f"deployed, not recorded: {e}", **counts)
+        except FileExistsError:
+            return result("exists", ".claude/ already exists (use --overwrite or --sync)")
+        except (OSError, shutil.Error, ValueError) as e:
+            return result("failed", str(e))
+
+        return result("ok", "deployed", **counts)
+
+
+def deploy_many(
+    source: Path | SourceTree,
+    targets: list[Path],
+    jobs: int = 8,
+    overwrite: bool = False,
+    sync: bool = False,
+    on_result: Callable[[DeployResult], None] | None = None,
+    manifest: Manifest | None = None,
+    strategy: str = "auto",
+    templates: TemplateStage | None = None,
+    registry: DeployRegistry | None = None,
+    copy_jobs: int | None = None,
+    store: ObjectStore | None = None,
+    generations: GenerationPolicy | None = None,
+) -> list[DeployResult]:
+    """
+    deploy .claude/ to many targets using a bounded thread pool.
+
+    the source is snapshotted once and shared by every target.
+
+    args:
+        source: source .claude/ directory, pack file or snapshot
+        targets: target project directories
+        jobs: maximum number of concurrent deploys
+        overwrite: passed through to deploy_to_target
+        sync: passed through to deploy_to_target
+        on_result: optional callback invoked as each target finishes
+        manifest: passed through to deploy_to_target
+        strategy: passed through to deploy_to_target
+        templates: passed through to deploy_to_target; one stage is shared
+            so every template is parsed once for the whole batch
+        registry: passed through to deploy_to_target
+        copy_jobs: passed through to deploy_to_target (default: 1 when
+            more than one target deploys at once, so the batch never runs
+            more than `jobs` threads; by filesystem otherwise)
+        store: shared by every target, so each file is hashed and stored
+            once for the whole batch
+        generations: passed through to deploy_to_target
+
+    returns:
+        deploy results in the same order as targets
+    """
+    results: dict[int, DeployResult] = {}
+    if copy_jobs is None and jobs > 1 and len(targets) > 1:
+        # nested pools multiply: jobs targets x copy jobs each
+        copy_jobs = 1
+
+    with _opened(source) as tree, ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {
+            pool.submit(
+                deploy_to_target, tree, target, overwrite, sync, manifest, strategy,
+                templates, registry, copy_jobs, store, generations,
+            ): index
+            for index, target in enumerate(targets)
+        }
+        for future in as_completed(futures):
+            deploy_result = future.result()
+            results[futures[future]] = deploy_result
+            if on_result is not None:
+                on_result(deploy_result)
+
+    return [results[index] for index in range(len(targets))]
+
+
+def read_targets_file(path: Path) -> list[Path]:
+    """
+    read target directories from a text file.
+
+    one path per line; blank lines and lines starting with # are ignored,
+    ~ is expanded. "-" reads standard input, e.g. piped from `discover`.
+    """
+    text = sys.stdin.read() if str(path) == "-" else path.read_text()
+    targets = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            targets.append(Path(line).expanduser())
+    return targets
+
+
+def read_vars_file(path: Path) -> dict[str, dict[str, str]]:
+    """
+    read per-target template variables from a json file.
+
+    the file holds an object mapping target paths (or "*" for every
+    target) to objects of variable names and scalar values; numbers and
+    booleans are rendered as json.
+
+    raises:
+        OSError: if the file can't be read
+        ValueError: if it is not json or not shaped like that
+    """
+    data = json.loads(path.read_text())
+    if not isinstance(data, dict):
+        raise ValueError("expected an object mapping targets to variables")
+    per_target: dict[str, dict[str, str]] = {}
+    for target, values in data.items():
+        if not isinstance(values, dict):
+            raise ValueError(f"variables for {target!r} must be an object")
+        per_target[target] = {}
+        for name, value in values.items():
+            if isinstance(value, (dict, list)):
+                raise ValueError(f"variable {name!r} for {target!r} must be a scalar")
+            per_target[target][name] = value if isinstance(value, str) else json.dumps(value)
+    return per_target
+
+
+STATE_DIR_ENV = "CLAUDE_SETUP_HOME"
+WATCH_STATE_NAME = "watch-state.json"
+
+
+def get_state_dir() -> Path:
+    """
+    directory for the tool's own state (watch state, registry).
+
+    $CLAUDE_SETUP_HOME if set, else ~/.claude-setup.
+    """
+    return Path(os.environ.get(STATE_DIR_ENV) or Path.home() / ".claude-setup")
+
+
+def source_fingerprint(tree: SourceTree) -> dict[str, list[int]]:
+    """
+    size, mtime and mode of every entry, keyed by relative path.
+
+    directories are keyed with a trailing "/". two fingerprints differ
+    exactly where a sync has something to do.
+    """
+    fingerprint = {entry.path + "/": [entry.mode] for entry in tree.dirs}
+    fingerprint.update(
+        (entry.path, [entry.size, entry.mtime_ns, entry.mode]) for entry in tree.files
+    )
+    return fingerprint
+
+
+def _fingerprint_digest(fingerprint: dict[str, list[int]]) -> str:
+    """short stable id of a fingerprint."""
+    data = json.dumps(fingerprint, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def apply_changes(
+    tree: SourceTree,
+    target: Path,
+    changed: list[str],
+    deleted: list[str],
+    copier: FileCopier | None = None,
+) -> SyncSummary:
+    """
+    apply known source changes to a deployed .claude/ without rescanning it.
+
+    each changed file is copied to a temporary name next to its
+    destination and renamed over it, so readers never see a partial file.
+
+    args:
+        tree: current source snapshot
+        target: target project directory
+        changed: relative paths of new or modified entries (dirs end in "/")
+        deleted: relative paths removed from the source (dirs end in "/")
+        copier: file copier to use (default: FileCopier("auto"))
+
+    returns:
+        summary of created, updated and deleted paths
+    """
+    copier = copier or FileCopier()
+    target_claude = target / ".claude"
+    summary = SyncSummary()
+    files = {entry.path: entry for entry in tree.files}
+    dirs = {entry.path: entry for entry in tree.dirs}
+
+    with trace_phase("watch-apply", target=str(target)) as phase:
+        for rel in deleted:
+            path = target_claude / rel.rstrip("/")
+            if path.exists() or path.is_symlink():
+                _remove_path(path)
+                summary.deleted.append(rel)
+
+        # parents before children
+        for rel in sorted(changed):
+            if rel.endswith("/"):
+                entry = dirs[rel[:-1]]
+                dst = target_claude / entry.path
+                if not dst.is_dir():
+                    if dst.exists() or dst.is_symlink():
+                        dst.unlink()
+                    dst.mkdir(parents=True)
+                    summary.created.append(rel)
+                os.chmod(dst, stat.S_IMODE(entry.mode))
+                continue
+
+            entry = files[rel]
+            dst = target_claude / rel
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            if dst.is_dir() and not dst.is_symlink():
+                shutil.rmtree(dst)
+            existed = dst.exists() or dst.is_symlink()
+            tmp = dst.with_name(f".{dst.name}.watch-{os.getpid()}-{threading.get_ident()}")
+            try:
+                started = phase.clock()
+                tree.copy_file(entry, tmp, copier)
+                phase.add(rel, entry.size, started)
+                os.replace(tmp, dst)
+            except BaseException:
+                _remove_path(tmp)
+                raise
+            (summary.updated if existed else summary.created).append(rel)
+
+    return summary
+
+
+@dataclass
+class WatchResult:
+    """outcome of bringing one watched target up to date."""
+
+    target: str
+    status: str  # "ok", "full" (initial sync), "current" or "failed"
+    message: str = ""
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+
+class WatchState:
+    """
+    persisted state of watch mode: the registered targets and, for each,
+    the source fingerprint it was last synced to.
+
+    fingerprints are stored once per distinct source state and referenced
+    by digest, so a restart diffs the source against what each target has
+    instead of rescanning the targets.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            data = {}
+        self.source: str = data.get("source", "")
+        # target -> digest of the fingerprint it has ("" = never synced)
+        self.targets: dict[str, str] = data.get("targets", {})
+        self.fingerprints: dict[str, dict[str, list[int]]] = data.get("fingerprints", {})
+
+    def register(self, targets: list[Path]) -> None:
+        """add targets; new ones get a full sync on the next round."""
+        for target in targets:
+            self.targets.setdefault(str(target), "")
+
+    def forget(self, targets: list[Path]) -> None:
+        """stop watching targets."""
+        for target in targets:
+            self.targets.pop(str(target), None)
+
+    def save(self) -> None:
+        """write the state atomically, dropping unreferenced fingerprints."""
+        used = set(self.targets.values())
+        self.fingerprints = {d: fp for d, fp in self.fingerprints.items() if d in used}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}")
+        tmp.write_text(json.dumps({
+            "source": self.source,
+            "targets": self.targets,
+            "fingerprints": self.fingerprints,
+        }) + "\n")
+        os.replace(tmp, self.path)
+
+
+def sync_watched(
+    source: Path,
+    state: WatchState,
+    jobs: int = 8,
+    strategy: str = "auto",
+) -> list[WatchResult]:
+    """
+    bring every registered target up to date with source, incrementally.
+
+    the source is snapshotted (cheap: one scandir pass) and diffed against
+    the fingerprint each target was last synced to; only the differing
+    paths are applied. targets never synced, or synced from another
+    source, get one full sync_claude_folder(). state is saved afterwards;
+    failed targets keep their old fingerprint and are retried next round.
+
+    returns:
+        results in target order
+    """
+    if state.source != str(source):
+        # fingerprints describe another source tree - start over
+        state.source = str(source)
+        state.targets = {target: "" for target in state.targets}
+        state.fingerprints = {}
+
+    with snapshot_source(source) as tree:
+        current = source_fingerprint(tree)
+        digest = _fingerprint_digest(current)
+        state.fingerprints[digest] = current
+
+        def sync_one(target: str) -> WatchResult:
+            old_digest = state.targets[target]
+            if old_digest == digest and (Path(target) / ".claude").is_dir():
+                return WatchResult(target, "current")
+
+            copier = FileCopier(strategy)
+            old = state.fingerprints.get(old_digest)
+            try:
+                if old is None or not (Path(target) / ".claude").is_dir():
+                    summary = sync_claude_folder(tree, Path(target), copier=copier)
+                    status = "full"
+                else:
+                    changed = [rel for rel, value in current.items() if old.get(rel) != value]
+                    deleted = [rel for rel in old if rel not in current]
+                    summary = apply_changes(tree, Path(target), changed, deleted, copier)
+                    status = "ok"
+            except (OSError, shutil.Error) as e:
+                return WatchResult(target, "failed", str(e))
+
+            state.targets[target] = digest
+            return WatchResult(
+                target, status, created=len(summary.created),
+                updated=len(summary.updated), deleted=len(summary.deleted),
+            )
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            results = list(pool.map(sync_one, list(state.targets)))
+
+    state.save()
+    return results
+
+
+# inotify event bits (linux/inotify.h)
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_Q_OVERFLOW = 0x4000
+_IN_ISDIR = 0x40000000
+_IN_WATCH_MASK = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+    | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF
+)
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class _InotifyWatcher:
+    """recursive inotify watch on a directory tree (linux)."""
+
+    def __init__(self, root: Path) -> None:
+        import ctypes
+
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._paths: dict[int, Path] = {}
+        self._add_tree(root)
+
+    def _add_tree(self, root: Path) -> None:
+        """watch root and every directory below it."""
+        for dirpath, _, _ in os.walk(root, followlinks=True):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dirpath), _IN_WATCH_MASK)
+            if wd >= 0:
+                self._paths[wd] = Path(dirpath)
+
+    def wait(self, timeout: float) -> bool:
+        """
+        block up to timeout seconds for changes.
+
+        returns:
+            true if anything under the tree changed
+        """
+        import select
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+                name = data[offset + _INOTIFY_EVENT.size:offset + _INOTIFY_EVENT.size + length]
+                offset += _INOTIFY_EVENT.size + length
+                changed = True
+                if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO) and wd in self._paths:
+                    # new directory: watch it (and anything created in it meanwhile)
+                    self._add_tree(self._paths[wd] / os.fsdecode(name.rstrip(b"\0")))
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class _PollingWatcher:
+    """fallback watcher: reports a possible change every interval."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+
+    def wait(self, timeout: float) -> bool:
+        time.sleep(min(self.interval, timeout))
+        # the caller's fingerprint diff decides whether anything changed
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+def watch_source(
+    source: Path,
+    state: WatchState,
+    debounce: float = 0.5,
+    poll_interval: float = 2.0,
+    jobs: int = 8,
+    strategy: str = "auto",
+    on_results: Callable[[list[WatchResult]], None] | None = None,
+    stop: threading.Event | None = None,
+) -> None:
+    """
+    keep registered targets in sync with source until stop is set.
+
+    resumes from the saved state, then waits for changes (inotify on
+    linux, polling elsewhere), lets bursts of events settle for debounce
+    seconds, and syncs the changed paths to every target.
+
+    args:
+        source: source .claude/ directory
+        state: watch state with the registered targets
+        debounce: quiet seconds to wait after the last change
+        poll_interval: seconds between checks when inotify is unavailable
+        jobs: targets synced concurrently
+        strategy: file copy strategy (see COPY_STRATEGIES)
+        on_results: optional callback invoked after every sync round
+        stop: optional event that ends the loop
+    """
+    if not source.is_dir():
+        raise ValueError(f"watch needs a source directory, not a pack: {source}")
+    stop = stop or threading.Event()
+
+    watcher: _InotifyWatcher | _PollingWatcher
+    try:
+        watcher = _InotifyWatcher(source)
+    except (AttributeError, OSError):
+        watcher = _PollingWatcher(poll_interval)
+
+    def sync_round() -> None:
+        results = sync_watched(source, state, jobs=jobs, strategy=strategy)
+        if on_results is not None:
+            on_results(results)
+
+    try:
+        sync_round()
+        while not stop.is_set():
+            if not watcher.wait(1.0):
+                continue
+            # debounce: editors save in bursts (temp file, rename, chmod)
+            deadline = time.monotonic() + 10 * debounce
+            while time.monotonic() < deadline and watcher.wait(debounce):
+                pass
+            sync_round()
+    finally:
+        watcher.close()
+
+
+DISCOVER_CACHE_NAME = "discover-cache.json"
+
+# any of these in a directory makes it a project root; its insides are not scanned
+PROJECT_MARKERS = frozenset({
+    ".git", ".claude", "CLAUDE.md", "pyproject.toml", "setup.py", "setup.cfg",
+    "requirements.txt", "package.json", "Cargo.toml", "go.mod", "pom.xml", "Gemfile",
+})
+
+# never descended into, on top of every hidden directory
+PRUNE_DIRS = frozenset({
+    "node_modules", "venv", "env", "site-packages", "__pycache__", "dist", "build",
+    "target", "vendor", "Library", "Applications",
+})
+
+
+@dataclass
+class DiscoveredProject:
+    """a project root found by discovery, and how its .claude/ compares to the source."""
+
+    path: str
+    status: str  # "missing", "current" or "stale"
+    message: str = ""
+
+
+class DiscoveryCache:
+    """
+    directory listings from the last discovery, keyed by absolute path.
+
+    each record is [mtime_ns, is_project, subdirs]. adding or removing an
+    entry bumps a directory's mtime, so a directory whose mtime is
+    unchanged is reused without listing it again and a re-scan only reads
+    the directories that changed.
+    """
+
+    def __init__(self, path: Path | None) -> None:
+        self.path = path
+        self.dirs: dict[str, list] = {}
+        if path is not None:
+            try:
+                self.dirs = json.loads(path.read_text()).get("dirs", {})
+            except (OSError, ValueError):
+                pass
+
+    def save(self, visited: dict[str, list], roots: list[Path]) -> None:
+        """replace records under roots with visited ones and write atomically."""
+        prefixes = tuple(str(root) for root in roots)
+        kept = {
+            path: record for path, record in self.dirs.items()
+            if not any(path == p or path.startswith(p.rstrip(os.sep) + os.sep) for p in prefixes)
+        }
+        kept.update(visited)
+        self.dirs = kept
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}")
+        tmp.write_text(json.dumps({"dirs": self.dirs}) + "\n")
+        os.replace(tmp, self.path)
+
+
+def _list_dir(path: str, cached: list | None) -> list | None:
+    """
+    [mtime_ns, is_project, subdirs] for one directory.
+
+    returns:
+        the cached record if the directory is unchanged, None if it
+        cannot be read
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+        if cached is not None and cached[0] == mtime_ns:
+            return cached
+        is_project = False
+        subdirs = []
+        with os.scandir(path) as it:
+            for dir_entry in it:
+                name = dir_entry.name
+                if name in PROJECT_MARKERS:
+                    is_project = True
+                elif (
+                    not name.startswith(".")
+                    and name not in PRUNE_DIRS
+                    and dir_entry.is_dir(follow_symlinks=False)
+                ):
+                    subdirs.append(name)
+    except OSError:
+        return None
+    return [mtime_ns, is_project, [] if is_project else sorted(subdirs)]
+
+
+def find_projects(
+    roots: list[Path],
+    max_depth: int = 6,
+    jobs: int = 32,
+    cache: DiscoveryCache | None = None,
+) -> list[Path]:
+    """
+    find project roots below roots with parallel directory listings.
+
+    hidden directories and PRUNE_DIRS are skipped, symlinks are not
+    followed, and a directory holding any PROJECT_MARKERS entry is a
+    project whose insides are not scanned.
+
+    args:
+        roots: directories to search, e.g. ~/src
+        max_depth: directory levels searched below each root
+        jobs: concurrent directory listings
+        cache: listings from a previous run, updated in place and saved
+
+    returns:
+        project roots, sorted
+    """
+    roots = [root.expanduser().resolve() for root in roots]
+    previous = cache.dirs if cache is not None else {}
+    visited: dict[str, list] = {}
+    projects: list[Path] = []
+
+    with trace_phase("discover", roots=[str(root) for root in roots]) as phase:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            pending: dict[Future[list | None], tuple[str, int]] = {}
+
+            def submit(path: str, depth: int) -> None:
+                pending[pool.submit(_list_dir, path, previous.get(path))] = (path, depth)
+
+            for root in roots:
+                submit(str(root), 0)
+            while pending:
+                future = next(as_completed(pending))
+                path, depth = pending.pop(future)
+                record = future.result()
+                if record is None:
+                    continue
+                visited[path] = record
+                if record[1]:
+                    projects.append(Path(path))
+                elif depth < max_depth:
+                    for name in record[2]:
+                        submit(os.path.join(path, name), depth + 1)
+
+        reused = sum(1 for path, record in visited.items() if previous.get(path) is record)
+        phase.files = len(visited)
+        phase.args.update(projects=len(projects), cached=reused)
+
+    if cache is not None:
+        cache.save(visited, roots)
+    return sorted(projects)
+
+
+def classify_project(
+    project: Path, tree: SourceTree, rendered: frozenset[str] = frozenset()
+) -> DiscoveredProject:
+    """
+    compare a project's .claude/ with the source by size and mtime.
+
+    deploys keep source mtimes, so this is the same test `--sync` uses to
+    skip a file; extra files in the target also make it stale. rendered
+    paths only have to exist.
+    """
+    target_claude = project / ".claude"
+    if not target_claude.is_dir():
+        if target_claude.exists() or target_claude.is_symlink():
+            return DiscoveredProject(str(project), "stale", ".claude is not a directory")
+        return DiscoveredProject(str(project), "missing")
+
+    deployed: dict[str, tuple[int, int]] = {}
+    pending = [(os.fspath(target_claude), "")]
+    while pending:
+        directory, prefix = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                for dir_entry in it:
+                    st = dir_entry.stat()
+                    if stat.S_ISDIR(st.st_mode):
+                        pending.append((dir_entry.path, prefix + dir_entry.name + "/"))
+                    else:
+                        deployed[prefix + dir_entry.name] = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            continue
+
+    changed = missing = 0
+    for entry in tree.files:
+        found = deployed.pop(entry.path, None)
+        if found is None:
+            missing += 1
+        elif entry.path not in rendered and found != (entry.size, entry.mtime_ns):
+            changed += 1
+    extra = len(deployed)
+
+    if not (changed or missing or extra):
+        return DiscoveredProject(str(project), "current")
+    counts = [f"{n} {label}" for n, label in
+              ((changed, "changed"), (missing, "missing"), (extra, "extra")) if n]
+    return DiscoveredProject(str(project), "stale", ", ".join(counts))
+
+
+def discover_projects(
+    roots: list[Path],
+    source: Path | SourceTree,
+    max_depth: int = 6,
+    jobs: int = 32,
+    cache: DiscoveryCache | None = None,
+    rendered_patterns: tuple[str, ...] = (),
+    recorded: dict[str, str] | None = None,
+    profiles: dict[str, InstallProfile] | None = None,
+) -> list[DiscoveredProject]:
+    """
+    find project roots below roots and classify each against the source.
+
+    args:
+        roots: directories to search
+        source: source .claude/ directory, pack file or snapshot
+        max_depth: passed through to find_projects
+        jobs: concurrent listings and classifications
+        cache: passed through to find_projects
+        rendered_patterns: globs of files deployed with templates, whose
+            content is expected to differ from the source
+        recorded: resolved project path -> install profile it was deployed
+            with (see DeployRegistry.entries()); those projects are
+            classified against that profile's part of the source
+        profiles: install profiles for recorded (default: load_profiles())
+
+    returns:
+        discovered projects, sorted by path
+    """
+    projects = find_projects(roots, max_depth=max_depth, jobs=jobs, cache=cache)
+    recorded = recorded or {}
+    with _opened(source) as tree:
+        views = {"": tree}
+        names = sorted(set(recorded.values()) - {""})
+        if names:
+            views.update(
+                (name, view) for name, (view, _) in
+                profile_sources(tree, None, names, profiles).items()
+            )
+        stage = TemplateStage(patterns=rendered_patterns)
+        rendered = {name: stage.rendered_paths(view) for name, view in views.items()}
+
+        def classify(project: Path) -> DiscoveredProject:
+            # a profile that no longer exists falls back to the full tree
+            name = recorded.get(str(project), "")
+            name = name if name in views else ""
+            return classify_project(project, views[name], rendered[name])
+
+        with trace_phase("classify", projects=len(projects)) as phase, \
+                ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            results = list(pool.map(classify, projects))
+            phase.files = len(results)
+    return results
+
+
+REGISTRY_NAME = "registry.sqlite3"
+
+_REGISTRY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deployments (
+    target TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    version TEXT NOT NULL,
+    deployed_at REAL NOT NULL,
+    files INTEGER NOT NULL,
+    signature TEXT NOT NULL,
+    rendered TEXT NOT NULL,
+    profile TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS deployments_source ON deployments (source);
+"""
+
+_REGISTRY_COLUMNS = "target, source, version, deployed_at, files, signature, rendered, profile"
+
+
+def get_source_version(manifest: Manifest | None = None) -> str:
+    """version of the source: the manifest's, else version.txt next to this script."""
+    if manifest is not None and manifest.version:
+        return manifest.version
+    version_file = Path(__file__).parent / "version.txt"
+    try:
+        return version_file.read_text().strip()
+    except OSError:
+        return ""
+
+
+def source_digest(tree: SourceTree, manifest: Manifest | None = None) -> str:
+    """
+    id of the source content: the manifest digest when there is one, else
+    a digest of every entry's size, mtime and mode.
+    """
+    if manifest is not None:
+        return manifest.digest
+    return _fingerprint_digest(source_fingerprint(tree))
+
+
+def deployed_signature(target_claude: Path) -> str:
+    """
+    digest of the path, size, mtime and mode of everything in a deployed
+    .claude/ - metadata only, nothing is read. "" if it is not a directory.
+    """
+    if not target_claude.is_dir():
+        return ""
+    digest = hashlib.blake2b(digest_size=16)
+    pending = [(os.fspath(target_claude), "")]
+    while pending:
+        directory, prefix = pending.pop()
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        for dir_entry in entries:
+            st = dir_entry.stat(follow_symlinks=False)
+            rel = prefix + dir_entry.name
+            if stat.S_ISDIR(st.st_mode):
+                digest.update(f"{rel}/\0{st.st_mode:o}\n".encode())
+                pending.append((dir_entry.path, rel + "/"))
+            else:
+                digest.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\0{st.st_mode:o}\n".encode())
+    return digest.hexdigest()
+
+
+@dataclass
+class RegistryEntry:
+    """one recorded deployment."""
+
+    target: str
+    source: str  # source_digest() of what was deployed
+    version: str
+    deployed_at: float
+    files: int
+    signature: str  # deployed_signature() right after the deploy
+    rendered: list[str] = field(default_factory=list)
+    profile: str = ""  # install profile, "" for the full tree
+
+
+class DeployRegistry:
+    """
+    sqlite record of where .claude/ was deployed and what each target got.
+
+    one row per target, replaced on every successful deploy, so "which
+    targets are outdated" is an indexed query instead of a walk over every
+    target. safe to share between deploy threads.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path or get_state_dir() / REGISTRY_NAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_REGISTRY_SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(deployments)")}
+        if "profile" not in columns:
+            with self._db:
+                self._db.execute(
+                    "ALTER TABLE deployments ADD COLUMN profile TEXT NOT NULL DEFAULT ''"
+                )
+        # (tree, manifest, digest) of the last recorded source
+        self._source: tuple[SourceTree, Manifest | None, str] | None = None
+
+    def record(self, entry: RegistryEntry) -> None:
+        """insert or replace the row for entry.target."""
+        with self._lock, self._db:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO deployments ({_REGISTRY_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (entry.target, entry.source, entry.version, entry.deployed_at,
+                 entry.files, entry.signature, json.dumps(entry.rendered), entry.profile),
+            )
+
+    def record_deploy(
+        self,
+        target: Path,
+        tree: SourceTree,
+        manifest: Manifest | None = None,
+        rendered: frozenset[str] = frozenset(),
+    ) -> RegistryEntry:
+        """record a successful deploy of tree (a ProfileView for a profile) into target."""
+        with self._lock:
+            # a batch deploys one tree many times, digest it once
+            if self._source is None or self._source[0] is not tree or self._source[1] is not manifest:
+                self._source = (tree, manifest, source_digest(tree, manifest))
+            digest = self._source[2]
+        entry = RegistryEntry(
+            str(target.resolve()), digest, get_source_version(manifest), time.time(),
+            len(tree.files), deployed_signature(target / ".claude"), sorted(rendered),
+            tree.profile.name if isinstance(tree, ProfileView) else "",
+        )
+        self.record(entry)
+        return entry
+
+    def update_signature(self, target: str, signature: str) -> None:
+        """store a new signature for a target whose content was re-verified."""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE deployments SET signature = ? WHERE target = ?", (signature, target)
+            )
+
+    def forget(self, targets: list[str]) -> None:
+        """drop the rows for targets."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM deployments WHERE target = ?", [(target,) for target in targets]
+            )
+
+    def profiles(self) -> list[str]:
+        """install profiles that have recorded deployments."""
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT profile FROM deployments").fetchall()
+        return sorted(row[0] for row in rows)
+
+    def entries(self, outdated_from: dict[str, str] | None = None) -> list[RegistryEntry]:
+        """
+        recorded deployments, sorted by target.
+
+        args:
+            outdated_from: current source digest per profile; if given,
+                only targets deployed from another digest are returned
+        """
+        query = f"SELECT {_REGISTRY_COLUMNS} FROM deployments"
+        params: list[str] = []
+        if outdated_from:
+            pairs = ", ".join("(?, ?)" for _ in outdated_from)
+            query += f" WHERE (profile, source) NOT IN (VALUES {pairs})"
+            for profile, digest in outdated_from.items():
+                params.extend((profile, digest))
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY target", params).fetchall()
+        return [RegistryEntry(*row[:6], json.loads(row[6]), row[7]) for row in rows]
+
+    def close(self) -> None:
+        """close the database."""
+        self._db.close()
+
+    def __enter__(self) -> DeployRegistry:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+@dataclass
+class DoctorResult:
+    """outcome of re-checking one registered target."""
+
+    target: str
+    status: str  # "ok", "verified", "drifted" or "missing"
+    outdated: bool
+    message: str = ""
+
+
+def profile_sources(
+    tree: SourceTree,
+    manifest: Manifest | None,
+    names: list[str],
+    profiles: dict[str, InstallProfile] | None = None,
+) -> dict[str, tuple[SourceTree, Manifest | None]]:
+    """
+    source view and manifest for each install profile name ("" = full tree).
+
+    names that are not (or no longer) valid profiles are left out.
+    """
+    profiles = profiles if profiles is not None else load_profiles()
+    sources: dict[str, tuple[SourceTree, Manifest | None]] = {}
+    for name in names:
+        if name and name not in profiles:
+            continue
+        try:
+            sources[name] = select_profile(tree, manifest, profiles[name] if name else None)
+        except ProfileError:
+            continue
+    return sources
+
+
+def _doctor_target(
+    registry: DeployRegistry,
+    entry: RegistryEntry,
+    get_manifest: Callable[[str], Manifest],
+    current: str | None,
+) -> DoctorResult:
+    """re-check one target, verifying content only if its signature moved."""
+    # current is None when the target's profile no longer exists
+    outdated = entry.source != current
+    target_claude = Path(entry.target) / ".claude"
+    try:
+        signature = deployed_signature(target_claude)
+    except OSError as e:
+        return DoctorResult(entry.target, "missing", outdated, str(e))
+    if not signature:
+        return DoctorResult(entry.target, "missing", outdated, ".claude/ not found")
+    if signature == entry.signature:
+        return DoctorResult(entry.target, "ok", outdated)
+    if outdated:
+        # deployed from another source, nothing to verify it against
+        return DoctorResult(entry.target, "drifted", outdated, "changed since deploy")
+
+    result = verify_manifest(
+        target_claude, get_manifest(entry.profile), rendered=frozenset(entry.rendered)
+    )
+    if not result.ok:
+        problems = result.missing + result.mismatched
+        return DoctorResult(
+            entry.target, "drifted", outdated,
+            f"{len(problems)} files differ, e.g. {', '.join(problems[:3])}",
+        )
+    registry.update_signature(entry.target, signature)
+    return DoctorResult(entry.target, "verified", outdated, "metadata changed, content matches")
+
+
+def doctor(
+    registry: DeployRegistry,
+    source: Path | SourceTree,
+    manifest: Manifest | None = None,
+    jobs: int = 16,
+    profiles: dict[str, InstallProfile] | None = None,
+) -> list[DoctorResult]:
+    """
+    re-check every registered target against what was recorded.
+
+    a metadata walk of each target is compared with the signature taken
+    at deploy time; only targets where it changed have their content
+    verified, and those that still match get their signature refreshed.
+
+    args:
+        registry: deployment registry
+        source: source .claude/ directory, pack file or snapshot
+        manifest: manifest of source; without one, the source is hashed
+            the first time a target needs verifying
+        jobs: targets checked concurrently
+        profiles: install profiles targets were deployed with (default:
+            load_profiles()); each target is checked against its profile
+
+    returns:
+        one result per registered target, sorted by target
+    """
+    entries = registry.entries()
+    with _opened(source) as tree:
+        sources = profile_sources(tree, manifest, registry.profiles(), profiles)
+        current = {name: source_digest(*selected) for name, selected in sources.items()}
+        lock = threading.Lock()
+        built: dict[str, Manifest] = {}
+
+        def get_manifest(profile: str) -> Manifest:
+            with lock:
+                if profile not in built:
+                    view, selected = sources[profile]
+                    built[profile] = selected if selected is not None else build_manifest(view)
+                return built[profile]
+
+        with trace_phase("doctor", targets=len(entries)) as phase, \
+                ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            results = list(pool.map(
+                lambda entry: _doctor_target(
+                    registry, entry, get_manifest, current.get(entry.profile)
+                ),
+                entries,
+            ))
+            phase.files = len(results)
+    return results
+
+
+def _add_profile_args(parser: argparse.ArgumentParser) -> None:
+    """--install-profile and --profiles-file, shared by deploy and discover."""
+    parser.add_argument(
+        "--install-profile", metavar="NAME",
+        help="install only the commands, skills and hooks of this profile (see `profiles`)",
+    )
+    parser.add_argument(
+        "--profiles-file", type=Path,
+        help=f"install profiles (default: bundled {PROFILES_NAME})",
+    )
+
+
+def _cli_install_profile(args: argparse.Namespace) -> InstallProfile | None:
+    """the profile named by --install-profile, or None."""
+    if not args.install_profile:
+        return None
+    profiles = load_profiles(args.profiles_file)
+    if args.install_profile not in profiles:
+        raise ProfileError(
+            f"unknown install profile {args.install_profile!r} "
+            f"(available: {', '.join(sorted(profiles))})"
+        )
+    return profiles[args.install_profile]
+
+
+def run_deploy_cli(argv: list[str]) -> int:
+    """
+    headless `deploy` command: copy .claude/ to many targets in parallel.
+
+    per-target results go to stderr as they finish, the json summary goes
+    to stdout (or --json file).
+
+    returns:
+        exit code - 0 if every target succeeded, 1 otherwise
+    """
+    parser = argparse.ArgumentParser(
+        prog="claude_setup.py deploy",
+        description="copy .claude/ to many project directories without the gui.",
+    )
+    parser.add_argument("targets", nargs="*", type=Path, help="target project directories")
+    parser.add_argument("--targets-file", type=Path, help="file with one target per line")
+    parser.add_argument("--source", type=Path, help="source .claude/ directory or pack file")
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=min(32, (os.cpu_count() or 1) + 4),
+        help="number of concurrent deploys",
+    )
+    parser.add_argument(
+        "--copy-jobs", type=int, metavar="N",
+        help="files copied concurrently within each target (default: 1 with --jobs > 1, "
+             f"else {COPY_JOBS_NETWORK} on network filesystems and {COPY_JOBS_LOCAL} otherwise)",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--overwrite", action="store_true", help="replace existing .claude/")
+    mode.add_argument("--sync", action="store_true", help="update existing .claude/ incrementally")
+    parser.add_argument("--json", type=Path, help="write json summary to this file")
+    parser.add_argument(
+        "--manifest", type=Path,
+        help="verify against this manifest (default: bundled manifest, if any)",
+    )
+    parser.add_argument(
+        "--strategy", choices=list(COPY_STRATEGIES), default="auto",
+        help="file copy strategy; hardlink is for read-only installs only",
+    )
+    parser.add_argument(
+        "--profile", type=Path,
+        help=f"write a per-phase trace here (.json: chrome trace, else json lines; "
+             f"also ${PROFILE_ENV})",
+    )
+    parser.add_argument(
+        "--registry", type=Path,
+        help=f"record deploys here (default: ${STATE_DIR_ENV} or ~/.claude-setup, {REGISTRY_NAME})",
+    )
+    parser.add_argument("--no-registry", action="store_true", help="do not record deploys")
+    _add_profile_args(parser)
+    shared = parser.add_argument_group(
+        "object store",
+        "keep each file once in a shared store and link it into every target",
+    )
+    shared.add_argument("--store", action="store_true", help="link files from the object store")
+    shared.add_argument(
+        "--store-dir", type=Path,
+        help=f"object store (default: ${STATE_DIR_ENV} or ~/.claude-setup, {STORE_NAME}; "
+             "implies --store)",
+    )
+    shared.add_argument(
+        "--store-link", choices=STORE_LINKS, default="hardlink",
+        help="hardlink shares inodes (edits in one target change all); reflink shares "
+             "blocks only, where the filesystem supports it (implies --store)",
+    )
+    kept = parser.add_argument_group(
+        "generations",
+        "keep replaced .claude/ trees for `generations rollback`; unchanged files are "
+        "reflinked to the live tree where the filesystem supports it",
+    )
+    kept.add_argument(
+        "--keep-generations", type=int, default=0, metavar="N",
+        help="previous trees to keep per target (default 0: none)",
+    )
+    render = parser.add_argument_group(
+        "templates",
+        "render {{ name }} placeholders in settings.json and CLAUDE*.md per target "
+        "(built-in: project_name, project_dir, python_version, date)",
+    )
+    render.add_argument("--render", action="store_true", help="enable template rendering")
+    render.add_argument(
+        "--var", action="append", default=[], metavar="NAME=VALUE",
+        help="set a variable for every target (repeatable; implies --render)",
+    )
+    render.add_argument(
+        "--vars-file", type=Path,
+        help='json object mapping target paths (or "*" for all) to variables; '
+             "implies --render",
+    )
+    render.add_argument(
+        "--template", action="append", default=[], metavar="PATTERN",
+        help="glob of files to render, relative to .claude/ (repeatable; "
+             f"default: {' '.join(TEMPLATE_PATTERNS)}; implies --render)",
+    )
+    args = parser.parse_args(argv)
+
+    targets = list(args.targets)
+    if args.targets_file:
+        targets.extend(read_targets_file(args.targets_file))
+    if not targets:
+        parser.error("no targets given")
+
+    templates = None
+    if args.render or args.var or args.vars_file or args.template:
+        per_target: dict[str, dict[str, str]] = {}
+        if args.vars_file:
+            try:
+                per_target = read_vars_file(args.vars_file)
+            except (OSError, ValueError) as e:
+                print(f"error: cannot read {args.vars_file}: {e}", file=sys.stderr)
+                return 2
+        variables = per_target.pop("*", {})
+        for item in args.var:
+            name, sep, value = item.partition("=")
+            if not sep or not name:
+                parser.error(f"--var expects NAME=VALUE, got {item!r}")
+            variables[name] = value
+        templates = TemplateStage(
+            variables, per_target, args.template or TEMPLATE_PATTERNS
+        )
+
+    try:
+        source = args.source or get_source()
+        install_profile = _cli_install_profile(args)
+    except (OSError, ProfileError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    if args.manifest:
+        try:
+            manifest: Manifest | None = Manifest.from_json(args.manifest.read_text())
+        except (OSError, ValueError) as e:
+            print(f"error: cannot read {args.manifest}: {e}", file=sys.stderr)
+            return 2
+    elif args.source is None:
+        manifest = get_source_manifest()
+    else:
+        manifest = None
+
+    def report(deploy_result: DeployResult) -> None:
+        print(
+            f"[{deploy_result.status}] {deploy_result.target} - "
+            f"{deploy_result.message} ({deploy_result.elapsed:.2f}s, "
+            f"{deploy_result.strategy})",
+            file=sys.stderr,
+        )
+
+    generations = None
+    if args.keep_generations > 0:
+        generations = GenerationPolicy(args.keep_generations)
+
+    store = None
+    if args.store or args.store_dir or args.store_link != "hardlink":
+        store = ObjectStore(args.store_dir, args.store_link)
+
+    registry = None
+    if not args.no_registry:
+        try:
+            registry = DeployRegistry(args.registry)
+        except (OSError, sqlite3.Error) as e:
+            print(f"warning: deploys will not be recorded: {e}", file=sys.stderr)
+
+    tracer = start_trace(args.profile) if args.profile else _tracer
+    start = time.perf_counter()
+    try:
+        with _opened(source) as tree:
+            selected, selected_manifest = select_profile(tree, manifest, install_profile)
+            results = deploy_many(
+                selected, targets, jobs=args.jobs, overwrite=args.overwrite,
+                sync=args.sync, on_result=report, manifest=selected_manifest,
+                strategy=args.strategy, templates=templates, registry=registry,
+                copy_jobs=args.copy_jobs, store=store, generations=generations,
+            )
+    except ProfileError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if registry is not None:
+            registry.close()
+    elapsed = time.perf_counter() - start
+    if tracer is not None:
+        # let retired trees finish so their removal shows up in the trace
+        wait_for_cleanup()
+
+    counts: dict[str, int] = {}
+    for deploy_result in results:
+        counts[deploy_result.status] = counts.get(deploy_result.status, 0) + 1
+
+    summary = {
+        "source": str(source),
+        "profile": install_profile.name if install_profile else "full",
+        "manifest": selected_manifest.digest if selected_manifest else None,
+        "total": len(results),
+        "counts": counts,
+        "elapsed": round(elapsed, 3),
+        "results": [asdict(deploy_result) for deploy_result in results],
+    }
+    if tracer is not None:
+        summary["phases"] = {
+            name: {key: round(value, 6) for key, value in total.items()}
+            for name, total in tracer.totals.items()
+        }
+        if args.profile:
+            stop_trace()
+    output = json.dumps(summary, indent=2)
+    if args.json:
+        args.json.write_text(output + "\n")
+    else:
+        print(output)
+
+    return 0 if all(deploy_result.ok for deploy_result in results) else 1
+
+
+def run_discover_cli(argv: list[str]) -> int:
+    """
+    `discover` command: find projects below roots and report their .claude/ state.
+
+    with --paths only the matching project paths are printed, one per line,
+    so the output can be piped into `deploy --targets-file -`.
+
+    returns:
+        exit code - 0, or 2 if the source cannot be found
+    """
+    parser = argparse.ArgumentParser(
+        prog="claude_setup.py discover",
+        description="find project roots and classify them as missing, current or stale.",
+    )
+    parser.add_argument("roots", nargs="+", type=Path, help="directories to search, e.g. ~/src")
+    parser.add_argument("--source", type=Path, help="source .claude/ directory or pack file")
+    parser.add_argument("--jobs", "-j", type=int, default=32, help="concurrent directory listings")
+    parser.add_argument("--max-depth", type=int, default=6, help="directory levels to search")
+    parser.add_argument(
+        "--only", nargs="+", choices=("missing", "current", "stale"),
+        help="only report projects with these statuses",
+    )
+    parser.add_argument("--paths", action="store_true", help="print bare project paths")
+    parser.add_argument("--json", action="store_true", help="print json instead of a table")
+    parser.add_argument(
+        "--cache", type=Path,
+        help=f"directory cache (default: ${STATE_DIR_ENV} or ~/.claude-setup, {DISCOVER_CACHE_NAME})",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="list every directory afresh")
+    parser.add_argument(
+        "--render", action="store_true",
+        help="targets were deployed with `deploy --render`; rendered files only have to exist",
+    )
+    parser.add_argument(
+        "--template", action="append", default=[], metavar="PATTERN",
+        help="rendered files, as given to `deploy --template` (implies --render)",
+    )
+    parser.add_argument(
+        "--registry", type=Path,
+        help="deployment registry whose recorded install profiles are honoured "
+             f"(default: ${STATE_DIR_ENV} or ~/.claude-setup, {REGISTRY_NAME})",
+    )
+    _add_profile_args(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        source = args.source or get_source()
+        install_profile = _cli_install_profile(args)
+    except (OSError, ProfileError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    cache_path = None if args.no_cache else args.cache or get_state_dir() / DISCOVER_CACHE_NAME
+    cache = DiscoveryCache(cache_path)
+
+    # each deployed target is compared with the profile it was deployed
+    # with, unless --install-profile names one for every project
+    recorded: dict[str, str] = {}
+    registry_path = args.registry or get_state_dir() / REGISTRY_NAME
+    if install_profile is None and registry_path.exists():
+        try:
+            with DeployRegistry(registry_path) as registry:
+                recorded = {entry.target: entry.profile for entry in registry.entries()}
+        except (OSError, sqlite3.Error) as e:
+            print(f"warning: cannot read registry {registry_path}: {e}", file=sys.stderr)
+
+    try:
+        with _opened(source) as tree:
+            selected, _ = select_profile(tree, None, install_profile)
+            results = discover_projects(
+                args.roots, selected, max_depth=args.max_depth, jobs=args.jobs, cache=cache,
+                rendered_patterns=(
+                    tuple(args.template) or (TEMPLATE_PATTERNS if args.render else ())
+                ),
+                recorded=recorded,
+                profiles=load_profiles(args.profiles_file) if recorded else None,
+            )
+    except (OSError, ProfileError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    if args.only:
+        results = [result for result in results if result.status in args.only]
+
+    if args.json:
+        print(json.dumps([asdict(result) for result in results], indent=2))
+    elif args.paths:
+        for result in results:
+            print(result.path)
+    else:
+        for result in results:
+            detail = f" - {result.message}" if result.message else ""
+            print(f"{result.status:<8} {result.path}{detail}")
+    return 0
+
+
+def _registry_sources(args: argparse.Namespace) -> tuple[Path, Manifest | None]:
+    """source and manifest for status/doctor, resolved as deploy does."""
+    source = args.source or get_source()
+    if args.manifest:
+        return source, Manifest.from_json(args.manifest.read_text())
+    return source, get_source_manifest() if args.source is None else None
+
+
+def _add_registry_args(parser: argparse.ArgumentParser) -> None:
+    """options shared by the status and doctor commands."""
+    parser.add_argument(
+        "--registry", type=Path,
+        help=f"deployment registry (default: ${STATE_DIR_ENV} or ~/.claude-setup, {REGISTRY_NAME})",
+    )
+    parser.add_argument("--source", type=Path, help="source .claude/ directory or pack file")
+    parser.add_argument(
+        "--manifest", type=Path,
+        help="manifest of the source (default: bundled manifest, if any)",
+    )
+    parser.add_argument(
+        "--profiles-file", type=Path,
+        help=f"install profiles targets were deployed with (default: bundled {PROFILES_NAME})",
+    )
+    parser.add_argument("--paths", action="store_true", help="print bare target paths")
+    parser.add_argument("--json", action="store_true", help="print json instead of a table")
+
+
+def run_status_cli(argv: list[str]) -> int:
+    """
+    `status` command: list recorded deployments and which are outdated.
+
+    answered from the registry alone - no target is read.
+
+    returns:
+        exit code - 0, or 2 if the source cannot be found
+    """
+    parser = argparse.ArgumentParser(
+        prog="claude_setup.py status",
+        description="show where .claude/ was deployed and which targets are outdated.",
+    )
+    _add_registry_args(parser)
+    parser.add_argument("--outdated", action="store_true", help="only outdated targets")
+    args = parser.parse_args(argv)
+
+    try:
+        source, manifest = _registry_sources(args)
+        profiles = load_profiles(args.profiles_file)
+    except (OSError, ValueError) as e:  # ProfileError is a ValueError
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    with DeployRegistry(args.registry) as registry:
+        # one digest per install profile in use; the rows are then an indexed query
+        with snapshot_source(source) as tree:
+            sources = profile_sources(tree, manifest, registry.profiles(), profiles)
+            current = {name: source_digest(*selected) for name, selected in sources.items()}
+        entries = registry.entries(outdated_from=current if args.outdated else None)
+
+    def outdated(entry: RegistryEntry) -> bool:
+        return entry.source != current.get(entry.profile)
+
+    if args.json:
+        print(json.dumps(
+            [dict(asdict(entry), outdated=outdated(entry)) for entry in entries], indent=2,
+        ))
+    elif args.paths:
+        for entry in entries:
+            print(entry.target)
+    else:
+        for entry in entries:
+            state = "outdated" if outdated(entry) else "current"
+            deployed = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.deployed_at))
+            print(
+                f"{state:<8} {entry.version or '-':<8} {entry.profile or 'full':<10} "
+                f"{deployed}  {entry.target}"
+            )
+    return 0
+
+
+def run_doctor_cli(argv: list[str]) -> int:
+    """
+    `doctor` command: re-check registered targets, verifying only those
+    whose files changed since they were deployed.
+
+    returns:
+        exit code - 0 if every target is intact, 1 otherwise
+    """
+    parser = argparse.ArgumentParser(
+        prog="claude_setup.py doctor",
+        description="find registered targets whose .claude/ was modified or removed.",
+    )
+    _add_registry_args(parser)
+    parser.add_argument("--jobs", "-j", type=int, default=16, help="targets checked concurrently")
+    parser.add_argument(
+        "--forget-missing", action="store_true",
+        help="drop targets whose .claude/ no longer exists from the registry",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        source, manifest = _registry_sources(args)
+        profiles = load_profiles(args.profiles_file)
+    except (OSError, ValueError) as e:  # ProfileError is a ValueError
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    with DeployRegistry(args.registry) as registry:
+        results = doctor(registry, source, manifest, jobs=args.jobs, profiles=profiles)
+        if args.forget_missing:
+            registry.forget([result.target for result in results if result.status == "missing"])
+
+    problems = [result for result in results if result.status in ("drifted", "missing")]
+    if args.json:
+        print(json.dumps([asdict(result) for result in results], indent=2))
+    elif args.paths:
+        for result in problems:
+            print(result.target)
+    else:
+        for result in results:
+            outdated = " (outdated)" if result.outdated else ""
+            detail = f" - {result.message}" if result.message else ""
+            print(f"{result.status:<8} {result.target}{outdated}{detail}")
+    return 1 if problems else 0
+
+
+def run_profiles_cli(argv: list[str]) -> int:
+    """
+    `profiles` command: list install profiles and what each would install.
+
+    returns:
+        exit code - 0 if every profile matches the source, 1 otherwise
+    """
+    parser = argparse.ArgumentParser(
+        prog="claude_setup.py profiles",
+        description="list install profiles with the files each selects from the source.",
+    )
+    parser.add_argument("--source", type=Path, help="source .claude/ directory or pack file")
+    parser.add_argument(
+        "--profiles-file", type=Path,
+        help=f"install profiles (default: bundled {PROFILES_NAME})",
+    )
+    parser.add_argument("--json", action="store_true", help="print json instead of a table")
+    args = parser.parse_args(argv)
+
+    try:
+        source = args.source or get_source()
+        profiles = load_profiles(args.profiles_file)
+    except (OSError, ProfileError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    rows = []
+    with snapshot_source(source) as tree:
+        index = source_index(tree)
+        for profile in profiles.values():
+            row: dict[str, object] = {"name": profile.name, "description": profile.description}
+            try:
+                selected, _ = select_profile(tree, None, profile)
+            except ProfileError as e:
+                row["error"] = str(e)
+            else:
+                row.update(files=len(selected.files), bytes=selected.total_bytes)
+            rows.append(row)
+
+    if args.json:
+        print(json.dumps({"profiles": rows, "available": index}, indent=2))
+    else:
+        for row in rows:
+            size = f"{row['files']:>5} files" if "error" not in row else "invalid"
+            print(f"{row['name']:<16} {size:<12} {row.get('error') or row['description']}")
+        for kind, names in index.items():
+            print(f"\n{kind}: {', '.join(names) or '-'}")
+    return 0 if all("error" not in row for row in rows) else 1
+
+
+def run_generations_cli(argv: list[str]) -> int:
+    """
+    `generations` command: list, roll back to or prune kept .claude/ trees.
+
+    returns:
+        exit code - 0, or 1 if a rollback or prune failed
+    """
+    parser = argparse.ArgumentParser(
+        prog="claude_setup.py generations",
+        description="manage previous .claude/ trees kept by deploy --keep-generations.",
+    )
+    parser.add_argument("action", choices=["list", "rollback", "prune"])
+    parser.add_argument("targets", nargs="*", type=Path, help="target project directories")
+    parser.add_argument("--targets-file", type=Path, help="file with one target per line")
+    parser.add_argument(
+        "--to", metavar="NAME", help="rollback: generation to restore (default: newest)"
+    )
+    parser.add_argument(
+        "--keep", type=int, default=GenerationPolicy.keep,
+        help=f"generations to keep per target (default {GenerationPolicy.keep})",
+    )
+    parser.add_argument(
+        "--max-age", type=float, metavar="DAYS", help="prune: also drop generations older than this"
+    )
+    parser.add_argument(
+        "--registry", type=Path,
+        help="rollback: mark targets as rolled back here; prune: targets to use when none "
+             f"are given (default: ${STATE_DIR_ENV} or ~/.claude-setup, {REGISTRY_NAME})",
+    )
+    parser.add_argument("--jobs", "-j", type=int, default=8, help="targets pruned concurrently")
+    parser.add_argument("--json", action="store_true", help="print json")
+    args = parser.parse_args(argv)
+
+    targets = list(args.targets)
+    if args.targets_file:
+        targets.extend(read_targets_file(args.targets_file))
+    if not targets and args.action == "prune":
+        with DeployRegistry(args.registry) as registry:
+            targets = [Path(entry.target) for entry in registry.entries()]
+    if not targets:
+        parser.error("no targets given")
+    if args.action == "rollback" and len(targets) != 1 and args.to:
+        parser.error("--to needs exactly one target")
+
+    try:
+        policy = GenerationPolicy(
+            args.keep, args.max_age * 86400 if args.max_age is not None else None
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    failed = False
+    rows: list[dict[str, object]] = []
+    if args.action == "list":
+        for target in targets:
+            for generation in list_generations(target):
+                rows.append({
+                    "target": str(target), "name": generation.name,
+                    "created": generation.created, "reason": generation.reason,
+                })
+        lines = [f"{row['target']}  {row['name']}" for row in rows] or ["no generations"]
+    elif args.action == "rollback":
+        lines = []
+        with DeployRegistry(args.registry) as registry:
+            recorded = {entry.target: entry for entry in registry.entries()}
+            for target in targets:
+                try:
+                    restored, replaced = rollback(target, args.to, policy)
+                except OSError as e:
+                    failed = True
+                    rows.append({"target": str(target), "error": str(e)})
+                    lines.append(f"{target}: error: {e}")
+                    continue
+                rows.append({
+                    "target": str(target), "restored": restored.name,
+                    "kept": replaced.name if replaced else None,
+                })
+                lines.append(f"{target}: restored {restored.name}" + (
+                    f", previous tree kept as {replaced.name}" if replaced else ""
+                ))
+                entry = recorded.get(str(target.resolve()))
+                if entry is not None:
+                    # the source of the restored tree is unknown: "" keeps
+                    # it outdated in `status` until the next deploy
+                    registry.record(replace(
+                        entry, source="", version=f"rollback {restored.name}",
+                        deployed_at=time.time(),
+                        signature=deployed_signature(target.resolve() / ".claude"),
+                    ))
+    else:
+        counts: list[int] = []
+
+        def prune(target: Path) -> dict[str, object]:
+            try:
+                pruned = prune_generations(target, policy)
+            except OSError as e:
+                return {"target": str(target), "error": str(e)}
+            counts.append(len(pruned))
+            return {"target": str(target), "pruned": [g.name for g in pruned]}
+
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            rows = list(pool.map(prune, targets))
+        failed = any("error" in row for row in rows)
+        lines = [f"{row['target']}: error: {row['error']}" for row in rows if "error" in row]
+        lines.append(f"pruned {sum(counts)} generations from {len(targets)} targets")
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print("\n".join(lines))
+    return 1 if failed else 0
+
+
+def run_store_cli(argv: list[str]) -> int:
+    """
+    `store` command: inspect and maintain the shared object store.
+
+    returns:
+        exit code - 0, or 1 if verify found bad objects
+    """
+    parser = argparse.ArgumentParser(
+        prog="claude_setup.py store",
+        description="show, garbage collect or verify the object store used by deploy --store.",
+    )
+    parser.add_argument("action", choices=["stats", "gc", "verify"])
+    parser.add_argument(
+        "--store-dir", type=Path,
+        help=f"object store (default: ${STATE_DIR_ENV} or ~/.claude-setup, {STORE_NAME})",
+    )
+    parser.add_argument(
+        "--grace", type=float, default=3600.0, metavar="SECONDS",
+        help="gc: keep unreferenced objects whose links changed this recently (default 3600)",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="gc: only report what would go")
+    parser.add_argument("--delete", action="store_true", help="verify: remove bad objects")
+    parser.add_argument("--jobs", "-j", type=int, default=4, help="verify: hashing threads")
+    parser.add_argument("--json", action="store_true", help="print json")
+    args = parser.parse_args(argv)
+
+    store = ObjectStore(args.store_dir)
+    if args.action == "stats":
+        result: dict[str, object] = asdict(store.stats())
+        lines = [
+            f"{result['objects']} objects, {result['bytes']} bytes in {store.root}",
+            f"{result['links']} linked target files, {result['saved_bytes']} bytes saved",
+            f"{result['unreferenced']} unreferenced",
+        ]
+    elif args.action == "gc":
+        removed, freed = store.gc(args.grace, dry_run=args.dry_run)
+        result = {"removed": removed, "freed_bytes": freed, "dry_run": args.dry_run}
+        verb = "would remove" if args.dry_run else "removed"
+        lines = [f"{verb} {removed} unreferenced objects, {freed} bytes"]
+    else:
+        problems = store.verify(args.jobs, delete=args.delete)
+        result = {"problems": problems, "deleted": args.delete}
+        lines = [f"bad: {name}: {problem}" for name, problem in problems.items()]
+        deleted = ", deleted" if problems and args.delete else ""
+        lines.append(f"{len(problems)} bad objects{deleted}")
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print("\n".join(lines))
+    return 1 if args.action == "verify" and result["problems"] else 0
+
+
+def run_manifest_cli(argv: list[str]) -> int:
+    """
+    `manifest` command: write the content manifest of a .claude/ tree.
+
+    run at build time so the bundle ships a precomputed manifest.
+    """
+    parser = argparse.ArgumentParser(
+        prog="claude_setup.py manifest",
+        description="hash the source .claude/ tree into a manifest file.",
+    )
+    parser.add_argument("--source", type=Path, help="source .claude/ directory")
+    parser.add_argument(
+        "--output", "-o", type=Path,
+        default=Path("build") / MANIFEST_NAME, help="manifest file to write",
+    )
+    parser.add_argument("--version", default="", help="version to record (default: version.txt)")
+    args = parser.parse_args(argv)
+
+    try:
+        source = args.source or get_source_claude_dir()
+    except FileNotFoundError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    version = args.version or get_source_version()
+
+    manifest = write_manifest(source, args.output, version)
+    print(
+        f"wrote {args.output}: {len(manifest.entries)} files, "
+        f"{manifest.total_bytes} bytes, digest {manifest.digest}"
+    )
+    return 0
+
+
+def run_pack_cli(argv: list[str]) -> int:
+    """
+    `pack` command: pack the .claude/ tree into one compressed file.
+
+    run at build time; the bundle then ships the pack instead of loose files.
+    """
+    parser = argparse.ArgumentParser(
+        prog="claude_setup.py pack",
+        description="pack the source .claude/ tree into a single zip.",
+    )
+    parser.add_argument("--source", type=Path, help="source .claude/ directory")
+    parser.add_argument(
+        "--output", "-o", type=Path,
+        default=Path("build") / PACK_NAME, help="pack file to write",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        source = args.source or get_source_claude_dir()
+    except FileNotFoundError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    count = pack_claude_folder(source, args.output)
+    print(f"wrote {args.output}: {count} files, {args.output.stat().st_size} bytes")
+    return 0
+
+
+def run_verify_cli(argv: list[str]) -> int:
+    """
+    `verify` command: check deployed .claude/ folders against a manifest.
+
+    returns:
+        exit code - 0 if every target matches, 1 otherwise
+    """
+    parser = argparse.ArgumentParser(
+        prog="claude_setup.py verify",
+        description="verify deployed .claude/ folders against a manifest.",
+    )
+    parser.add_argument("targets", nargs="+", type=Path, help="target project directories")
+    parser.add_argument("--manifest", type=Path, help="manifest file (default: bundled)")
+    parser.add_argument("--jobs", "-j", type=int, default=4, help="hashing threads per target")
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        try:
+            manifest = Manifest.from_json(args.manifest.read_text())
+        except (OSError, ValueError) as e:
+            print(f"error: cannot read {args.manifest}: {e}", file=sys.stderr)
+            return 2
+    else:
+        found = get_source_manifest()
+        if found is None:
+            print(f"error: no {MANIFEST_NAME} found, pass --manifest", file=sys.stderr)
+            return 2
+        manifest = found
+
+    all_ok = True
+    for target in args.targets:
+        result = verify_manifest(target / ".claude", manifest, jobs=args.jobs)
+        all_ok = all_ok and result.ok
+        print(
+            f"[{'ok' if result.ok else 'mismatch'}] {target} - "
+            f"{result.checked} files checked, {len(result.missing)} missing, "
+            f"{len(result.mismatched)} mismatched"
+        )
+        for path in result.missing:
+            print(f"  missing: {path}")
+        for path in result.mismatched:
+            print(f"  mismatched: {path}")
+
+    return 0 if all_ok else 1
+
+
+def run_preflight_cli(argv: list[str]) -> int:
+    """
+    `preflight` command: check many targets before deploying to them.
+
+    prints one verdict line per target (or a json list with --json).
+
+    returns:
+        exit code - 0 if every target is ok, 1 otherwise
+    """
+    parser = argparse.ArgumentParser(
+        prog="claude_setup.py preflight",
+        description="check that targets are writable and have room for .claude/.",
+    )
+    parser.add_argument("targets", nargs="*", type=Path, help="target project directories")
+    parser.add_argument("--targets-file", type=Path, help="file with one target per line")
+    parser.add_argument(
+        "--source", type=Path,
+        help="source .claude/ directory or pack file, for the free-space check",
+    )
+    parser.add_argument("--jobs", "-j", type=int, default=32, help="concurrent checks")
+    parser.add_argument(
+        "--probe", choices=("auto", "always", "never"), default="auto",
+        help="when to prove writability with a probe file (auto: network filesystems)",
+    )
+    parser.add_argument("--json", action="store_true", help="print json instead of a table")
+    args = parser.parse_args(argv)
+
+    targets = list(args.targets)
+    if args.targets_file:
+        targets.extend(read_targets_file(args.targets_file))
+    if not targets:
+        parser.error("no targets given")
+
+    try:
+        source = args.source or get_source()
+    except FileNotFoundError:
+        # without a source only writability is checked
+        source = None
+
+    results = preflight_many(targets, source, jobs=args.jobs, probe=args.probe)
+
+    if args.json:
+        print(json.dumps([asdict(result) for result in results], indent=2))
+    else:
+        for result in results:
+            free = "-" if result.free_bytes is None else f"{result.free_bytes / 2**20:.0f}M"
+            print(
+                f"{result.verdict:<10} {result.fs:<8} {free:>8} "
+                f"{'probe' if result.probed else '':<5} {result.target} - {result.message}"
+            )
+
+    return 0 if all(result.ok for result in results) else 1
+
+
+def run_watch_cli(argv: list[str]) -> int:
+    """
+    `watch` command: keep registered targets in sync with the source.
+
+    targets given on the command line are added to the saved set; with
+    none, the saved set is resumed.
+
+    returns:
+        exit code - 0 when stopped with ctrl-c or after --once
+    """
+    parser = argparse.ArgumentParser(
+        prog="claude_setup.py watch",
+        description="watch the source .claude/ and sync changes into registered targets.",
+    )
+    parser.add_argument("targets", nargs="*", type=Path, help="target project directories to add")
+    parser.add_argument("--targets-file", type=Path, help="file with one target per line")
+    parser.add_argument("--source", type=Path, help="source .claude/ directory")
+    parser.add_argument(
+        "--state", type=Path,
+        help=f"watch state file (default: ${STATE_DIR_ENV} or ~/.claude-setup, {WATCH_STATE_NAME})",
+    )
+    parser.add_argument("--forget", nargs="+", type=Path, help="unregister targets and exit")
+    parser.add_argument("--once", action="store_true", help="sync once and exit")
+    parser.add_argument("--debounce", type=float, default=0.5, help="quiet seconds before syncing")
+    parser.add_argument(
+        "--poll-interval", type=float, default=2.0, help="seconds between polls without inotify"
+    )
+    parser.add_argument("--jobs", "-j", type=int, default=8, help="targets synced concurrently")
+    parser.add_argument(
+        "--strategy", choices=list(COPY_STRATEGIES), default="auto", help="file copy strategy"
+    )
+    args = parser.parse_args(argv)
+
+    state = WatchState(args.state or get_state_dir() / WATCH_STATE_NAME)
+    if args.forget:
+        state.forget([target.expanduser().resolve() for target in args.forget])
+        state.save()
+        return 0
+
+    targets = list(args.targets)
+    if args.targets_file:
+        targets.extend(read_targets_file(args.targets_file))
+    state.register([target.expanduser().resolve() for target in targets])
+    if not state.targets:
+        parser.error("no targets given and none registered")
+
+    try:
+        source = (args.source or get_source_claude_dir()).resolve()
+    except FileNotFoundError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    def report(results: list[WatchResult]) -> None:
+        for result in results:
+            if result.status == "current":
+                continue
+            detail = result.message or (
+                f"{result.created} created, {result.updated} updated, {result.deleted} deleted"
+            )
+            print(f"[{result.status}] {result.target} - {detail}", file=sys.stderr)
+
+    if args.once:
+        results = sync_watched(source, state, jobs=args.jobs, strategy=args.strategy)
+        report(results)
+        return 0 if all(result.status != "failed" for result in results) else 1
+
+    print(f"watching {source} for {len(state.targets)} targets (ctrl-c to stop)", file=sys.stderr)
+    try:
+        watch_source(
+            source, state, debounce=args.debounce, poll_interval=args.poll_interval,
+            jobs=args.jobs, strategy=args.strategy, on_results=report,
+        )
+    except KeyboardInterrupt:
+        pass
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+# headless subcommands: `claude_setup.py <command> ...`
+COMMANDS: dict[str, Callable[[list[str]], int]] = {
+    "deploy": run_deploy_cli,
+    "discover": run_discover_cli,
+    "doctor": run_doctor_cli,
+    "generations": run_generations_cli,
+    "manifest": run_manifest_cli,
+    "pack": run_pack_cli,
+    "preflight": run_preflight_cli,
+    "profiles": run_profiles_cli,
+    "status": run_status_cli,
+    "store": run_store_cli,
+    "verify": run_verify_cli,
+    "watch": run_watch_cli,
+}
+
+
+def main() -> None:
+    """main entry point for claude setup tool."""
+    mark_startup("main")
+    start_trace_from_env()
+
+    # headless subcommands skip the gui entirely
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        sys.exit(COMMANDS[sys.argv[1]](sys.argv[2:]))
+
+    # pyside6 is only loaded when the window is actually requested
+    from claude_setup_gui import run_gui
+
+    mark_startup("gui_imported")
+    sys.exit(run_gui())
 
-    # set application metadata
-    app.setApplicationName("claude workflow setup")
-    app.setOrganizationName("claude-code")
 
-    # create and show main window
-    window = ClaudeSetupWindow()
-    window.show()
+def __getattr__(name: str) -> object:
+    """keep `from claude_setup import ClaudeSetupWindow` working, lazily."""
+    if name in ("ClaudeSetupWindow", "CopyWorker"):
+        import claude_setup_gui
 
-    sys.exit(app.exec())
+        return getattr(claude_setup_gui, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
+    # the gui does `from claude_setup import ...`; hand it this module
+    # rather than importing and initialising a second copy
+    sys.modules.setdefault("claude_setup", sys.modules[__name__])
     main()
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+claude workflow setup tool - gui.
+
+qt window for copying the .claude/ folder to a new or existing project
+directory. the copy engine lives in claude_setup.py; run that script (or
+this one) to open the window.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from PySide6.QtCore import QObject, QThread, QTimer, Signal
+from PySide6.QtGui import QCloseEvent
+from PySide6.QtWidgets import (
+    QApplication,
+    QFileDialog,
+    QLabel,
+    QMainWindow,
+    QMessageBox,
+    QProgressBar,
+    QPushButton,
+    QVBoxLayout,
+    QWidget,
+)
+
+from claude_setup import (
+    CopyCancelled,
+    CopyProgress,
+    DeployRegistry,
+    FileCopier,
+    SourceTree,
+    copy_claude_folder,
+    get_source,
+    get_source_manifest,
+    mark_startup,
+    snapshot_source,
+    start_trace_from_env,
+    trace_phase,
+    validate_target_dir,
+    write_startup_report,
+)
+
+
+class CopyWorker(QObject):
+    """runs copy_claude_folder off the ui thread and reports progress."""
+
+    progress = Signal(object)  # CopyProgress
+    finished = Signal(bool, object)  # success, final CopyProgress
+    failed = Signal(str)
+    cancelled = Signal()
+
+    # minimum seconds between progress signals, to keep the ui responsive
+    PROGRESS_INTERVAL = 0.05
+
+    def __init__(self, source: SourceTree, target: Path, overwrite: bool) -> None:
+        """store copy arguments; call run() from the worker thread."""
+        super().__init__()
+        self.source = source
+        self.target = target
+        self.overwrite = overwrite
+        self.manifest = get_source_manifest()
+        self.copier = FileCopier()
+        self.cancel_event = threading.Event()
+        self._last = CopyProgress()
+        self._last_emit = 0.0
+
+    def cancel(self) -> None:
+        """request cancellation; safe to call from any thread."""
+        self.cancel_event.set()
+
+    def _on_progress(self, state: CopyProgress) -> None:
+        """forward progress, throttled except for the final file."""
+        now = time.perf_counter()
+        done = state.files_done == state.files_total
+        if done or now - self._last_emit >= self.PROGRESS_INTERVAL:
+            self._last_emit = now
+            self.progress.emit(state)
+        self._last = state
+
+    def record(self) -> None:
+        """add the deploy to the registry; a registry error never fails the copy."""
+        try:
+            with DeployRegistry() as registry:
+                registry.record_deploy(self.target, self.source, self.manifest)
+        except (OSError, sqlite3.Error):
+            pass
+
+    def run(self) -> None:
+        """perform the copy and emit exactly one of finished/failed/cancelled."""
+        try:
+            with trace_phase("deploy", target=str(self.target), sync=self.overwrite) as phase:
+                success = copy_claude_folder(
+                    self.source,
+                    self.target,
+                    overwrite=self.overwrite,
+                    sync=self.overwrite,
+                    progress=self._on_progress,
+                    cancel=self.cancel_event,
+                    manifest=self.manifest,
+                    copier=self.copier,
+                )
+                phase.args.update(ok=success, strategy=self.copier.summary)
+            if success:
+                self.record()
+        except CopyCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(success, self._last)
+
+
+class ClaudeSetupWindow(QMainWindow):
+    """main window for claude workflow setup tool."""
+
+    def __init__(self) -> None:
+        """initialize the setup window."""
+        super().__init__()
+
+        self.source_claude_dir: Path | None = None
+        self.source_snapshot: SourceTree | None = None
+        self._copy_thread: QThread | None = None
+        self._copy_worker: CopyWorker | None = None
+        self._copy_target: Path | None = None
+
+        # attempt to locate source .claude/ folder and snapshot it; the
+        # snapshot drives the summary below and is retaken for every copy
+        try:
+            self.source_claude_dir = get_source()
+            self.source_snapshot = snapshot_source(self.source_claude_dir)
+            mark_startup("source")
+        except (FileNotFoundError, ValueError) as e:
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"failed to locate .claude/ folder:\n\n{e}",
+            )
+            sys.exit(1)
+
+        self.init_ui()
+
+    def contents_summary(self) -> dict[str, int]:
+        """file counts of the source .claude/, from the latest snapshot."""
+        assert self.source_snapshot is not None
+        return self.source_snapshot.summary()
+
+    def refresh_source(self) -> None:
+        """
+        replace the source snapshot with a fresh one.
+
+        a single scandir pass, so it is cheap to redo for every copy; the
+        startup snapshot goes stale as soon as a command or skill is
+        edited while the window is open.
+        """
+        assert self.source_claude_dir is not None
+        fresh = snapshot_source(self.source_claude_dir)
+        if self.source_snapshot is not None:
+            self.source_snapshot.close()
+        self.source_snapshot = fresh
+
+    def skills_text(self) -> str:
+        """e.g. "3 ai skills (pydev-workflow, pydev-feature, project-audit)"."""
+        assert self.source_snapshot is not None
+        names = self.source_snapshot.skill_names()
+        return f"{len(names)} ai skills ({', '.join(names)})"
+
+    def init_ui(self) -> None:
+        """initialize user interface components."""
+        self.setWindowTitle("claude workflow setup")
+        self.setMinimumWidth(500)
+
+        # create central widget and layout
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+
+        # title label
+        title = QLabel("claude workflow setup")
+        title.setStyleSheet("font-size: 18px; font-weight: bold; margin: 10px;")
+        layout.addWidget(title)
+
+        # description label
+        description = QLabel(
+            "copy .claude/ folder (commands, skills, hooks, settings)\n"
+            "to a new or existing project directory.\n\n"
+            "the .claude/ folder contains:\n"
+            f"• {self.contents_summary()['commands']} slash commands for development tasks\n"
+            f"• {self.skills_text()}\n"
+            "• automation hooks for formatting and git setup\n"
+            "• project settings"
+        )
+        description.setWordWrap(True)
+        description.setStyleSheet("margin: 10px; color: #666;")
+        layout.addWidget(description)
+
+        # source folder info
+        source_info = QLabel(f"source: {self.source_claude_dir}")
+        source_info.setStyleSheet("margin: 10px; font-family: monospace; color: #333;")
+        layout.addWidget(source_info)
+
+        # button: select existing folder
+        self.select_btn = QPushButton("select existing project folder")
+        self.select_btn.clicked.connect(self.select_existing_folder)
+        self.select_btn.setMinimumHeight(40)
+        layout.addWidget(self.select_btn)
+
+        # button: create new folder
+        self.create_btn = QPushButton("create new project folder")
+        self.create_btn.clicked.connect(self.create_new_folder)
+        self.create_btn.setMinimumHeight(40)
+        layout.addWidget(self.create_btn)
+
+        # copy progress (hidden while idle)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+
+        self.progress_label = QLabel("")
+        self.progress_label.setStyleSheet("margin: 0 10px; font-family: monospace; color: #666;")
+        self.progress_label.setVisible(False)
+        layout.addWidget(self.progress_label)
+
+        self.cancel_btn = QPushButton("cancel")
+        self.cancel_btn.clicked.connect(self.cancel_copy)
+        self.cancel_btn.setVisible(False)
+        layout.addWidget(self.cancel_btn)
+
+        # status label
+        self.status_label = QLabel("")
+        self.status_label.setWordWrap(True)
+        self.status_label.setStyleSheet("margin: 10px; padding: 10px;")
+        layout.addWidget(self.status_label)
+
+        layout.addStretch()
+
+    def select_existing_folder(self) -> None:
+        """handle select existing folder button click."""
+        folder = QFileDialog.getExistingDirectory(
+            self,
+            "select project folder",
+            str(Path.home()),
+            QFileDialog.Option.ShowDirsOnly,
+        )
+
+        if folder:
+            self.copy_to_target(Path(folder))
+
+    def create_new_folder(self) -> None:
+        """handle create new folder button click."""
+        folder = QFileDialog.getExistingDirectory(
+            self,
+            "select parent directory for new project",
+            str(Path.home()),
+            QFileDialog.Option.ShowDirsOnly,
+        )
+
+        if not folder:
+            return
+
+        # prompt for new folder name
+        from PySide6.QtWidgets import QInputDialog
+
+        name, ok = QInputDialog.getText(
+            self,
+            "new project folder",
+            "enter project folder name:",
+        )
+
+        if ok and name:
+            new_folder = Path(folder) / name
+            try:
+                new_folder.mkdir(parents=True, exist_ok=False)
+                self.copy_to_target(new_folder)
+            except FileExistsError:
+                QMessageBox.warning(
+                    self,
+                    "folder exists",
+                    f"folder already exists: {new_folder}\n\n"
+                    "use 'select existing folder' instead.",
+                )
+            except (OSError, PermissionError) as e:
+                QMessageBox.critical(
+                    self,
+                    "error",
+                    f"failed to create folder:\n\n{e}",
+                )
+
+    def copy_to_target(self, target: Path) -> None:
+        """
+        copy .claude/ folder to target directory.
+
+        args:
+            target: target project directory
+        """
+        # validate target directory
+        is_valid, message = validate_target_dir(target)
+        if not is_valid:
+            self.status_label.setText(f"❌ error: {message}")
+            self.status_label.setStyleSheet(
+                "margin: 10px; padding: 10px; background-color: #ffebee; color: #c62828;"
+            )
+            QMessageBox.critical(self, "invalid target", message)
+            return
+
+        # check if .claude/ already exists
+        target_claude = target / ".claude"
+        overwrite = False
+
+        if target_claude.exists():
+            reply = QMessageBox.question(
+                self,
+                "folder exists",
+                f".claude/ folder already exists in:\n{target}\n\n"
+                "do you want to overwrite it?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No,
+            )
+
+            if reply == QMessageBox.StandardButton.No:
+                self.status_label.setText("❌ cancelled - .claude/ folder already exists")
+                self.status_label.setStyleSheet(
+                    "margin: 10px; padding: 10px; background-color: #fff3e0; color: #e65100;"
+                )
+                return
+
+            overwrite = True
+
+        # copy .claude/ folder in a worker thread
+        self.start_copy(target, overwrite)
+
+    def start_copy(self, target: Path, overwrite: bool) -> None:
+        """
+        start copying .claude/ to target in a background thread.
+
+        args:
+            target: target project directory
+            overwrite: if true, replace an existing .claude/ folder
+        """
+        try:
+            self.refresh_source()
+        except (OSError, ValueError) as e:
+            self.on_copy_failed(f"failed to read source .claude/ folder: {e}")
+            return
+
+        worker = CopyWorker(self.source_snapshot, target, overwrite)  # type: ignore
+        thread = QThread(self)
+        worker.moveToThread(thread)
+
+        thread.started.connect(worker.run)
+        worker.progress.connect(self.on_copy_progress)
+        worker.finished.connect(self.on_copy_finished)
+        worker.failed.connect(self.on_copy_failed)
+        worker.cancelled.connect(self.on_copy_cancelled)
+        for signal in (worker.finished, worker.failed, worker.cancelled):
+            signal.connect(thread.quit)
+        thread.finished.connect(self.on_copy_thread_done)
+
+        self._copy_thread = thread
+        self._copy_worker = worker
+        self._copy_target = target
+        self.set_copy_running(True)
+        thread.start()
+
+    def set_copy_running(self, running: bool) -> None:
+        """toggle between idle and copy-in-progress ui state."""
+        self.select_btn.setEnabled(not running)
+        self.create_btn.setEnabled(not running)
+        self.cancel_btn.setEnabled(running)
+        self.cancel_btn.setVisible(running)
+        self.progress_bar.setVisible(running)
+        self.progress_label.setVisible(running)
+        if running:
+            self.progress_bar.setRange(0, 0)  # busy until first progress
+            self.progress_label.setText("scanning...")
+            self.status_label.setText("")
+            self.status_label.setStyleSheet("margin: 10px; padding: 10px;")
+
+    def cancel_copy(self) -> None:
+        """handle cancel button click."""
+        if self._copy_worker is not None:
+            self._copy_worker.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.progress_label.setText("cancelling...")
+
+    def on_copy_progress(self, state: CopyProgress) -> None:
+        """update progress bar and label from the worker."""
+        self.progress_bar.setRange(0, max(state.files_total, 1))
+        self.progress_bar.setValue(state.files_done)
+        self.progress_label.setText(
+            f"{state.files_done}/{state.files_total} files, "
+            f"{state.bytes_done / 1024:.0f} kb, "
+            f"{state.throughput / (1024 * 1024):.1f} mb/s\n"
+            f"{state.current}"
+        )
+
+    def on_copy_thread_done(self) -> None:
+        """release worker and thread once the copy thread has stopped."""
+        if self._copy_worker is not None:
+            self._copy_worker.deleteLater()
+        if self._copy_thread is not None:
+            self._copy_thread.deleteLater()
+        self._copy_worker = None
+        self._copy_thread = None
+
+    def on_copy_cancelled(self) -> None:
+        """handle cancelled copy - the target was left unchanged."""
+        self.set_copy_running(False)
+        self.status_label.setText("❌ cancelled - target left unchanged")
+        self.status_label.setStyleSheet(
+            "margin: 10px; padding: 10px; background-color: #fff3e0; color: #e65100;"
+        )
+
+    def on_copy_failed(self, error: str) -> None:
+        """handle copy failure reported by the worker."""
+        self.set_copy_running(False)
+        self.status_label.setText(f"❌ error during copy:\n{error}")
+        self.status_label.setStyleSheet(
+            "margin: 10px; padding: 10px; background-color: #ffebee; color: #c62828;"
+        )
+        QMessageBox.critical(
+            self,
+            "copy failed",
+            f"failed to copy .claude/ folder:\n\n{error}",
+        )
+
+    def on_copy_finished(self, success: bool, state: CopyProgress) -> None:
+        """
+        handle completed copy.
+
+        args:
+            success: result of copy verification
+            state: final progress, used for the file count
+        """
+        target = self._copy_target
+        self.set_copy_running(False)
+
+        if not success:
+            self.on_copy_failed("copy verification failed")
+            return
+
+        file_count = state.files_total
+        counts = self.contents_summary()
+
+        self.status_label.setText(
+            f"✅ success!\n\n"
+            f".claude/ folder copied to:\n{target}/.claude\n\n"
+            f"copied {file_count} files\n\n"
+            f"your project now has:\n"
+            f"• {counts['commands']} slash commands\n"
+            f"• {self.skills_text()}\n"
+            f"• automation hooks for formatting and git setup\n\n"
+            f"note: .claude is a hidden folder\n"
+            f"press cmd+shift+. in finder to view hidden files"
+        )
+        self.status_label.setStyleSheet(
+            "margin: 10px; padding: 10px; background-color: #e8f5e9; color: #2e7d32;"
+        )
+
+        # show success dialog with option to open folder
+        msg = QMessageBox(self)
+        msg.setIcon(QMessageBox.Icon.Information)
+        msg.setWindowTitle("success")
+        msg.setText(
+            f"claude workflow setup complete!\n\n"
+            f".claude/ folder copied to:\n{target}\n\n"
+            f"copied {file_count} files\n\n"
+            f"includes: {counts['commands']} commands, {counts['skills']} skills, "
+            f"automation hooks\n\n"
+            f"note: .claude is a HIDDEN folder (starts with .)\n"
+            f"in finder: press cmd+shift+. to show hidden files"
+        )
+        msg.setStandardButtons(
+            QMessageBox.StandardButton.Ok | QMessageBox.StandardButton.Open
+        )
+        msg.button(QMessageBox.StandardButton.Open).setText("open folder")
+
+        reply = msg.exec()
+
+        # open folder in finder if requested
+        if reply == QMessageBox.StandardButton.Open:
+            import subprocess
+            subprocess.run(["open", str(target)])
+
+    def closeEvent(self, event: QCloseEvent) -> None:
+        """cancel a running copy and wait for it before closing."""
+        if self._copy_worker is not None:
+            self._copy_worker.cancel()
+        if self._copy_thread is not None:
+            self._copy_thread.quit()
+            self._copy_thread.wait()
+        if self.source_snapshot is not None:
+            self.source_snapshot.close()
+        super().closeEvent(event)
+
+
+def run_gui() -> int:
+    """
+    create the application and main window and run the event loop.
+
+    returns:
+        application exit code
+    """
+    # $CLAUDE_SETUP_PROFILE traces window startup and every copy
+    start_trace_from_env()
+    app = QApplication(sys.argv)
+    mark_startup("app")
+
+    # set application metadata
+    app.setApplicationName("claude workflow setup")
+    app.setOrganizationName("claude-code")
+
+    # create and show main window
+    window = ClaudeSetupWindow()
+    mark_startup("window")
+    window.show()
+
+    def first_window() -> None:
+        # first pass of the event loop: the window is mapped
+        mark_startup("shown")
+        if write_startup_report():
+            app.quit()
+
+    QTimer.singleShot(0, first_window)
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(run_gui())
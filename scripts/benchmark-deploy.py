@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+benchmark the .claude/ deploy engine.
+
+generates synthetic .claude/ trees (file count, size profile, depth) on
+one or more filesystems and times each deploy phase - scan, validate,
+copy, verify, no-op sync and remove - for each file copy strategy and
+number of copy threads. phases go through the public api, so copy is
+copy_claude_folder as a deploy runs it: staged copy, swap and the
+post-copy check against the snapshot.
+
+--latency adds a fixed delay to every file copy, to see how much the
+parallel copy engine hides per-file latency on nfs/smb-like mounts
+without needing one.
+
+results are written as json so runs from different versions can be
+compared; --compare exits non-zero when a phase got slower than the
+allowed threshold.
+
+usage:
+    python3 scripts/benchmark-deploy.py --files 10 1000 10000 --dirs /dev/shm /var/tmp
+    python3 scripts/benchmark-deploy.py --files 1000 --copy-jobs 1 4 16 --latency 2
+    python3 scripts/benchmark-deploy.py --json new.json --compare old.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import claude_setup
+from claude_setup import (
+    COPY_STRATEGIES,
+    FileCopier,
+    build_manifest,
+    copy_claude_folder,
+    filesystem_type,
+    remove_in_background,
+    snapshot_source,
+    sync_claude_folder,
+    validate_target_dir,
+    verify_manifest,
+    verify_snapshot,
+)
+
+# phases timed for every (filesystem, tree, strategy) combination
+PHASES = ("scan", "validate", "copy", "verify", "verify_manifest", "sync_noop", "remove")
+
+# size profiles: fixed size, or a seeded mix resembling real command trees
+SIZE_PROFILES = ("small", "mixed", "large")
+
+
+def file_size(profile: str, rng: random.Random) -> int:
+    """pick one file size for a size profile."""
+    if profile == "small":
+        return 2 * 1024
+    if profile == "large":
+        return 256 * 1024
+    # mostly markdown-sized files with the occasional large asset
+    if rng.random() < 0.02:
+        return rng.randint(256 * 1024, 1024 * 1024)
+    return int(rng.lognormvariate(8.5, 1.0)) + 64
+
+
+def make_tree(
+    root: Path,
+    files: int,
+    profile: str = "mixed",
+    depth: int = 2,
+    fanout: int = 50,
+    seed: int = 0,
+) -> Path:
+    """
+    create a synthetic .claude/ tree.
+
+    args:
+        root: directory to create .claude/ in
+        files: number of command files
+        profile: one of SIZE_PROFILES
+        depth: directory levels below commands/
+        fanout: files per leaf directory
+        seed: random seed, so trees are identical across runs
+
+    returns:
+        path to the generated .claude/ directory
+    """
+    rng = random.Random(seed)
+    claude_dir = root / ".claude"
+    for sub in ("commands", "skills/bench-skill", "hooks"):
+        (claude_dir / sub).mkdir(parents=True, exist_ok=True)
+    (claude_dir / "settings.json").write_text('{"benchmark": true}')
+    (claude_dir / "skills" / "bench-skill" / "SKILL.md").write_text("# bench skill\n")
+    hook = claude_dir / "hooks" / "bench.sh"
+    hook.write_text("#!/bin/bash\necho bench\n")
+    hook.chmod(0o755)
+
+    line = b"# synthetic command - lorem ipsum dolor sit amet\n"
+    for i in range(files):
+        leaf = i // fanout
+        parts = [f"level{level}-{(leaf // (fanout ** level)) % fanout:03d}" for level in range(depth)]
+        directory = claude_dir / "commands" / Path(*reversed(parts)) if parts else claude_dir / "commands"
+        directory.mkdir(parents=True, exist_ok=True)
+        size = file_size(profile, rng)
+        (directory / f"COMMAND-{i:06d}.md").write_bytes((line * (size // len(line) + 1))[:size])
+
+    return claude_dir
+
+
+def time_runs(repeat: int, run: Callable[[int], object]) -> list[float]:
+    """time run(i) for i in range(repeat), one wall time per run."""
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run(i)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def add_copy_latency(seconds: float) -> None:
+    """make every copy function sleep first, like a high-latency mount."""
+    for name, func in list(claude_setup._COPY_FUNCS.items()):
+        def delayed(src: Path, dst: Path, func: Callable[[Path, Path], None] = func) -> None:
+            time.sleep(seconds)
+            func(src, dst)
+        claude_setup._COPY_FUNCS[name] = delayed
+
+
+def bench_tree(
+    source: Path, workdir: Path, strategy: str, repeat: int, jobs: int = 1
+) -> dict[str, list[float]]:
+    """
+    time every phase for one source tree, copy strategy and copy thread count.
+
+    returns:
+        phase name -> list of wall times in seconds
+    """
+    timings: dict[str, list[float]] = {}
+    targets = [workdir / f"target-{strategy}-{jobs}-{i}" for i in range(repeat)]
+    for target in targets:
+        target.mkdir()
+
+    timings["scan"] = time_runs(repeat, lambda i: snapshot_source(source).close())
+
+    with snapshot_source(source) as tree:
+        manifest = build_manifest(tree)
+
+        timings["validate"] = time_runs(
+            repeat, lambda i: validate_target_dir(targets[i])
+        )
+        timings["copy"] = time_runs(
+            repeat,
+            lambda i: copy_claude_folder(
+                tree, targets[i], copier=FileCopier(strategy),
+                background_cleanup=False, jobs=jobs,
+            ),
+        )
+        timings["verify"] = time_runs(
+            repeat, lambda i: verify_snapshot(targets[i] / ".claude", tree)
+        )
+        timings["verify_manifest"] = time_runs(
+            repeat, lambda i: verify_manifest(targets[i] / ".claude", manifest)
+        )
+        timings["sync_noop"] = time_runs(
+            repeat, lambda i: sync_claude_folder(tree, targets[i])
+        )
+
+    timings["remove"] = time_runs(
+        repeat, lambda i: remove_in_background(targets[i] / ".claude").result()
+    )
+
+    for target in targets:
+        shutil.rmtree(target, ignore_errors=True)
+    return timings
+
+
+def environment() -> dict[str, str]:
+    """describe the machine and code version the results came from."""
+    root = Path(__file__).parent.parent
+    version_file = root / "version.txt"
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=root, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = ""
+
+    return {
+        "version": version_file.read_text().strip() if version_file.exists() else "",
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": str(os.cpu_count()),
+    }
+
+
+def result_key(record: dict) -> tuple:
+    """identity of a measurement, for comparing runs."""
+    # runs from before --copy-jobs existed copied on one thread, and runs
+    # from before --latency had none
+    return (record["fs"], record["files"], record["profile"], record["depth"],
+            record["strategy"], record.get("jobs", 1), record.get("latency_ms", 0.0),
+            record["phase"])
+
+
+def compare(results: list[dict], baseline_path: Path, threshold: float) -> list[str]:
+    """
+    compare results against a previous run.
+
+    returns:
+        one line per phase that got slower than threshold (e.g. 0.2 = 20%)
+    """
+    baseline = json.loads(baseline_path.read_text())
+    previous = {result_key(r): r["best"] for r in baseline["results"]}
+
+    regressions = []
+    for record in results:
+        before = previous.get(result_key(record))
+        # ignore sub-millisecond phases, they are all noise
+        if before is None or max(before, record["best"]) < 0.001:
+            continue
+        change = record["best"] / before - 1 if before > 0 else 0.0
+        if change > threshold:
+            fs, files, profile, depth, strategy, jobs, latency, phase = result_key(record)
+            regressions.append(
+                f"{phase:<16} {fs}/{files} files/{profile}/depth {depth}/{strategy}/"
+                f"{jobs} jobs/{latency:g} ms latency: "
+                f"{before:.4f}s -> {record['best']:.4f}s (+{change:.0%})"
+            )
+    return regressions
+
+
+def main() -> None:
+    """main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--files", type=int, nargs="+", default=[10, 1000, 10000],
+        help="tree sizes to generate (e.g. 10 1000 100000)",
+    )
+    parser.add_argument(
+        "--profiles", nargs="+", choices=SIZE_PROFILES, default=["mixed"],
+        help="file size profiles",
+    )
+    parser.add_argument("--depth", type=int, nargs="+", default=[2], help="directory depths")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per phase")
+    parser.add_argument(
+        "--dirs", type=Path, nargs="+", default=[None],
+        help="filesystems to benchmark on, e.g. /dev/shm (tmpfs) and /var/tmp (disk)",
+    )
+    parser.add_argument(
+        "--strategies", nargs="+", choices=list(COPY_STRATEGIES),
+        default=["auto", "copy"], help="copy strategies to time",
+    )
+    parser.add_argument(
+        "--copy-jobs", type=int, nargs="+", default=[1, 4], metavar="N",
+        help="copy threads per target to time (default: 1 4)",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, metavar="MS",
+        help="extra delay per copied file in milliseconds, to simulate a network mount",
+    )
+    parser.add_argument("--json", type=Path, help="write results to this file")
+    parser.add_argument("--compare", type=Path, help="previous --json output to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="slowdown treated as a regression by --compare (default 0.2 = 20%%)",
+    )
+    args = parser.parse_args()
+
+    if args.latency > 0:
+        add_copy_latency(args.latency / 1000)
+
+    results = []
+    print(f"{'fs':<8} {'files':>7} {'profile':<7} {'depth':>5} {'strategy':<16} "
+          f"{'jobs':>4} {'phase':<16} {'best (s)':>9} {'files/s':>10}")
+
+    for base_dir in args.dirs:
+        workdir = Path(tempfile.mkdtemp(prefix="claude-bench-", dir=base_dir))
+        fs = filesystem_type(workdir)
+        try:
+            for files in args.files:
+                for profile in args.profiles:
+                    for depth in args.depth:
+                        tree_root = workdir / f"source-{files}-{profile}-{depth}"
+                        source = make_tree(tree_root, files, profile, depth)
+                        for strategy in args.strategies:
+                            for jobs in args.copy_jobs:
+                                timings = bench_tree(
+                                    source, workdir, strategy, args.repeat, jobs
+                                )
+                                for phase in PHASES:
+                                    best = min(timings[phase])
+                                    record = {
+                                        "fs": fs,
+                                        "dir": str(workdir.parent),
+                                        "files": files,
+                                        "profile": profile,
+                                        "depth": depth,
+                                        "strategy": strategy,
+                                        "jobs": jobs,
+                                        "latency_ms": args.latency,
+                                        "phase": phase,
+                                        "best": best,
+                                        "runs": timings[phase],
+                                    }
+                                    results.append(record)
+                                    rate = files / best if best > 0 else float("inf")
+                                    print(f"{fs:<8} {files:>7} {profile:<7} {depth:>5} "
+                                          f"{strategy:<16} {jobs:>4} {phase:<16} "
+                                          f"{best:>9.4f} {rate:>10.0f}")
+                        shutil.rmtree(tree_root, ignore_errors=True)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        args.json.write_text(json.dumps({
+            "environment": environment(),
+            "results": results,
+        }, indent=2) + "\n")
+        print(f"\nwrote {args.json}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nno regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
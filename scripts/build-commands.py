@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+build .claude/commands from docs/claude-commands.
+
+compiles docs/claude-commands/<category>/<NAME>.md into
+.claude/commands/<category>/<NAME>.md, validating each command's metadata
+on the way. sources without a `description` in their frontmatter get one
+from the first paragraph, so the slash command menu can show it.
+
+like make, only changed commands are rebuilt: a state file records the
+size, mtime and hash of every source and the hash of its output, and a
+command is recompiled when its source changed, its output is missing or
+was edited, or the builder itself changed. outputs whose source was
+deleted are removed. unchanged outputs are never rewritten, so their
+mtimes stay put and `deploy --sync` keeps skipping them.
+
+usage:
+    python3 scripts/build-commands.py
+    python3 scripts/build-commands.py --check   # ci: fail if .claude/commands is stale
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# bump when compile_command() output changes, to force a full rebuild
+BUILDER_VERSION = 1
+
+# frontmatter keys claude code understands for slash commands
+KNOWN_KEYS = frozenset({
+    "description", "allowed-tools", "argument-hint", "model", "disable-model-invocation",
+})
+
+NAME_PATTERN = re.compile(r"^[A-Z0-9]+(-[A-Z0-9]+)*$")
+CATEGORY_PATTERN = re.compile(r"^[a-z0-9]+(-[a-z0-9]+)*$")
+
+
+class CommandError(ValueError):
+    """raised when a command source has invalid metadata."""
+
+
+def split_frontmatter(text: str) -> tuple[dict[str, str], str]:
+    """
+    split a command into its frontmatter and body.
+
+    returns:
+        (metadata, body) - metadata is empty without frontmatter
+
+    raises:
+        CommandError: if the frontmatter is unterminated or malformed
+    """
+    lines = text.splitlines(keepends=True)
+    if not lines or lines[0].strip() != "---":
+        return {}, text
+
+    for end in range(1, len(lines)):
+        if lines[end].strip() == "---":
+            break
+    else:
+        raise CommandError("unterminated frontmatter")
+
+    metadata: dict[str, str] = {}
+    for number, line in enumerate(lines[1:end], start=2):
+        if not line.strip():
+            continue
+        key, sep, value = line.partition(":")
+        key = key.strip()
+        if not sep or not key:
+            raise CommandError(f"line {number}: expected 'key: value' in frontmatter")
+        if key not in KNOWN_KEYS:
+            raise CommandError(f"line {number}: unknown frontmatter key {key!r}")
+        if key in metadata:
+            raise CommandError(f"line {number}: duplicate frontmatter key {key!r}")
+        metadata[key] = value.strip()
+
+    return metadata, "".join(lines[end + 1:])
+
+
+def first_paragraph(body: str) -> str:
+    """first line of prose after the `# title` heading, or ""."""
+    seen_title = False
+    for line in body.splitlines():
+        stripped = line.strip()
+        if not seen_title:
+            seen_title = stripped.startswith("# ")
+            continue
+        if stripped and not stripped.startswith(("#", "```", "---", ">")):
+            return stripped
+    return ""
+
+
+def compile_command(rel: str, text: str) -> str:
+    """
+    validate one command source and return its compiled form.
+
+    args:
+        rel: source path relative to the sources root (<category>/<NAME>.md)
+        text: source content
+
+    returns:
+        compiled command text
+
+    raises:
+        CommandError: if the command's path or metadata is invalid
+    """
+    category, _, filename = rel.partition("/")
+    name = filename[:-3]
+    if not CATEGORY_PATTERN.match(category):
+        raise CommandError(f"category {category!r} must be lowercase-kebab-case")
+    if not NAME_PATTERN.match(name):
+        raise CommandError(f"command name {name!r} must be UPPERCASE-KEBAB-CASE")
+
+    metadata, body = split_frontmatter(text)
+    if not any(line.startswith("# ") for line in body.splitlines()):
+        raise CommandError("missing '# title' heading")
+
+    if metadata.get("description"):
+        return text
+
+    description = first_paragraph(body)
+    if not description:
+        raise CommandError("no description: add one to the frontmatter or below the title")
+
+    header = [f"description: {description}\n"]
+    header.extend(f"{key}: {value}\n" for key, value in metadata.items() if key != "description")
+    return "---\n" + "".join(header) + "---\n\n" + body.lstrip("\n")
+
+
+def file_hash(data: bytes) -> str:
+    """blake2b hex digest of data."""
+    return hashlib.blake2b(data).hexdigest()
+
+
+@dataclass
+class BuildReport:
+    """what a build did, as command paths relative to the output root."""
+
+    built: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    errors: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        """true if every command validated."""
+        return not self.errors
+
+
+def find_sources(source_dir: Path) -> dict[str, Path]:
+    """map <category>/<NAME>.md to its path; top-level files are docs, not commands."""
+    return {
+        f"{path.parent.name}/{path.name}": path
+        for path in sorted(source_dir.glob("*/*.md"))
+        if path.is_file()
+    }
+
+
+def load_state(state_path: Path) -> dict[str, dict]:
+    """previous build state, or empty if missing, unreadable or from another builder."""
+    try:
+        state = json.loads(state_path.read_text())
+    except (OSError, ValueError):
+        return {}
+    if state.get("builder") != BUILDER_VERSION:
+        return {}
+    return state.get("commands", {})
+
+
+def build_commands(
+    source_dir: Path,
+    output_dir: Path,
+    state_path: Path,
+    force: bool = False,
+    dry_run: bool = False,
+) -> BuildReport:
+    """
+    compile changed command sources into output_dir.
+
+    args:
+        source_dir: docs/claude-commands
+        output_dir: .claude/commands
+        state_path: build state file (created or updated unless dry_run)
+        force: ignore the state file and recheck every command
+        dry_run: report what would change without writing anything
+
+    returns:
+        build report; invalid commands are listed in errors and their
+        previous output, if any, is left in place
+    """
+    report = BuildReport()
+    previous = {} if force else load_state(state_path)
+    state: dict[str, dict] = {}
+    sources = find_sources(source_dir)
+
+    names: dict[str, str] = {}
+    for rel, path in sources.items():
+        # /NAME must be unambiguous across categories
+        name = path.stem
+        if name in names:
+            report.errors[rel] = f"duplicate command name, also in {names[name]}"
+            continue
+        names[name] = rel
+
+        st = path.stat()
+        out = output_dir / rel
+        entry = previous.get(rel)
+
+        # fast path: source untouched by size/mtime and output still ours
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            try:
+                if file_hash(out.read_bytes()) == entry["output"]:
+                    state[rel] = entry
+                    report.unchanged.append(rel)
+                    continue
+            except FileNotFoundError:
+                pass
+
+        data = path.read_bytes()
+        try:
+            compiled = compile_command(rel, data.decode("utf-8")).encode("utf-8")
+        except UnicodeDecodeError:
+            report.errors[rel] = "not valid utf-8"
+            continue
+        except CommandError as e:
+            report.errors[rel] = str(e)
+            continue
+
+        state[rel] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "source": file_hash(data),
+            "output": file_hash(compiled),
+        }
+
+        try:
+            current = out.read_bytes()
+        except FileNotFoundError:
+            current = None
+        if current == compiled:
+            report.unchanged.append(rel)
+            continue
+
+        report.built.append(rel)
+        if not dry_run:
+            out.parent.mkdir(parents=True, exist_ok=True)
+            tmp = out.with_name(f".{out.name}.tmp")
+            tmp.write_bytes(compiled)
+            os.replace(tmp, out)
+
+    # remove outputs this builder wrote for sources that are gone
+    for rel in previous:
+        if rel in sources:
+            continue
+        out = output_dir / rel
+        if out.exists():
+            report.removed.append(rel)
+            if not dry_run:
+                out.unlink()
+                try:
+                    out.parent.rmdir()
+                except OSError:
+                    pass  # category still has other commands
+
+    # keep state for invalid commands so a fix is still detected as a change
+    for rel in report.errors:
+        if rel in previous:
+            state.setdefault(rel, previous[rel])
+
+    if not dry_run:
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        state_path.write_text(
+            json.dumps({"builder": BUILDER_VERSION, "commands": state}, indent=2, sort_keys=True)
+            + "\n"
+        )
+
+    return report
+
+
+def main() -> None:
+    """main entry point."""
+    root = Path(__file__).parent.parent
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--source", type=Path, default=root / "docs" / "claude-commands",
+        help="command sources (default: docs/claude-commands)",
+    )
+    parser.add_argument(
+        "--output", type=Path, default=root / ".claude" / "commands",
+        help="compiled commands (default: .claude/commands)",
+    )
+    parser.add_argument(
+        "--state", type=Path, default=root / ".command-build-state.json",
+        help="build state file (default: .command-build-state.json)",
+    )
+    parser.add_argument("--force", action="store_true", help="recheck every command")
+    parser.add_argument(
+        "--check", action="store_true",
+        help="write nothing; exit 1 if any command is invalid or out of date",
+    )
+    args = parser.parse_args()
+
+    if not args.source.is_dir():
+        print(f"error: command sources not found: {args.source}", file=sys.stderr)
+        sys.exit(2)
+
+    report = build_commands(
+        args.source, args.output, args.state, force=args.force, dry_run=args.check
+    )
+
+    verb = "stale" if args.check else "built"
+    for rel in report.built:
+        print(f"{verb}: {rel}")
+    for rel in report.removed:
+        print(f"removed: {rel}")
+    for rel, error in report.errors.items():
+        print(f"error: {rel}: {error}", file=sys.stderr)
+    print(
+        f"{len(report.built)} {verb}, {len(report.unchanged)} unchanged, "
+        f"{len(report.removed)} removed, {len(report.errors)} invalid"
+    )
+
+    stale = args.check and (report.built or report.removed)
+    sys.exit(1 if report.errors or stale else 0)
+
+
+if __name__ == "__main__":
+    main()
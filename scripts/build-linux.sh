@@ -44,15 +44,31 @@ if [ ! -d ".claude" ]; then
     exit 1
 fi
 
+# compile changed slash commands from docs/claude-commands into .claude/commands
+echo "building slash commands..."
+python3 scripts/build-commands.py
+
+# precompute .claude/ content manifest for post-copy verification
+echo "building .claude manifest..."
+python3 claude_setup.py manifest --output build/claude-manifest.json
+
+# pack .claude/ into one compressed file for the bundle
+echo "packing .claude..."
+python3 claude_setup.py pack --output build/claude-pack.zip
+
 # build executable
 echo "building linux executable..."
 pyinstaller --clean --noconfirm \
     --onefile \
+    --add-data "build/claude-pack.zip:." \
+    --add-data "build/claude-manifest.json:." \
+    --add-data "install-profiles.json:." \
     --windowed \
     --name "claude-workflow-setup" \
     --hidden-import PySide6.QtCore \
     --hidden-import PySide6.QtGui \
     --hidden-import PySide6.QtWidgets \
+    --hidden-import claude_setup_gui \
     claude_setup.py
 
 # verify build
@@ -60,6 +76,12 @@ if [ -f "dist/claude-workflow-setup" ]; then
     # make executable
     chmod +x dist/claude-workflow-setup
 
+    # the bundled install profiles must load, or --install-profile breaks
+    if ! ./dist/claude-workflow-setup profiles > /dev/null; then
+        echo "error: bundled install profiles do not load, see above"
+        exit 1
+    fi
+
     echo ""
     echo "========================================"
     echo "build successful!"
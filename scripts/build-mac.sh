@@ -3,6 +3,11 @@
 
 set -e  # exit on error
 
+# --slim: onedir bundle with only the qt parts the window uses (see claude-setup.spec)
+if [ "$1" = "--slim" ]; then
+    export CLAUDE_SETUP_BUILD=slim
+fi
+
 echo "========================================"
 echo "claude workflow setup - macos build"
 echo "========================================"
@@ -41,8 +46,12 @@ if [ ! -d ".claude" ]; then
     exit 1
 fi
 
+# compile changed slash commands from docs/claude-commands into .claude/commands
+echo "building slash commands..."
+python3 scripts/build-commands.py
+
 # build executable
-echo "building macos app bundle..."
+echo "building macos app bundle (${CLAUDE_SETUP_BUILD:-full} profile)..."
 pyinstaller --clean --noconfirm claude-setup.spec
 
 # verify build
@@ -43,15 +43,35 @@ if not exist ".claude\" (
     exit /b 1
 )
 
+REM compile changed slash commands from docs\claude-commands into .claude\commands
+echo building slash commands...
+python scripts\build-commands.py
+if %errorlevel% neq 0 (
+    echo error: invalid slash commands, see above
+    exit /b 1
+)
+
+REM precompute .claude\ content manifest for post-copy verification
+echo building .claude manifest...
+python claude_setup.py manifest --output build\claude-manifest.json
+
+REM pack .claude\ into one compressed file for the bundle
+echo packing .claude...
+python claude_setup.py pack --output build\claude-pack.zip
+
 REM build executable
 echo building windows executable...
 pyinstaller --clean --noconfirm ^
     --onefile ^
+    --add-data "build\claude-pack.zip;." ^
+    --add-data "build\claude-manifest.json;." ^
+    --add-data "install-profiles.json;." ^
     --windowed ^
     --name "claude-workflow-setup" ^
     --hidden-import PySide6.QtCore ^
     --hidden-import PySide6.QtGui ^
     --hidden-import PySide6.QtWidgets ^
+    --hidden-import claude_setup_gui ^
     claude_setup.py
 
 REM verify build
@@ -81,3 +101,10 @@ if exist "dist\claude-workflow-setup.exe" (
     echo check the output above for errors
     exit /b 1
 )
+
+REM the bundled install profiles must load, or --install-profile breaks
+start "" /wait dist\claude-workflow-setup.exe profiles
+if %errorlevel% neq 0 (
+    echo error: bundled install profiles do not load
+    exit /b 1
+)
@@ -6,150 +6,425 @@ converts DEV-WF-ICON.png to:
 - icon.icns (macos)
 - icon.ico (windows)
 - icon-{size}.png (linux, multiple sizes)
+
+the source is decoded once into a resampling pyramid: the largest size
+comes from the source and every smaller size from the nearest level at
+least twice its size, instead of resampling the full-resolution source
+for every size. levels up to SMALL_LEVEL px are always compared against
+a direct resize of the source (cheap at that size, and where repeated
+downsampling blurs the most), and any level below MIN_PSNR is replaced
+by the direct resize; --check-quality extends the check to every level.
+
+levels are png-encoded in parallel over a process pool and cached by
+source image hash, render settings (see render_key) and size, so
+unchanged sizes are not rendered again; after a successful run the cache
+only keeps the current source and settings. outputs built from the same
+source hash and settings whose content is unchanged are skipped.
 """
 
 from __future__ import annotations
 
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import struct
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 try:
-    from PIL import Image
+    from PIL import Image, ImageChops, ImageStat
 except ImportError:
     print("error: pillow not installed")
     print("install: pip3 install pillow")
     sys.exit(1)
 
-def create_icns(source_path: Path, output_path: Path) -> bool:
+# icns element types holding png data, with their pixel size:
+# 16, 32, 64, 128, 256 and 512 points at 1x, and 16-512 at 2x (ic11-ic14, ic10)
+ICNS_TYPES = [
+    (b"icp4", 16), (b"ic11", 32),
+    (b"icp5", 32), (b"ic12", 64),
+    (b"icp6", 64),
+    (b"ic07", 128), (b"ic13", 256),
+    (b"ic08", 256), (b"ic14", 512),
+    (b"ic09", 512), (b"ic10", 1024),
+]
+
+# ico supports multiple sizes in one file
+ICO_SIZES = [16, 32, 48, 64, 128, 256]
+
+# common linux icon sizes
+PNG_SIZES = [16, 22, 24, 32, 48, 64, 128, 256, 512]
+
+# default cache location (ignored by git)
+CACHE_DIR = Path(".icon-cache")
+
+# minimum psnr (db) of a pyramid level against a direct resize
+MIN_PSNR = 35.0
+
+# levels up to this size are always quality-checked
+SMALL_LEVEL = 64
+
+# bump when resampling or the quality check changes what gets rendered
+RENDERER_VERSION = 2
+
+
+def file_hash(path: Path) -> str:
+    """blake2b hex digest of a file."""
+    return hashlib.blake2b(path.read_bytes()).hexdigest()
+
+
+def render_key(quality: bool) -> str:
     """
-    create macos .icns file from png.
+    the render settings a cached png depends on, e.g. "v2-64-35db".
+
+    renderer version, which levels are quality-checked (all, or those up
+    to SMALL_LEVEL) and MIN_PSNR.
+    """
+    checked = "all" if quality else str(SMALL_LEVEL)
+    return f"v{RENDERER_VERSION}-{checked}-{MIN_PSNR:g}db"
+
+
+def icns_sizes() -> list[int]:
+    """every pixel size the icns file needs, including retina variants."""
+    return sorted({size for _, size in ICNS_TYPES})
+
+
+def decode_source(source_path: Path) -> Image.Image:
+    """decode the source image once, as rgba."""
+    with Image.open(source_path) as img:
+        return img.convert("RGBA")
+
+
+def build_pyramid(source: Image.Image, sizes: list[int]) -> dict[int, Image.Image]:
+    """
+    resample source into size x size levels, largest first.
+
+    each level is derived from the nearest smaller-but-at-least-2x level
+    already built, so only the largest sizes touch the full-resolution
+    source. levels above the source resolution are never used as parents,
+    since an upscale adds no detail.
+
+    returns:
+        size -> image
+    """
+    limit = min(source.size)
+    levels: dict[int, Image.Image] = {}
+    for size in sorted(set(sizes), reverse=True):
+        parents = [level for level in levels if 2 * size <= level <= limit]
+        parent = levels[min(parents)] if parents else source
+        levels[size] = parent.resize((size, size), Image.Resampling.LANCZOS)
+    return levels
+
+
+def psnr(a: Image.Image, b: Image.Image) -> float:
+    """peak signal-to-noise ratio between two same-sized images, in db."""
+    bands = ImageStat.Stat(ImageChops.difference(a, b)).rms
+    rms = math.sqrt(sum(value * value for value in bands) / len(bands))
+    return math.inf if rms == 0 else 20 * math.log10(255 / rms)
+
+
+def check_quality(
+    source: Image.Image,
+    levels: dict[int, Image.Image],
+    min_psnr: float = MIN_PSNR,
+    max_size: int | None = None,
+) -> dict[int, float]:
+    """
+    compare levels against a direct resize of the source.
+
+    levels below min_psnr are replaced by the direct resize in place.
 
     args:
-        source_path: path to source png
-        output_path: path to output .icns file
+        source: decoded source image
+        levels: pyramid levels, size -> image
+        min_psnr: lowest acceptable psnr in db
+        max_size: only check levels up to this size (default: every level)
 
     returns:
-        success status
+        size -> psnr of each checked pyramid level
     """
-    print(f"creating macos icon: {output_path}")
+    scores = {}
+    for size, level in levels.items():
+        if max_size is not None and size > max_size:
+            continue
+        direct = source.resize((size, size), Image.Resampling.LANCZOS)
+        scores[size] = psnr(level, direct)
+        if scores[size] < min_psnr:
+            print(f"  {size}px: {scores[size]:.1f} db < {min_psnr} db, using direct resize")
+            levels[size] = direct
+    return scores
+
+
+def encode_png(image: Image.Image, path: Path) -> None:
+    """encode one level to path; runs in a worker process."""
+    # write under a private name so concurrent builds never see half a file
+    tmp = path.with_name(f".{path.name}.{os.getpid()}")
+    image.save(tmp, format="PNG")
+    os.replace(tmp, path)
+
+
+class RenderedSizes:
+    """
+    every rendered size, as cached png files and as images.
 
-    # load source image
-    img = Image.open(source_path)
+    images come from the in-memory pyramid when this run built one, or are
+    decoded from the cached png otherwise.
+    """
+
+    def __init__(
+        self, cache_dir: Path, digest: str, key: str, levels: dict[int, Image.Image]
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.digest = digest
+        self.key = key
+        self.levels = levels
+
+    @property
+    def prefix(self) -> str:
+        """file name prefix shared by every png of this source and render key."""
+        return f"{self.digest[:20]}-{self.key}-"
+
+    def path(self, size: int) -> Path:
+        """cached png for size; the cache key is the source hash, render key and size."""
+        return self.cache_dir / f"{self.prefix}{size}.png"
+
+    def prune(self) -> int:
+        """
+        remove cached pngs of other sources or render settings.
+
+        returns:
+            number of files removed
+        """
+        removed = 0
+        for path in self.cache_dir.glob("*.png"):
+            if not path.name.startswith(self.prefix):
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def image(self, size: int) -> Image.Image:
+        """image for size."""
+        if size not in self.levels:
+            with Image.open(self.path(size)) as img:
+                self.levels[size] = img.convert("RGBA")
+        return self.levels[size]
+
+
+def render_sizes(
+    source_path: Path,
+    digest: str,
+    sizes: list[int],
+    cache_dir: Path,
+    jobs: int | None,
+    quality: bool = False,
+) -> RenderedSizes:
+    """
+    render every size not already cached, from one decode of the source.
 
-    # icns requires specific sizes
-    sizes = [16, 32, 64, 128, 256, 512, 1024]
+    args:
+        source_path: path to source png
+        digest: source hash, part of the cache key
+        sizes: pixel sizes needed
+        cache_dir: png cache directory
+        jobs: worker processes for png encoding (1: encode in-process)
+        quality: check every pyramid level against a direct resize, not
+            just those up to SMALL_LEVEL
 
-    # create iconset directory
-    iconset_path = output_path.parent / f"{output_path.stem}.iconset"
-    iconset_path.mkdir(exist_ok=True)
+    returns:
+        rendered sizes
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    rendered = RenderedSizes(cache_dir, digest, render_key(quality), {})
+    sizes = sorted(set(sizes))
+    missing = [size for size in sizes if not rendered.path(size).exists()]
+    print(f"rendering {len(missing)} of {len(sizes)} sizes ({len(sizes) - len(missing)} cached)")
+    if not missing:
+        return rendered
+
+    # the pyramid needs the larger levels as parents, so build all of them
+    source = decode_source(source_path)
+    rendered.levels = build_pyramid(source, sizes)
+    scores = check_quality(source, rendered.levels, max_size=None if quality else SMALL_LEVEL)
+    print("quality: " + ", ".join(
+        f"{size}px {score:.1f} db" for size, score in sorted(scores.items())
+    ))
+    del source
+
+    images = [rendered.levels[size] for size in missing]
+    paths = [rendered.path(size) for size in missing]
+    if (jobs or os.cpu_count() or 1) == 1 or len(missing) == 1:
+        for image, path in zip(images, paths):
+            encode_png(image, path)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            list(pool.map(encode_png, images, paths))
+    return rendered
 
-    # create all required sizes
-    for size in sizes:
-        # standard resolution
-        resized = img.resize((size, size), Image.Resampling.LANCZOS)
-        resized.save(iconset_path / f"icon_{size}x{size}.png")
 
-        # retina resolution (2x)
-        if size <= 512:
-            retina_size = size * 2
-            resized_2x = img.resize((retina_size, retina_size), Image.Resampling.LANCZOS)
-            resized_2x.save(iconset_path / f"icon_{size}x{size}@2x.png")
+class OutputIndex:
+    """
+    remembers which source hash each output was built from.
 
-    # convert iconset to icns using macos tool
-    import subprocess
-    try:
-        result = subprocess.run(
-            ["iconutil", "-c", "icns", str(iconset_path), "-o", str(output_path)],
-            capture_output=True,
-            text=True,
+    an output is up to date when it was built from the current source and
+    its content is still what was written.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        try:
+            self.entries: dict[str, dict[str, str]] = json.loads(path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def up_to_date(self, output: Path, digest: str) -> bool:
+        """
+        true if output exists, was built from digest and is unmodified.
+
+        digest identifies the build: source hash plus render key.
+        """
+        entry = self.entries.get(str(output))
+        return (
+            entry is not None
+            and entry["source"] == digest
+            and output.exists()
+            and file_hash(output) == entry["output"]
         )
 
-        if result.returncode != 0:
-            print(f"warning: iconutil failed: {result.stderr}")
-            print("note: icns creation requires macos with iconutil")
-            return False
+    def record(self, output: Path, digest: str) -> None:
+        """note that output was just built from digest."""
+        self.entries[str(output)] = {"source": digest, "output": file_hash(output)}
+
+    def save(self) -> None:
+        """write the index back to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.entries, indent=2, sort_keys=True) + "\n")
 
-        # cleanup iconset directory
-        import shutil
-        shutil.rmtree(iconset_path)
 
-        print(f"✓ created {output_path}")
-        return True
+def encode_icns(elements: list[tuple[bytes, bytes]]) -> bytes:
+    """
+    pack png data into an icns container.
 
-    except FileNotFoundError:
-        print("warning: iconutil not found (macos only)")
-        print(f"iconset directory created at: {iconset_path}")
-        print("manually convert with: iconutil -c icns " + str(iconset_path))
-        return False
+    the format is a b"icns" header with the total length, then one
+    element per image: a 4-byte type, a big-endian length including the
+    8-byte element header, and the png data. a leading table of contents
+    lists each element's type and length, as iconutil writes it.
 
-def create_ico(source_path: Path, output_path: Path) -> bool:
+    args:
+        elements: (icns type, png bytes) pairs, see ICNS_TYPES
     """
-    create windows .ico file from png.
+    toc = b"".join(kind + struct.pack(">I", len(data) + 8) for kind, data in elements)
+    body = [b"TOC " + struct.pack(">I", len(toc) + 8) + toc]
+    body.extend(kind + struct.pack(">I", len(data) + 8) + data for kind, data in elements)
+    content = b"".join(body)
+    return b"icns" + struct.pack(">I", len(content) + 8) + content
+
+
+def create_icns(rendered: RenderedSizes, output_path: Path) -> bool:
+    """
+    create macos .icns file from rendered pngs.
+
+    written directly, so it works on any platform without iconutil.
 
     args:
-        source_path: path to source png
-        output_path: path to output .ico file
+        rendered: rendered sizes, covering icns_sizes()
+        output_path: path to output .icns file
 
     returns:
         success status
     """
-    print(f"creating windows icon: {output_path}")
+    print(f"creating macos icon: {output_path}")
 
-    # load source image
-    img = Image.open(source_path)
+    data = encode_icns([
+        (kind, rendered.path(size).read_bytes()) for kind, size in ICNS_TYPES
+    ])
+    tmp = output_path.with_name(f".{output_path.name}.{os.getpid()}")
+    tmp.write_bytes(data)
+    os.replace(tmp, output_path)
+
+    print(f"✓ created {output_path}")
+    return True
 
-    # ico supports multiple sizes in one file
-    sizes = [(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
 
-    # create images at each size
-    images = []
-    for size in sizes:
-        resized = img.resize(size, Image.Resampling.LANCZOS)
-        images.append(resized)
+def create_ico(rendered: RenderedSizes, output_path: Path) -> bool:
+    """
+    create windows .ico file from rendered pngs.
 
-    # save as ico with all sizes
-    img.save(output_path, format='ICO', sizes=sizes)
+    args:
+        rendered: rendered sizes, covering ICO_SIZES
+        output_path: path to output .ico file
+
+    returns:
+        success status
+    """
+    print(f"creating windows icon: {output_path}")
+
+    # save as ico with all sizes; pillow uses the matching image per size
+    # instead of resizing the first one again
+    images = [rendered.image(size) for size in reversed(ICO_SIZES)]
+    images[0].save(
+        output_path,
+        format="ICO",
+        sizes=[(size, size) for size in ICO_SIZES],
+        append_images=images[1:],
+    )
 
     print(f"✓ created {output_path}")
     return True
 
-def create_png_icons(source_path: Path, output_dir: Path) -> bool:
+
+def create_png_icons(
+    source_path: Path, rendered: RenderedSizes, output_dir: Path, outputs: list[Path]
+) -> bool:
     """
     create multiple png sizes for linux.
 
     args:
         source_path: path to source png
+        rendered: rendered sizes, covering PNG_SIZES
         output_dir: directory for output files
+        outputs: files to (re)write; others are already up to date
 
     returns:
         success status
     """
     print(f"creating linux icons: {output_dir}")
 
-    # load source image
-    img = Image.open(source_path)
-
-    # common linux icon sizes
-    sizes = [16, 22, 24, 32, 48, 64, 128, 256, 512]
-
     output_dir.mkdir(exist_ok=True)
 
-    for size in sizes:
-        resized = img.resize((size, size), Image.Resampling.LANCZOS)
+    for size in PNG_SIZES:
         output_file = output_dir / f"icon-{size}.png"
-        resized.save(output_file)
+        if output_file in outputs:
+            shutil.copyfile(rendered.path(size), output_file)
 
     # also copy original
-    import shutil
-    shutil.copy(source_path, output_dir / "icon-original.png")
+    original = output_dir / "icon-original.png"
+    if original in outputs:
+        shutil.copy(source_path, original)
 
-    print(f"✓ created {len(sizes) + 1} icons in {output_dir}")
+    print(f"✓ created {len(outputs)} of {len(PNG_SIZES) + 1} icons in {output_dir}")
     return True
 
+
 def main() -> None:
     """main entry point."""
+    parser = argparse.ArgumentParser(description="convert the app icon to platform formats.")
     # paths - look for icon in assets directory
-    source = Path("assets/DEV-WF-ICON.png")
+    parser.add_argument("--source", type=Path, default=Path("assets/DEV-WF-ICON.png"))
+    parser.add_argument("--output-dir", type=Path, default=Path("assets/icons"))
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR)
+    parser.add_argument("--jobs", "-j", type=int, help="worker processes (default: cpu count)")
+    parser.add_argument("--force", action="store_true", help="rebuild every output")
+    parser.add_argument(
+        "--check-quality", action="store_true",
+        help=f"compare every pyramid level with a direct resize (min {MIN_PSNR} db); "
+             f"levels up to {SMALL_LEVEL}px are always checked",
+    )
+    args = parser.parse_args()
+    source = args.source
 
     if not source.exists():
         print(f"error: source icon not found: {source}")
@@ -161,35 +436,80 @@ def main() -> None:
 
     # verify source is valid
     try:
-        img = Image.open(source)
-        print(f"dimensions: {img.size[0]}x{img.size[1]}")
-        print(f"format: {img.format}")
-        print()
+        with Image.open(source) as img:
+            print(f"dimensions: {img.size[0]}x{img.size[1]}")
+            print(f"format: {img.format}")
+            print()
     except Exception as e:
         print(f"error: invalid image file: {e}")
         sys.exit(1)
 
     # create output directory
-    icons_dir = Path("assets/icons")
-    icons_dir.mkdir(exist_ok=True)
+    icons_dir = args.output_dir
+    icons_dir.mkdir(parents=True, exist_ok=True)
+
+    digest = file_hash(source)
+    # outputs depend on the render settings too, not just the source
+    build = f"{digest}-{render_key(args.check_quality)}"
+    index = OutputIndex(args.cache_dir / "outputs.json")
+
+    def stale(output: Path) -> bool:
+        return args.force or not index.up_to_date(output, build)
+
+    icns_path = icons_dir / "icon.icns"
+    ico_path = icons_dir / "icon.ico"
+    linux_dir = icons_dir / "linux"
+    png_outputs = [linux_dir / f"icon-{size}.png" for size in PNG_SIZES]
+    png_outputs.append(linux_dir / "icon-original.png")
+    png_outputs = [output for output in png_outputs if stale(output)]
+
+    # only render the sizes some stale output needs
+    sizes: list[int] = []
+    if stale(icns_path):
+        sizes.extend(icns_sizes())
+    if stale(ico_path):
+        sizes.extend(ICO_SIZES)
+    sizes.extend(int(output.stem.split("-")[1]) for output in png_outputs
+                 if output.stem != "icon-original")
+
+    if not sizes and not png_outputs:
+        print("✅ all icons up to date")
+        return
+
+    rendered = render_sizes(
+        source, digest, sizes, args.cache_dir, args.jobs, quality=args.check_quality
+    )
 
     # convert to each format
     success = True
 
     # macos .icns
-    icns_path = icons_dir / "icon.icns"
-    if not create_icns(source, icns_path):
-        success = False
+    if stale(icns_path):
+        if create_icns(rendered, icns_path):
+            index.record(icns_path, build)
+        else:
+            success = False
 
     # windows .ico
-    ico_path = icons_dir / "icon.ico"
-    if not create_ico(source, ico_path):
-        success = False
+    if stale(ico_path):
+        if create_ico(rendered, ico_path):
+            index.record(ico_path, build)
+        else:
+            success = False
 
     # linux png icons
-    linux_dir = icons_dir / "linux"
-    if not create_png_icons(source, linux_dir):
-        success = False
+    if png_outputs:
+        if create_png_icons(source, rendered, linux_dir, png_outputs):
+            for output in png_outputs:
+                index.record(output, build)
+        else:
+            success = False
+
+    index.save()
+    if success:
+        removed = rendered.prune()
+        if removed:
+            print(f"pruned {removed} cached pngs of other sources or settings")
 
     print()
     if success:
@@ -202,5 +522,6 @@ def main() -> None:
         print("⚠️  some icons created with warnings")
         print("check output above for details")
 
+
 if __name__ == "__main__":
     main()
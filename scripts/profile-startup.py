@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+profile how long the app takes to put its window on screen.
+
+launches the app (from source, or a built executable with --app) with
+$CLAUDE_SETUP_STARTUP set, so it records its startup milestones and
+quits as soon as the first window is up, and splits the wall time from
+launch into:
+
+    extract   onefile builds: unpacking the bundle into a temp dir
+    python    interpreter start and the core (qt-free) imports
+    import    importing pyside6 and the gui module
+    app       creating the QApplication
+    window    building the main window, including the source snapshot
+    shown     first pass of the event loop with the window mapped
+
+the first run after a build or reboot is the cold start; later runs are
+warm. --budget fails the run if the cold start is too slow.
+
+usage:
+    python3 scripts/profile-startup.py --runs 5
+    python3 scripts/profile-startup.py --app "dist/Claude Workflow Setup.app" --budget 1.0
+    python3 scripts/profile-startup.py --importtime   # slowest imports, source only
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from claude_setup import STARTUP_ENV
+
+# milestones in the order the app reaches them, with the phase each one ends
+PHASES = (
+    ("extract", "extracted"),
+    ("python", "main"),
+    ("import", "gui_imported"),
+    ("app", "app"),
+    ("window", "window"),
+    ("shown", "shown"),
+)
+
+
+def app_command(app: Path | None) -> list[str]:
+    """command that starts the app: a .app bundle, an executable, or the source."""
+    root = Path(__file__).parent.parent
+    if app is None:
+        return [sys.executable, str(root / "claude_setup.py")]
+    if app.suffix == ".app":
+        # run the binary directly; `open` would return before the window is up
+        return [str(next((app / "Contents" / "MacOS").iterdir()))]
+    return [str(app)]
+
+
+def run_once(command: list[str], env: dict[str, str], timeout: float) -> dict[str, float]:
+    """
+    launch the app once and time its phases.
+
+    returns:
+        phase name -> seconds, plus "total" (launch to first window)
+
+    raises:
+        RuntimeError: if the app exits without writing a startup report
+    """
+    with tempfile.TemporaryDirectory(prefix="claude-startup-") as tmp:
+        report_path = Path(tmp) / "startup.json"
+        env = {**env, STARTUP_ENV: str(report_path)}
+        launched = time.time()
+        result = subprocess.run(command, env=env, capture_output=True, text=True, timeout=timeout)
+        if not report_path.exists():
+            raise RuntimeError(
+                f"no startup report (exit code {result.returncode}): {result.stderr.strip()}"
+            )
+        marks = json.loads(report_path.read_text())["marks"]
+
+    timings = {}
+    previous = launched
+    for phase, mark in PHASES:
+        if mark in marks:
+            timings[phase] = marks[mark] - previous
+            previous = marks[mark]
+        else:
+            timings[phase] = 0.0
+    timings["total"] = marks["shown"] - launched
+    return timings
+
+
+def slowest_imports(module: str, count: int) -> list[tuple[float, str]]:
+    """
+    the slowest imports (cumulative seconds) of module, from python -X importtime.
+    """
+    root = Path(__file__).parent.parent
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root, capture_output=True, text=True, check=True,
+    )
+    pattern = re.compile(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s+(.*)")
+    found = []
+    for line in result.stderr.splitlines():
+        match = pattern.match(line)
+        if match:
+            found.append((int(match.group(1)) / 1e6, match.group(2).rstrip()))
+    return sorted(found, reverse=True)[:count]
+
+
+def main() -> None:
+    """main entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--app", type=Path,
+        help="built app to launch: .app bundle or executable (default: run from source)",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="launches; the first is the cold one")
+    parser.add_argument(
+        "--offscreen", action="store_true",
+        help="use qt's offscreen platform (no display needed, e.g. in ci)",
+    )
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait per launch")
+    parser.add_argument(
+        "--budget", type=float, help="exit 1 if the cold start takes longer than this (seconds)"
+    )
+    parser.add_argument(
+        "--importtime", action="store_true",
+        help="also list the slowest imports of the gui module (source only)",
+    )
+    parser.add_argument("--json", type=Path, help="write results to this file")
+    args = parser.parse_args()
+
+    command = app_command(args.app)
+    env = dict(os.environ)
+    if args.offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+
+    runs = []
+    print(f"{'run':<6}" + "".join(f"{phase:>9}" for phase, _ in PHASES) + f"{'total':>9}")
+    for index in range(args.runs):
+        try:
+            timings = run_once(command, env, args.timeout)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"error: {e}", file=sys.stderr)
+            sys.exit(2)
+        runs.append(timings)
+        label = "cold" if index == 0 else f"warm{index}"
+        print(f"{label:<6}" + "".join(f"{timings[p]:>9.3f}" for p, _ in PHASES)
+              + f"{timings['total']:>9.3f}")
+
+    imports = []
+    if args.importtime:
+        imports = slowest_imports("claude_setup_gui", 15)
+        print("\nslowest imports (cumulative):")
+        for seconds, module in imports:
+            print(f"  {seconds:>8.3f}s  {module}")
+
+    if args.json:
+        args.json.write_text(json.dumps({
+            "command": command,
+            "runs": runs,
+            "imports": [{"module": m, "seconds": s} for s, m in imports],
+        }, indent=2) + "\n")
+        print(f"\nwrote {args.json}")
+
+    cold = runs[0]["total"]
+    if args.budget is not None:
+        if cold > args.budget:
+            print(f"\ncold start {cold:.3f}s is over the {args.budget:.3f}s budget")
+            sys.exit(1)
+        print(f"\ncold start {cold:.3f}s is within the {args.budget:.3f}s budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+tests for scripts/build-commands.py.
+
+tests the incremental slash command build and frontmatter validation.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+
+class TestBuildCommands:
+    """test the incremental slash command build (scripts/build-commands.py)."""
+
+    @pytest.fixture
+    def builder(self, monkeypatch: pytest.MonkeyPatch) -> object:
+        """load the hyphenated build script as a module."""
+        import importlib.util
+
+        path = Path(__file__).parent.parent / "scripts" / "build-commands.py"
+        spec = importlib.util.spec_from_file_location("build_commands", path)
+        module = importlib.util.module_from_spec(spec)  # type: ignore[arg-type]
+        # dataclasses look their module up in sys.modules
+        monkeypatch.setitem(sys.modules, "build_commands", module)
+        spec.loader.exec_module(module)  # type: ignore[union-attr]
+        return module
+
+    @pytest.fixture
+    def sources(self, tmp_path: Path) -> Path:
+        """create command sources in two categories."""
+        source_dir = tmp_path / "docs"
+        (source_dir / "testing").mkdir(parents=True)
+        (source_dir / "git-pr").mkdir()
+        (source_dir / "README.md").write_text("# not a command\n")
+        (source_dir / "testing" / "TEST.md").write_text("# Test\n\nRun pytest.\n")
+        (source_dir / "git-pr" / "COMMIT.md").write_text(
+            "---\ndescription: commit changes\n---\n\n# Commit\n"
+        )
+        return source_dir
+
+    def test_builds_only_changed_commands(
+        self, builder: object, sources: Path, tmp_path: Path
+    ) -> None:
+        """test first build, no-op rebuild, edit, and deleted source."""
+        out, state = tmp_path / "out", tmp_path / "state.json"
+
+        first = builder.build_commands(sources, out, state)  # type: ignore[attr-defined]
+        assert sorted(first.built) == ["git-pr/COMMIT.md", "testing/TEST.md"]
+        assert (out / "testing" / "TEST.md").read_text().startswith(
+            "---\ndescription: Run pytest.\n---\n\n# Test"
+        )
+        assert not (out / "README.md").exists()
+
+        mtime = (out / "git-pr" / "COMMIT.md").stat().st_mtime_ns
+        (sources / "testing" / "TEST.md").write_text("# Test\n\nRun pytest -q.\n")
+        (out / "git-pr" / "EXTRA.md").write_text("hand-written, not ours")
+        second = builder.build_commands(sources, out, state)  # type: ignore[attr-defined]
+        assert second.built == ["testing/TEST.md"]
+        assert second.unchanged == ["git-pr/COMMIT.md"]
+        assert (out / "git-pr" / "COMMIT.md").stat().st_mtime_ns == mtime
+
+        (sources / "testing" / "TEST.md").unlink()
+        third = builder.build_commands(sources, out, state)  # type: ignore[attr-defined]
+        assert third.removed == ["testing/TEST.md"]
+        assert not (out / "testing").exists()
+        assert (out / "git-pr" / "EXTRA.md").exists()
+
+    def test_invalid_metadata_is_reported_and_not_written(
+        self, builder: object, sources: Path, tmp_path: Path
+    ) -> None:
+        """test unknown frontmatter keys, bad names and missing descriptions."""
+        (sources / "testing" / "bad-name.md").write_text("# Bad\n\nx\n")
+        (sources / "testing" / "EMPTY.md").write_text("# Empty\n")
+        (sources / "testing" / "KEYS.md").write_text("---\ncolour: red\n---\n# Keys\n\nx\n")
+
+        report = builder.build_commands(  # type: ignore[attr-defined]
+            sources, tmp_path / "out", tmp_path / "state.json"
+        )
+
+        assert not report.ok
+        assert set(report.errors) == {"testing/bad-name.md", "testing/EMPTY.md", "testing/KEYS.md"}
+        assert "unknown frontmatter key" in report.errors["testing/KEYS.md"]
+        assert not (tmp_path / "out" / "testing" / "EMPTY.md").exists()
@@ -6,8 +6,15 @@ tests copy logic, validation, and path handling.
 
 from __future__ import annotations
 
+import errno
+import json
+import os
 import shutil
+import subprocess
 import tempfile
+import threading
+import time
+import zipfile
 from pathlib import Path
 
 import pytest
@@ -17,7 +24,105 @@ import sys
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from claude_setup import copy_claude_folder, get_source_claude_dir, validate_target_dir
+from claude_setup import (
+    CopyCancelled,
+    DeployRegistry,
+    DiscoveryCache,
+    FileCopier,
+    GenerationPolicy,
+    MANIFEST_NAME,
+    PACK_NAME,
+    PROFILES_NAME,
+    InstallProfile,
+    Manifest,
+    ObjectStore,
+    ProfileError,
+    SourceTree,
+    TemplateStage,
+    WatchState,
+    build_manifest,
+    cached_bundle,
+    copy_claude_folder,
+    deploy_many,
+    discover_projects,
+    doctor,
+    find_projects,
+    get_source_claude_dir,
+    list_generations,
+    load_profiles,
+    mark_startup,
+    pack_claude_folder,
+    preflight_many,
+    prune_generations,
+    remove_stale_staging,
+    rollback,
+    run_deploy_cli,
+    run_status_cli,
+    select_profile,
+    snapshot_source,
+    start_trace,
+    stop_trace,
+    sync_claude_folder,
+    sync_watched,
+    trace_phase,
+    validate_target_dir,
+    verify_manifest,
+    verify_snapshot,
+    wait_for_cleanup,
+    write_startup_report,
+    watch_source,
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated_state_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """keep watch state, caches and the registry out of the real home directory."""
+    state_dir = tmp_path / "claude-setup-home"
+    monkeypatch.setenv("CLAUDE_SETUP_HOME", str(state_dir))
+    return state_dir
+
+
+class TestImportWithoutQt:
+    """test that the copy engine never pulls in pyside6."""
+
+    def run_isolated(self, code: str) -> subprocess.CompletedProcess:
+        """run code in a fresh interpreter with the project on sys.path."""
+        prelude = (
+            "import sys\n"
+            f"sys.path.insert(0, {str(Path(__file__).parent.parent)!r})\n"
+        )
+        return subprocess.run(
+            [sys.executable, "-c", prelude + code],
+            capture_output=True,
+            text=True,
+        )
+
+    def test_core_import_does_not_load_qt(self) -> None:
+        """test that importing claude_setup leaves PySide6 unloaded."""
+        result = self.run_isolated(
+            "from claude_setup import copy_claude_folder, get_source_claude_dir, "
+            "validate_target_dir\n"
+            "loaded = sorted(m for m in sys.modules if m.split('.')[0] == 'PySide6')\n"
+            "assert not loaded, loaded\n"
+        )
+
+        assert result.returncode == 0, result.stderr
+
+    def test_headless_command_does_not_load_qt(self, tmp_path: Path) -> None:
+        """test that a cli command runs end to end without PySide6."""
+        source = tmp_path / ".claude"
+        (source / "commands").mkdir(parents=True)
+        (source / "commands" / "TEST.md").write_text("# test")
+
+        result = self.run_isolated(
+            "import claude_setup\n"
+            f"code = claude_setup.run_manifest_cli(['--source', {str(source)!r}, "
+            f"'--output', {str(tmp_path / 'manifest.json')!r}])\n"
+            "assert code == 0\n"
+            "assert 'PySide6' not in sys.modules\n"
+        )
+
+        assert result.returncode == 0, result.stderr
 
 
 class TestGetSourceClaudeDir:
@@ -254,6 +359,1364 @@ class TestCopyClaudeFolder:
         assert missing_commands or missing_skills or missing_hooks or missing_settings
 
 
+class TestSyncClaudeFolder:
+    """test sync_claude_folder() and copy_claude_folder(sync=True)."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory for testing."""
+        claude_dir = tmp_path / "source" / ".claude"
+        (claude_dir / "commands" / "testing").mkdir(parents=True)
+        (claude_dir / "skills").mkdir()
+        (claude_dir / "hooks").mkdir()
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        (claude_dir / "commands" / "testing" / "TEST.md").write_text("# test")
+        (claude_dir / "hooks" / "test.sh").write_text("#!/bin/bash\necho test")
+        return claude_dir
+
+    def test_sync_into_empty_target_creates_everything(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that first sync creates every file."""
+        summary = sync_claude_folder(mock_claude_dir, tmp_path)
+
+        assert "settings.json" in summary.created
+        assert "commands/testing/TEST.md" in summary.created
+        assert summary.updated == [] and summary.deleted == []
+        assert (tmp_path / ".claude" / "hooks" / "test.sh").exists()
+
+    def test_second_sync_skips_unchanged_files(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that re-syncing an identical tree touches nothing."""
+        sync_claude_folder(mock_claude_dir, tmp_path)
+        inode = (tmp_path / ".claude" / "settings.json").stat().st_ino
+
+        summary = sync_claude_folder(mock_claude_dir, tmp_path)
+
+        assert summary.changed is False
+        assert len(summary.skipped) == 3
+        assert (tmp_path / ".claude" / "settings.json").stat().st_ino == inode
+
+    def test_sync_updates_changed_and_deletes_stale(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that only changed files are copied and stale ones removed."""
+        sync_claude_folder(mock_claude_dir, tmp_path)
+        target_claude = tmp_path / ".claude"
+        (target_claude / "old-file.txt").write_text("stale")
+        (target_claude / "old-dir").mkdir()
+        (mock_claude_dir / "commands" / "testing" / "TEST.md").write_text("# changed!")
+
+        summary = sync_claude_folder(mock_claude_dir, tmp_path)
+
+        assert summary.updated == ["commands/testing/TEST.md"]
+        assert sorted(summary.deleted) == ["old-dir/", "old-file.txt"]
+        assert (target_claude / "commands" / "testing" / "TEST.md").read_text() == "# changed!"
+        assert not (target_claude / "old-file.txt").exists()
+
+    def test_sync_detects_same_size_change_by_hash(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that equal-size edits with a different mtime are caught."""
+        sync_claude_folder(mock_claude_dir, tmp_path)
+        copied = tmp_path / ".claude" / "settings.json"
+        copied.write_text('{"test": 1.0}')  # same length as source
+
+        summary = sync_claude_folder(mock_claude_dir, tmp_path)
+
+        assert summary.updated == ["settings.json"]
+        assert copied.read_text() == '{"test": true}'
+
+    def test_copy_with_sync_returns_true(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that copy_claude_folder(sync=True) verifies like a full copy."""
+        (tmp_path / ".claude").mkdir()
+
+        assert copy_claude_folder(mock_claude_dir, tmp_path, sync=True) is True
+
+
+class TestCopyProgressAndCancel:
+    """test progress reporting and cancellation of copy_claude_folder()."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory with a handful of commands."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands", "skills", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        for i in range(5):
+            (claude_dir / "commands" / f"CMD-{i}.md").write_text("# command\n" * 10)
+        return claude_dir
+
+    def test_progress_reports_every_file(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that progress is reported per file with byte totals."""
+        seen = []
+
+        copy_claude_folder(mock_claude_dir, tmp_path, progress=seen.append)
+
+        assert len(seen) == 6
+        assert seen[-1].files_done == seen[-1].files_total == 6
+        assert seen[-1].bytes_done == seen[-1].bytes_total
+        assert {p.current for p in seen} >= {"settings.json", "commands/CMD-0.md"}
+
+    def test_parallel_copy_matches_sequential(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that copying on many threads gives the same files and modes."""
+        (mock_claude_dir / "commands" / "CMD-0.md").chmod(0o600)
+        trees = {}
+        for jobs in (1, 8):
+            target = tmp_path / f"target-{jobs}"
+            seen = []
+            assert copy_claude_folder(
+                mock_claude_dir, target, progress=seen.append, jobs=jobs
+            )
+            assert seen[-1].files_done == 6
+            trees[jobs] = {
+                str(p.relative_to(target)): (p.stat().st_mode, p.is_file() and p.read_bytes())
+                for p in sorted(target.rglob("*"))
+            }
+
+        assert trees[1] == trees[8]
+        assert trees[8][".claude/commands/CMD-0.md"][0] & 0o777 == 0o600
+
+    @pytest.mark.parametrize("sync", [False, True])
+    @pytest.mark.parametrize("jobs", [1, 8])
+    def test_cancel_leaves_existing_target_unchanged(
+        self, mock_claude_dir: Path, tmp_path: Path, sync: bool, jobs: int
+    ) -> None:
+        """test that a cancelled overwrite or sync keeps the old .claude/."""
+        existing = tmp_path / ".claude"
+        existing.mkdir()
+        (existing / "old-file.txt").write_text("old content")
+        cancel = threading.Event()
+
+        def cancel_after_two(state) -> None:
+            if state.files_done == 2:
+                cancel.set()
+
+        with pytest.raises(CopyCancelled):
+            copy_claude_folder(
+                mock_claude_dir, tmp_path, overwrite=True, sync=sync,
+                progress=cancel_after_two, cancel=cancel, jobs=jobs,
+            )
+
+        assert [p.name for p in existing.iterdir()] == ["old-file.txt"]
+        assert [p.name for p in tmp_path.iterdir() if p.name != "source"] == [".claude"]
+
+
+class TestAtomicSwap:
+    """test staged install swapped in with a single rename."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory for testing."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands", "skills", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        return claude_dir
+
+    @pytest.fixture
+    def target_dir(self, tmp_path: Path) -> Path:
+        """create target with an existing .claude/ to be replaced."""
+        target = tmp_path / "target"
+        (target / ".claude").mkdir(parents=True)
+        (target / ".claude" / "old-file.txt").write_text("old content")
+        return target
+
+    @pytest.mark.parametrize("exchange", [True, False])
+    def test_overwrite_swaps_and_removes_old_tree(
+        self,
+        mock_claude_dir: Path,
+        target_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        exchange: bool,
+    ) -> None:
+        """test both the atomic exchange and the rename-aside fallback."""
+        import claude_setup
+
+        if not exchange:
+            monkeypatch.setattr(claude_setup, "_exchange_paths", lambda a, b: False)
+
+        assert copy_claude_folder(mock_claude_dir, target_dir, overwrite=True)
+        wait_for_cleanup()
+
+        assert (target_dir / ".claude" / "settings.json").exists()
+        assert not (target_dir / ".claude" / "old-file.txt").exists()
+        assert [p.name for p in target_dir.iterdir()] == [".claude"]
+
+    def test_exchange_swaps_two_directories(self, tmp_path: Path) -> None:
+        """test renameat2/renamex_np exchange where the platform has it."""
+        from claude_setup import _exchange_paths
+
+        (tmp_path / "a").mkdir()
+        (tmp_path / "a" / "from-a").touch()
+        (tmp_path / "b").mkdir()
+
+        if not _exchange_paths(tmp_path / "a", tmp_path / "b"):
+            pytest.skip("atomic exchange not supported here")
+
+        assert (tmp_path / "b" / "from-a").exists()
+        assert not (tmp_path / "a" / "from-a").exists()
+
+    def test_remove_stale_staging(self, tmp_path: Path) -> None:
+        """test that retired trees and old staging dirs are cleaned up."""
+        (tmp_path / ".claude.old-abc").mkdir()
+        (tmp_path / ".claude.partial-old").mkdir()
+        (tmp_path / ".claude.partial-new").mkdir()
+        os.utime(tmp_path / ".claude.partial-old", (0, 0))
+
+        removed = remove_stale_staging(tmp_path)
+
+        assert sorted(p.name for p in removed) == [".claude.old-abc", ".claude.partial-old"]
+        assert (tmp_path / ".claude.partial-new").exists()
+
+
+class TestManifest:
+    """test build_manifest() and verify_manifest()."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory for testing."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands", "skills", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        (claude_dir / "commands" / "TEST.md").write_text("# test command")
+        (claude_dir / "hooks" / "test.sh").write_text("#!/bin/bash\necho test")
+        (claude_dir / "hooks" / "test.sh").chmod(0o755)
+        return claude_dir
+
+    def test_manifest_round_trips_through_json(self, mock_claude_dir: Path) -> None:
+        """test that a manifest survives serialization unchanged."""
+        manifest = build_manifest(mock_claude_dir, version="1.2.3")
+
+        loaded = Manifest.from_json(manifest.to_json())
+
+        assert [e.path for e in loaded.entries] == [
+            "settings.json", "commands/TEST.md", "hooks/test.sh",
+        ]
+        assert loaded.version == "1.2.3"
+        assert loaded.digest == manifest.digest
+        assert loaded.entries[2].mode == 0o755
+
+    @pytest.mark.parametrize("jobs", [1, 4])
+    def test_verify_passes_for_faithful_copy(
+        self, mock_claude_dir: Path, tmp_path: Path, jobs: int
+    ) -> None:
+        """test that an exact copy verifies cleanly."""
+        manifest = build_manifest(mock_claude_dir)
+        copy_claude_folder(mock_claude_dir, tmp_path)
+
+        result = verify_manifest(tmp_path / ".claude", manifest, jobs=jobs)
+
+        assert result.ok
+        assert result.checked == 3
+        assert result.bytes_checked == manifest.total_bytes
+
+    def test_verify_reports_missing_and_corrupt_files(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that missing files and same-size corruption are detected."""
+        manifest = build_manifest(mock_claude_dir)
+        copy_claude_folder(mock_claude_dir, tmp_path)
+        target_claude = tmp_path / ".claude"
+        (target_claude / "hooks" / "test.sh").unlink()
+        (target_claude / "commands" / "TEST.md").write_text("# TEST COMMAND")
+
+        result = verify_manifest(target_claude, manifest)
+
+        assert result.missing == ["hooks/test.sh"]
+        assert result.mismatched == ["commands/TEST.md (hash)"]
+
+    def test_copy_with_stale_manifest_fails_verification(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that copy_claude_folder uses the manifest for verification."""
+        manifest = build_manifest(mock_claude_dir)
+        (mock_claude_dir / "settings.json").write_text("{}")
+
+        assert copy_claude_folder(mock_claude_dir, tmp_path, manifest=manifest) is False
+
+
+class TestFileCopier:
+    """test FileCopier copy strategies and fallback."""
+
+    @pytest.fixture
+    def source_file(self, tmp_path: Path) -> Path:
+        """create an executable source file."""
+        src = tmp_path / "hook.sh"
+        src.write_text("#!/bin/bash\necho test")
+        src.chmod(0o755)
+        return src
+
+    def test_unknown_strategy_raises(self) -> None:
+        """test that an unknown strategy name is rejected."""
+        with pytest.raises(ValueError, match="unknown copy strategy"):
+            FileCopier("teleport")
+
+    @pytest.mark.parametrize("strategy", ["auto", "copy_file_range", "reflink", "copy"])
+    def test_every_strategy_produces_identical_file(
+        self, source_file: Path, tmp_path: Path, strategy: str
+    ) -> None:
+        """test that each strategy (or its fallback) copies content and mode."""
+        dst = tmp_path / "copied.sh"
+        copier = FileCopier(strategy)
+
+        used = copier.copy(source_file, dst)
+
+        assert dst.read_bytes() == source_file.read_bytes()
+        assert dst.stat().st_mode == source_file.stat().st_mode
+        assert copier.used == {used: 1}
+
+    def test_hardlink_shares_inode(self, source_file: Path, tmp_path: Path) -> None:
+        """test that hardlink mode links instead of copying."""
+        dst = tmp_path / "linked.sh"
+
+        assert FileCopier("hardlink").copy(source_file, dst) == "hardlink"
+        assert dst.stat().st_ino == source_file.stat().st_ino
+
+    def test_unsupported_strategy_is_disabled_after_first_failure(
+        self, source_file: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """test fallback to plain copy when reflink is unsupported."""
+        import claude_setup
+
+        calls = []
+
+        def no_reflink(src: Path, dst: Path) -> None:
+            calls.append(src)
+            dst.write_bytes(b"partial")
+            raise OSError(errno.EOPNOTSUPP, "not supported")
+
+        monkeypatch.setitem(claude_setup._COPY_FUNCS, "reflink", no_reflink)
+        copier = FileCopier("reflink")
+
+        for i in range(3):
+            assert copier.copy(source_file, tmp_path / f"copy-{i}.sh") == "copy"
+
+        assert len(calls) == 1
+        assert copier.summary == "copy"
+        assert (tmp_path / "copy-0.sh").read_bytes() == source_file.read_bytes()
+
+    def test_real_errors_are_not_swallowed(self, tmp_path: Path) -> None:
+        """test that a missing source raises instead of falling back."""
+        with pytest.raises(FileNotFoundError):
+            FileCopier().copy(tmp_path / "missing", tmp_path / "dst")
+
+
+class TestSourceSnapshot:
+    """test snapshot_source() and snapshot reuse across deploys."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory with two skills."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands/testing", "skills/alpha", "skills/beta", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        (claude_dir / "commands" / "testing" / "TEST.md").write_text("# test")
+        (claude_dir / "commands" / "HELP.md").write_text("# help")
+        (claude_dir / "skills" / "alpha" / "SKILL.md").write_text("# alpha")
+        (claude_dir / "hooks" / "test.sh").write_text("#!/bin/bash\necho test")
+        return claude_dir
+
+    def test_source_trees_implement_every_abstract_method(self) -> None:
+        """test that only complete SourceTree subclasses can be built."""
+        import claude_setup
+
+        with pytest.raises(TypeError):
+            SourceTree()  # type: ignore[abstract]
+        for subclass in (
+            claude_setup.DirSnapshot, claude_setup.PackSnapshot, claude_setup.ProfileView
+        ):
+            assert not subclass.__abstractmethods__, subclass.__name__
+
+    def test_snapshot_lists_tree_parents_first(self, mock_claude_dir: Path) -> None:
+        """test that directories come before their children."""
+        with snapshot_source(mock_claude_dir) as tree:
+            dirs = [entry.path for entry in tree.dirs]
+            files = {entry.path: entry.size for entry in tree.files}
+
+        assert dirs.index("commands") < dirs.index("commands/testing")
+        assert files["commands/testing/TEST.md"] == len("# test")
+        assert len(files) == 5
+
+    def test_summary_counts(self, mock_claude_dir: Path) -> None:
+        """test the counts shown in the gui come from the snapshot."""
+        with snapshot_source(mock_claude_dir) as tree:
+            assert tree.summary() == {"commands": 2, "skills": 2, "hooks": 1, "files": 5}
+            assert tree.skill_names() == ["alpha", "beta"]
+
+    def test_one_snapshot_drives_many_copies(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test reusing a snapshot for copy and verification of several targets."""
+        with snapshot_source(mock_claude_dir) as tree:
+            for name in ("one", "two"):
+                target = tmp_path / name
+                target.mkdir()
+                assert copy_claude_folder(tree, target) is True
+                assert verify_snapshot(target / ".claude", tree).ok
+
+    def test_verify_snapshot_reports_problems(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that missing files and size changes are reported."""
+        copy_claude_folder(mock_claude_dir, tmp_path)
+        (tmp_path / ".claude" / "commands" / "HELP.md").unlink()
+        (tmp_path / ".claude" / "settings.json").write_text("{}")
+
+        with snapshot_source(mock_claude_dir) as tree:
+            result = verify_snapshot(tmp_path / ".claude", tree)
+
+        assert result.missing == ["commands/HELP.md"]
+        assert result.mismatched == ["settings.json (size)"]
+
+    def test_copy_of_incomplete_source_fails_verification(self, tmp_path: Path) -> None:
+        """test that a source without the required entries is rejected."""
+        source = tmp_path / "incomplete" / ".claude"
+        (source / "commands").mkdir(parents=True)
+        target = tmp_path / "target"
+        target.mkdir()
+
+        assert copy_claude_folder(source, target) is False
+
+
+class TestPack:
+    """test deploying from a single compressed pack."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory for testing."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands/testing", "skills/empty-skill", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        (claude_dir / "commands" / "testing" / "TEST.md").write_text("# test\n" * 100)
+        (claude_dir / "hooks" / "test.sh").write_text("#!/bin/bash\necho test")
+        (claude_dir / "hooks" / "test.sh").chmod(0o755)
+        return claude_dir
+
+    @pytest.fixture
+    def pack(self, mock_claude_dir: Path, tmp_path: Path) -> Path:
+        """pack the mock .claude/ directory."""
+        pack = tmp_path / "claude-pack.zip"
+        assert pack_claude_folder(mock_claude_dir, pack) == 3
+        return pack
+
+    def test_copy_from_pack_matches_source(
+        self, mock_claude_dir: Path, pack: Path, tmp_path: Path
+    ) -> None:
+        """test that a pack deploy verifies against the directory manifest."""
+        target = tmp_path / "target"
+        target.mkdir()
+
+        assert copy_claude_folder(pack, target, manifest=build_manifest(mock_claude_dir))
+        assert (target / ".claude" / "skills" / "empty-skill").is_dir()
+        assert (target / ".claude" / "hooks" / "test.sh").stat().st_mode & 0o111
+
+    def test_manifest_from_pack_equals_manifest_from_dir(
+        self, mock_claude_dir: Path, pack: Path
+    ) -> None:
+        """test that the pack holds exactly the source content."""
+        assert build_manifest(pack).digest == build_manifest(mock_claude_dir).digest
+
+    def test_sync_from_pack_skips_unchanged_and_compares_content(
+        self, pack: Path, tmp_path: Path
+    ) -> None:
+        """test incremental sync with a pack source."""
+        sync_claude_folder(pack, tmp_path)
+        settings = tmp_path / ".claude" / "settings.json"
+
+        assert sync_claude_folder(pack, tmp_path).changed is False
+
+        settings.write_text('{"test": 1.0}')  # same size, new mtime
+        summary = sync_claude_folder(pack, tmp_path)
+
+        assert summary.updated == ["settings.json"]
+        assert settings.read_text() == '{"test": true}'
+
+    def test_pack_mtimes_are_exact_and_foreign_zips_compare_content(
+        self, mock_claude_dir: Path, pack: Path, tmp_path: Path
+    ) -> None:
+        """test that same-size edits within one zip timestamp tick are still synced."""
+        target = tmp_path / "target"
+        sync_claude_folder(pack, target)
+        source_file = mock_claude_dir / "settings.json"
+        mtime_ns = source_file.stat().st_mtime_ns
+        source_file.write_text('{"test": 1.0}')  # same size
+        os.utime(source_file, ns=(mtime_ns + 1_000_000, mtime_ns + 1_000_000))
+        pack_claude_folder(mock_claude_dir, pack)
+
+        with snapshot_source(pack) as tree:
+            assert tree.exact_mtimes
+            entry = next(e for e in tree.files if e.path == "settings.json")
+            assert entry.mtime_ns == mtime_ns + 1_000_000
+        assert sync_claude_folder(pack, target).updated == ["settings.json"]
+
+        # a zip from another tool only has the local-time, 2-second timestamp
+        foreign = tmp_path / "foreign.zip"
+        with zipfile.ZipFile(foreign, "w") as zf:
+            for path in sorted(mock_claude_dir.rglob("*")):
+                zf.write(path, path.relative_to(mock_claude_dir).as_posix())
+        (target / ".claude" / "settings.json").write_text('{"test": 2.0}')
+        os.utime(target / ".claude" / "settings.json", ns=(mtime_ns, mtime_ns))
+        with snapshot_source(foreign) as tree:
+            assert not tree.exact_mtimes
+            assert sync_claude_folder(tree, target).updated == ["settings.json"]
+
+    def test_bundle_cache_extracts_once_per_build(
+        self, mock_claude_dir: Path, pack: Path, isolated_state_dir: Path
+    ) -> None:
+        """test that the pack is extracted once, reused, and re-extracted if edited."""
+        manifest = build_manifest(mock_claude_dir, version="1.0.0")
+        stale = isolated_state_dir / "bundle" / "0.9.0-old"
+
+        cached = cached_bundle(pack, manifest)
+        assert cached is not None and cached.parent.name.startswith("1.0.0-")
+        assert verify_manifest(cached, manifest).ok
+        stale.mkdir(parents=True)
+
+        hook = cached / "hooks" / "test.sh"
+        hook.write_text("edited")
+        assert cached_bundle(pack, manifest) == cached
+        assert hook.read_text() == "#!/bin/bash\necho test"
+        assert not stale.exists()
+
+        inode = hook.stat().st_ino
+        assert cached_bundle(pack, manifest) == cached
+        assert hook.stat().st_ino == inode
+
+    def test_rejects_unsafe_paths(self, tmp_path: Path) -> None:
+        """test that a pack cannot write outside the target."""
+        evil = tmp_path / "evil.zip"
+        with zipfile.ZipFile(evil, "w") as zf:
+            zf.writestr("../escape.txt", "nope")
+
+        with pytest.raises(ValueError, match="unsafe path"):
+            copy_claude_folder(evil, tmp_path)
+
+
+class TestBatchDeploy:
+    """test deploy_many() and the headless deploy command."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory for testing."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands", "skills", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        return claude_dir
+
+    def test_deploys_to_many_targets_in_order(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that results come back in target order with per-target status."""
+        targets = [tmp_path / f"repo-{i}" for i in range(6)]
+        targets.append(tmp_path / "missing" / "repo")
+        (targets[0] / ".claude").mkdir(parents=True)
+
+        results = deploy_many(mock_claude_dir, targets, jobs=4)
+
+        assert [r.target for r in results] == [str(t) for t in targets]
+        assert results[0].status == "exists"
+        assert all(r.ok for r in results[1:6])
+        assert results[6].status == "invalid"
+        assert results[1].strategy in ("reflink", "copy_file_range", "copy")
+        assert (targets[3] / ".claude" / "settings.json").exists()
+
+    def test_concurrent_targets_copy_serially_by_default(
+        self, mock_claude_dir: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """test that copy pools nest only when --copy-jobs asks for it."""
+        import claude_setup
+
+        seen: list[int | None] = []
+        real_deploy = claude_setup.deploy_to_target
+
+        def recording_deploy(*args):
+            seen.append(args[8])
+            return real_deploy(*args)
+
+        monkeypatch.setattr(claude_setup, "deploy_to_target", recording_deploy)
+        targets = [tmp_path / f"repo-{i}" for i in range(3)]
+        for target in targets:
+            target.mkdir()
+
+        deploy_many(mock_claude_dir, targets, jobs=4, overwrite=True)
+        deploy_many(mock_claude_dir, targets[:1], jobs=4, overwrite=True)
+        deploy_many(mock_claude_dir, targets, jobs=1, overwrite=True)
+        deploy_many(mock_claude_dir, targets[:2], jobs=4, overwrite=True, copy_jobs=8)
+
+        assert seen == [1, 1, 1, None, None, None, None, 8, 8]
+
+    def test_cli_writes_json_summary(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test deploy command with a targets file and json output."""
+        targets_file = tmp_path / "repos.txt"
+        targets_file.write_text(
+            f"# fleet\n{tmp_path / 'a'}\n\n{tmp_path / 'b'}\n"
+        )
+        summary_file = tmp_path / "summary.json"
+
+        exit_code = run_deploy_cli([
+            "--source", str(mock_claude_dir),
+            "--targets-file", str(targets_file),
+            "--jobs", "2",
+            "--json", str(summary_file),
+        ])
+
+        summary = json.loads(summary_file.read_text())
+        assert exit_code == 0
+        assert summary["total"] == 2
+        assert summary["counts"] == {"ok": 2}
+
+    @pytest.mark.parametrize(
+        ("option", "content"),
+        [
+            ("--vars-file", "[1, 2]"),
+            ("--vars-file", '{"a": 1}'),
+            ("--vars-file", '{"*": {"name": ["x"]}}'),
+            ("--vars-file", "{not json"),
+            ("--manifest", '{"files": 1}'),
+            ("--manifest", "[]"),
+            ("--manifest", "{not json"),
+            ("--manifest", None),
+        ],
+    )
+    def test_cli_rejects_bad_input_files(
+        self,
+        mock_claude_dir: Path,
+        tmp_path: Path,
+        capsys: pytest.CaptureFixture[str],
+        option: str,
+        content: str | None,
+    ) -> None:
+        """test that malformed or missing input files exit 2 with one error line."""
+        path = tmp_path / "input.json"
+        if content is not None:
+            path.write_text(content)
+
+        exit_code = run_deploy_cli([
+            "--source", str(mock_claude_dir), option, str(path), str(tmp_path / "repo"),
+        ])
+
+        assert exit_code == 2
+        [line] = capsys.readouterr().err.splitlines()
+        assert line.startswith(f"error: cannot read {path}")
+        assert not (tmp_path / "repo" / ".claude").exists()
+
+
+class TestTracing:
+    """test per-phase trace output."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory for testing."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands", "skills", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        (claude_dir / "commands" / "A.md").write_text("a" * 100)
+        return claude_dir
+
+    def test_json_lines_record_each_phase(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that a deploy writes validate, copy, swap and verify phases."""
+        trace = tmp_path / "trace.jsonl"
+        start_trace(trace)
+        try:
+            results = deploy_many(mock_claude_dir, [tmp_path / "repo"], jobs=1)
+        finally:
+            stop_trace()
+
+        events = [json.loads(line) for line in trace.read_text().splitlines()]
+        by_name = {event["name"]: event for event in events}
+        assert results[0].ok
+        assert {"scan", "validate", "copy", "swap", "verify", "deploy"} <= set(by_name)
+        assert by_name["copy"]["files"] == 2
+        assert by_name["copy"]["bytes"] == 114
+        assert by_name["copy"]["hotspots"][0]["path"] in ("commands/A.md", "settings.json")
+        assert by_name["deploy"]["status"] == "ok"
+
+    def test_chrome_trace_and_cli_phase_totals(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test --profile with a .json path writes a chrome trace."""
+        trace = tmp_path / "trace.json"
+        summary_file = tmp_path / "summary.json"
+
+        exit_code = run_deploy_cli([
+            str(tmp_path / "a"),
+            "--source", str(mock_claude_dir),
+            "--json", str(summary_file),
+            "--profile", str(trace),
+        ])
+
+        events = json.loads(trace.read_text())["traceEvents"]
+        summary = json.loads(summary_file.read_text())
+        assert exit_code == 0
+        assert any(e["ph"] == "X" and e["name"] == "copy" for e in events)
+        assert summary["phases"]["deploy"]["count"] == 1
+
+    def test_phase_without_tracer_is_inert(self) -> None:
+        """test that trace_phase still counts when tracing is off."""
+        with trace_phase("copy") as phase:
+            phase.add("x", 10, phase.clock())
+        assert not phase.enabled
+        assert (phase.files, phase.bytes, phase.hotspots) == (1, 10, [])
+
+    def test_startup_report_only_when_requested(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """test that startup milestones are written only with $CLAUDE_SETUP_STARTUP."""
+        monkeypatch.setattr("claude_setup._startup_marks", {})
+        monkeypatch.delenv("CLAUDE_SETUP_STARTUP", raising=False)
+        mark_startup("main")
+        assert not write_startup_report()
+
+        report = tmp_path / "startup.json"
+        monkeypatch.setenv("CLAUDE_SETUP_STARTUP", str(report))
+        mark_startup("main")
+        mark_startup("shown")
+        mark_startup("main")
+        assert write_startup_report()
+
+        marks = json.loads(report.read_text())["marks"]
+        assert list(marks) == ["main", "shown"] and marks["main"] <= marks["shown"]
+
+
+class TestPreflight:
+    """test batch preflight of many targets."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory for testing."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands", "skills", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        return claude_dir
+
+    def fake_statvfs(self, monkeypatch: pytest.MonkeyPatch, **fields: int) -> None:
+        """make os.statvfs report the given fields on top of the real ones."""
+        real_statvfs = os.statvfs
+
+        def statvfs(path: object) -> object:
+            real = real_statvfs(path)
+            values = {name: getattr(real, name) for name in dir(real) if name.startswith("f_")}
+            values.update(fields)
+            return type("statvfs_result", (), values)()
+
+        monkeypatch.setattr(os, "statvfs", statvfs)
+
+    def test_verdicts_in_target_order_without_probing(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test ok, new and invalid targets on a local filesystem."""
+        (tmp_path / "file.txt").write_text("x")
+        targets = [tmp_path, tmp_path / "new", tmp_path / "x" / "y", tmp_path / "file.txt"]
+
+        results = preflight_many(targets, mock_claude_dir, jobs=4)
+
+        assert [r.verdict for r in results] == ["ok", "ok", "invalid", "invalid"]
+        assert results[0].required_bytes > 0
+        assert not any(r.probed for r in results)
+        assert not list(tmp_path.glob(".write_test*"))
+
+    def test_reports_full_and_read_only_filesystems(
+        self, mock_claude_dir: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """test free-space and read-only checks from statvfs."""
+        self.fake_statvfs(monkeypatch, f_bavail=0)
+        assert preflight_many([tmp_path], mock_claude_dir)[0].verdict == "no-space"
+
+        self.fake_statvfs(monkeypatch, f_flag=os.ST_RDONLY)
+        assert preflight_many([tmp_path], mock_claude_dir)[0].verdict == "read-only"
+
+    def test_probes_only_network_filesystems(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """test that the probe file is used where permission bits can't be trusted."""
+        import claude_setup
+
+        monkeypatch.setattr(claude_setup, "filesystem_type", lambda path: "nfs4")
+
+        assert preflight_many([tmp_path])[0].probed
+        assert not preflight_many([tmp_path], probe="never")[0].probed
+
+    def test_mount_table_expires(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """test that a cached mount table is reused briefly, then read again."""
+        import claude_setup
+
+        fake = (("/", "fakefs"),)
+        monkeypatch.setattr(claude_setup, "_mounts", (time.monotonic(), fake))
+        assert claude_setup.filesystem_type(Path("/")) == "fakefs"
+
+        stale = time.monotonic() - claude_setup.MOUNT_TABLE_TTL - 1
+        monkeypatch.setattr(claude_setup, "_mounts", (stale, fake))
+        assert claude_setup._mount_table() is not fake
+        assert claude_setup._mounts[0] > stale
+
+    def test_single_target_validation_always_probes(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """test that validate_target_dir trusts the probe file, not os.access."""
+        import claude_setup
+
+        monkeypatch.setattr(claude_setup, "filesystem_type", lambda path: "ext4")
+        monkeypatch.setattr(claude_setup, "_probe_writable", lambda directory: "probe failed")
+
+        assert preflight_many([tmp_path])[0].ok
+        is_valid, message = validate_target_dir(tmp_path)
+        assert not is_valid and "probe failed" in message
+
+
+class TestWatch:
+    """test watch mode state and incremental sync."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory for testing."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands", "skills", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        (claude_dir / "commands" / "A.md").write_text("a")
+        (claude_dir / "commands" / "B.md").write_text("b")
+        return claude_dir
+
+    def test_restart_applies_only_changed_paths(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test full first sync, then a resumed sync touching only the diff."""
+        state_file = tmp_path / "state.json"
+        target = tmp_path / "repo"
+        target.mkdir()
+        state = WatchState(state_file)
+        state.register([target])
+
+        assert [r.status for r in sync_watched(mock_claude_dir, state)] == ["full"]
+        unchanged_inode = (target / ".claude" / "settings.json").stat().st_ino
+
+        (mock_claude_dir / "commands" / "A.md").write_text("changed")
+        (mock_claude_dir / "commands" / "B.md").unlink()
+
+        # a fresh state object, as after a restart
+        results = sync_watched(mock_claude_dir, WatchState(state_file))
+
+        assert (results[0].status, results[0].updated, results[0].deleted) == ("ok", 1, 1)
+        assert (target / ".claude" / "commands" / "A.md").read_text() == "changed"
+        assert not (target / ".claude" / "commands" / "B.md").exists()
+        assert (target / ".claude" / "settings.json").stat().st_ino == unchanged_inode
+        assert sync_watched(mock_claude_dir, WatchState(state_file))[0].status == "current"
+
+    def test_watch_loop_syncs_new_files(self, mock_claude_dir: Path, tmp_path: Path) -> None:
+        """test that a running watch picks up a file added to the source."""
+        target = tmp_path / "repo"
+        target.mkdir()
+        state = WatchState(tmp_path / "state.json")
+        state.register([target])
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=watch_source,
+            args=(mock_claude_dir, state),
+            kwargs={"debounce": 0.05, "poll_interval": 0.05, "stop": stop},
+        )
+        thread.start()
+        try:
+            deadline = time.monotonic() + 10
+            while not (target / ".claude").exists() and time.monotonic() < deadline:
+                time.sleep(0.02)
+            (mock_claude_dir / "commands" / "NEW.md").write_text("new")
+            new_file = target / ".claude" / "commands" / "NEW.md"
+            while not new_file.exists() and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert new_file.read_text() == "new"
+        finally:
+            stop.set()
+            thread.join()
+
+
+class TestTemplates:
+    """test per-target rendering of templated files."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory with templated files."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands", "skills", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text(
+            '{"project": "{{ project_name }}", "root": "{{ project_dir | json }}"}'
+        )
+        (claude_dir / "CLAUDE.md").write_text(
+            "# {{project_name}}\n\n" + "x" * 200_000 + "\npython {{ python_version }}\n"
+        )
+        (claude_dir / "commands" / "CI.md").write_text("${{ github.sha }} {{ team }}")
+        return claude_dir
+
+    def test_renders_per_target_variables(self, mock_claude_dir: Path, tmp_path: Path) -> None:
+        """test that each target gets its own values and non-templates stay verbatim."""
+        targets = [tmp_path / "alpha", tmp_path / "beta"]
+        for target in targets:
+            target.mkdir()
+        (targets[1] / ".python-version").write_text("3.11.4\n")
+        templates = TemplateStage(per_target={str(targets[1]): {"project_name": "Beta"}})
+
+        results = deploy_many(mock_claude_dir, targets, jobs=2, templates=templates)
+
+        assert all(r.ok for r in results), results
+        settings = json.loads((targets[0] / ".claude" / "settings.json").read_text())
+        assert settings == {"project": "alpha", "root": str(targets[0].resolve())}
+        claude_md = (targets[1] / ".claude" / "CLAUDE.md").read_text()
+        assert claude_md.startswith("# Beta\n") and claude_md.endswith("python 3.11.4\n")
+        assert (targets[0] / ".claude" / "commands" / "CI.md").read_text() == (
+            "${{ github.sha }} {{ team }}"
+        )
+        # parsed once, shared by both targets
+        assert len(templates._compiled) == 2
+
+    def test_missing_variable_fails_target(self, mock_claude_dir: Path, tmp_path: Path) -> None:
+        """test that an undefined variable fails the deploy and leaves no .claude/."""
+        target = tmp_path / "repo"
+        target.mkdir()
+        templates = TemplateStage(patterns=["commands/*.md"])
+
+        results = deploy_many(mock_claude_dir, [target], templates=templates)
+
+        assert results[0].status == "failed"
+        assert "team" in results[0].message
+        assert not (target / ".claude").exists()
+
+    def test_sync_skips_identical_rendered_files(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that re-syncing rendered files only rewrites them when output changes."""
+        target = tmp_path / "repo"
+        target.mkdir()
+        templates = TemplateStage()
+        copy_claude_folder(mock_claude_dir, target, templates=templates)
+        inode = (target / ".claude" / "CLAUDE.md").stat().st_ino
+
+        summary = sync_claude_folder(mock_claude_dir, target, templates=templates)
+        assert summary.updated == []
+        assert (target / ".claude" / "CLAUDE.md").stat().st_ino == inode
+
+        summary = sync_claude_folder(
+            mock_claude_dir, target, templates=TemplateStage({"project_name": "renamed"})
+        )
+        assert sorted(summary.updated) == ["CLAUDE.md", "settings.json"]
+
+    def test_cli_vars(self, mock_claude_dir: Path, tmp_path: Path) -> None:
+        """test --var and --vars-file on the deploy command."""
+        target = tmp_path / "repo"
+        vars_file = tmp_path / "vars.json"
+        vars_file.write_text(json.dumps({"*": {"team": "core"}, str(target): {"team": "web"}}))
+
+        exit_code = run_deploy_cli([
+            str(target), "--source", str(mock_claude_dir),
+            "--vars-file", str(vars_file), "--var", "project_name=shop",
+            "--template", "settings.json", "--template", "commands/*.md",
+            "--json", str(tmp_path / "summary.json"),
+        ])
+
+        assert exit_code == 0
+        claude = target / ".claude"
+        assert json.loads((claude / "settings.json").read_text())["project"] == "shop"
+        assert (claude / "commands" / "CI.md").read_text() == "${{ github.sha }} web"
+        assert (claude / "CLAUDE.md").read_text().startswith("# {{project_name}}")
+
+
+class TestDiscover:
+    """test project discovery and classification."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory for testing."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands", "skills", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        (claude_dir / "commands" / "A.md").write_text("a")
+        return claude_dir
+
+    @pytest.fixture
+    def src(self, tmp_path: Path) -> Path:
+        """a ~/src-like tree with projects, pruned dirs and nested markers."""
+        src = tmp_path / "src"
+        (src / "api" / ".git").mkdir(parents=True)
+        (src / "web").mkdir()
+        (src / "web" / "package.json").touch()
+        (src / "group" / "lib").mkdir(parents=True)
+        (src / "group" / "lib" / "pyproject.toml").touch()
+        # projects inside pruned or project directories are not reported
+        (src / "web" / "node_modules" / "dep").mkdir(parents=True)
+        (src / "web" / "node_modules" / "dep" / "package.json").touch()
+        (src / ".venv" / "pkg").mkdir(parents=True)
+        (src / ".venv" / "pkg" / "setup.py").touch()
+        (src / "notes").mkdir()
+        return src
+
+    def test_classifies_projects(self, mock_claude_dir: Path, src: Path) -> None:
+        """test missing, current and stale classification."""
+        copy_claude_folder(mock_claude_dir, src / "api")
+        copy_claude_folder(mock_claude_dir, src / "web")
+        (src / "web" / ".claude" / "commands" / "A.md").write_text("edited")
+        (src / "web" / ".claude" / "commands" / "OLD.md").write_text("old")
+
+        results = discover_projects([src], mock_claude_dir, cache=DiscoveryCache(None))
+
+        assert [(Path(r.path).relative_to(src).as_posix(), r.status) for r in results] == [
+            ("api", "current"), ("group/lib", "missing"), ("web", "stale"),
+        ]
+        assert results[2].message == "1 changed, 1 extra"
+
+    def test_rescan_only_lists_changed_dirs(
+        self, src: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """test that unchanged directories are served from the cache."""
+        cache_file = tmp_path / "cache.json"
+        first = find_projects([src], cache=DiscoveryCache(cache_file))
+
+        listed: list[str] = []
+        real_scandir = os.scandir
+
+        def counting_scandir(path: str) -> object:
+            listed.append(os.fspath(path))
+            return real_scandir(path)
+
+        monkeypatch.setattr(os, "scandir", counting_scandir)
+        assert find_projects([src], cache=DiscoveryCache(cache_file)) == first
+        assert listed == []
+
+        (src / "group" / "new").mkdir()
+        (src / "group" / "new" / "go.mod").touch()
+        projects = find_projects([src], cache=DiscoveryCache(cache_file))
+        assert src.resolve() / "group" / "new" in projects
+        assert sorted(listed) == [str(src.resolve() / "group"), str(src.resolve() / "group" / "new")]
+
+
+class TestRegistry:
+    """test the deployment registry, status and doctor."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory for testing."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands", "skills", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        (claude_dir / "commands" / "A.md").write_text("a")
+        return claude_dir
+
+    def test_deploy_records_and_status_finds_outdated(
+        self, mock_claude_dir: Path, tmp_path: Path, capsys: pytest.CaptureFixture
+    ) -> None:
+        """test that cli deploys are recorded and a source change marks them outdated."""
+        targets = [tmp_path / "a", tmp_path / "b"]
+        run_deploy_cli([*map(str, targets), "--source", str(mock_claude_dir),
+                        "--json", str(tmp_path / "summary.json")])
+
+        with DeployRegistry() as registry:
+            entries = registry.entries()
+        assert [entry.target for entry in entries] == [str(t.resolve()) for t in targets]
+        assert entries[0].files == 2
+
+        (mock_claude_dir / "commands" / "A.md").write_text("new")
+        run_deploy_cli([str(targets[0]), "--sync", "--source", str(mock_claude_dir),
+                        "--json", str(tmp_path / "summary.json")])
+        capsys.readouterr()
+
+        assert run_status_cli(["--source", str(mock_claude_dir), "--outdated", "--paths"]) == 0
+        assert capsys.readouterr().out.split() == [str(targets[1].resolve())]
+
+    def test_doctor_verifies_only_changed_targets(
+        self, mock_claude_dir: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """test doctor statuses and that untouched targets are not re-verified."""
+        import claude_setup
+
+        targets = [tmp_path / name for name in ("intact", "touched", "edited", "gone")]
+        with DeployRegistry() as registry:
+            deploy_many(mock_claude_dir, targets, registry=registry)
+            settings = targets[1] / ".claude" / "settings.json"
+            os.utime(settings, ns=(0, 0))
+            (targets[2] / ".claude" / "commands" / "A.md").write_text("x")
+            shutil.rmtree(targets[3] / ".claude")
+
+            verified: list[str] = []
+            real_verify = claude_setup.verify_manifest
+
+            def counting_verify(target_claude: Path, *args: object, **kwargs: object) -> object:
+                verified.append(target_claude.parent.name)
+                return real_verify(target_claude, *args, **kwargs)
+
+            monkeypatch.setattr(claude_setup, "verify_manifest", counting_verify)
+            results = doctor(registry, mock_claude_dir)
+            assert {Path(r.target).name: r.status for r in results} == {
+                "intact": "ok", "touched": "verified", "edited": "drifted", "gone": "missing",
+            }
+            assert sorted(verified) == ["edited", "touched"]
+
+            # the refreshed signature makes the touched target cheap again
+            verified.clear()
+            doctor(registry, mock_claude_dir)
+            assert verified == ["edited"]
+
+
+class TestInstallProfiles:
+    """test sparse installs selected by install profiles."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory with categories, skills and hooks."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for category in ("testing", "git-pr", "database"):
+            (claude_dir / "commands" / category).mkdir(parents=True)
+            (claude_dir / "commands" / category / "RUN.md").write_text(category)
+        for skill in ("pydev-feature", "project-audit"):
+            (claude_dir / "skills" / skill).mkdir(parents=True)
+            (claude_dir / "skills" / skill / "SKILL.md").write_text(skill)
+        (claude_dir / "hooks").mkdir()
+        (claude_dir / "hooks" / "format.sh").write_text("echo format")
+        (claude_dir / "hooks" / "unused.sh").write_text("echo unused")
+        (claude_dir / "hooks" / "lint.sh").write_text("echo lint")
+        # only format.sh is run by a hook; the other mentions must not match
+        (claude_dir / "settings.json").write_text(json.dumps({
+            "hooks": {"PostToolUse": [{"matcher": "Edit", "hooks": [
+                {"type": "command", "command": '"$CLAUDE_PROJECT_DIR"/.claude/hooks/format.sh'},
+                {"type": "command", "command": "bash .claude/hooks/lint.sh.bak"},
+            ]}]},
+            "notes": "hooks/unused.sh is kept for reference",
+        }))
+        return claude_dir
+
+    def test_profile_installs_only_selected_files(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test selection, referenced hooks, manifest subset and sync pruning."""
+        target = tmp_path / "repo"
+        target.mkdir()
+        copy_claude_folder(mock_claude_dir, target)
+        profile = InstallProfile("testing", commands=["testing", "git-pr/RUN"], skills=[], hooks=[])
+
+        with snapshot_source(mock_claude_dir) as tree:
+            view, manifest = select_profile(tree, build_manifest(tree), profile)
+            results = deploy_many(view, [target], sync=True, manifest=manifest)
+
+        assert results[0].ok, results[0].message
+        deployed = sorted(
+            p.relative_to(target / ".claude").as_posix()
+            for p in (target / ".claude").rglob("*") if p.is_file()
+        )
+        assert deployed == [
+            "commands/git-pr/RUN.md", "commands/testing/RUN.md",
+            "hooks/format.sh", "settings.json",
+        ]
+        assert sorted(entry.path for entry in manifest.entries) == deployed
+        assert (target / ".claude" / "skills").is_dir()
+
+    def test_discover_classifies_against_recorded_profile(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that a profile deploy is current, not stale, for discover."""
+        root = tmp_path / "src"
+        (root / "repo" / ".git").mkdir(parents=True)
+        profile = InstallProfile("testing", commands=["testing"], skills=[], hooks=[])
+
+        with snapshot_source(mock_claude_dir) as tree, DeployRegistry() as registry:
+            view, manifest = select_profile(tree, None, profile)
+            [result] = deploy_many(view, [root / "repo"], registry=registry, manifest=manifest)
+            assert result.ok, result.message
+            recorded = {entry.target: entry.profile for entry in registry.entries()}
+
+        cache = DiscoveryCache(None)
+        [unaware] = discover_projects([root], mock_claude_dir, cache=cache)
+        [aware] = discover_projects(
+            [root], mock_claude_dir, cache=cache,
+            recorded=recorded, profiles={"testing": profile},
+        )
+        assert unaware.status == "stale"
+        assert aware.status == "current", aware.message
+
+    def test_broken_settings_json_is_a_profile_error(
+        self, mock_claude_dir: Path
+    ) -> None:
+        """test that hook references can't be resolved from invalid json."""
+        (mock_claude_dir / "settings.json").write_text("{not json")
+        with snapshot_source(mock_claude_dir) as tree:
+            with pytest.raises(ProfileError, match="settings.json"):
+                select_profile(tree, None, InstallProfile("none", hooks=[]))
+
+    def test_profile_names_must_exist(self, mock_claude_dir: Path) -> None:
+        """test that a profile naming something the source lacks is rejected."""
+        profile = InstallProfile("broken", commands=["testing", "missing-category"])
+        with snapshot_source(mock_claude_dir) as tree:
+            with pytest.raises(ProfileError, match="commands/missing-category"):
+                select_profile(tree, None, profile)
+            view, _ = select_profile(tree, None, InstallProfile("globs", skills=["pydev-*"]))
+            assert view.has_required()
+            assert "skills/project-audit/SKILL.md" not in {e.path for e in view.files}
+
+    def test_bundled_profiles_match_command_sources(self) -> None:
+        """test that bundled profiles only name command categories that exist."""
+        categories = {
+            p.name for p in (Path(__file__).parent.parent / "docs" / "claude-commands").iterdir()
+            if p.is_dir()
+        }
+        profiles = load_profiles()
+        assert "full" in profiles and len(profiles) > 1
+        for profile in profiles.values():
+            assert set(profile.commands or []) <= categories, profile.name
+
+    @pytest.mark.parametrize(
+        "build_file", ["claude-setup.spec", "scripts/build-linux.sh", "scripts/build-windows.bat"]
+    )
+    def test_every_build_bundles_profiles(self, build_file: str) -> None:
+        """test that each frozen build ships the profiles next to the pack and manifest."""
+        text = (Path(__file__).parent.parent / build_file).read_text()
+        # the spec refers to the pack and manifest through claude_setup's constants
+        for data, constant in (
+            (PACK_NAME, "PACK_NAME"), (MANIFEST_NAME, "MANIFEST_NAME"), (PROFILES_NAME, None)
+        ):
+            assert data in text or (constant and constant in text), f"{build_file} lacks {data}"
+
+
+class TestObjectStore:
+    """test the shared content-addressed object store."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory with an executable hook."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands", "skills", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        (claude_dir / "commands" / "A.md").write_text("a")
+        (claude_dir / "hooks" / "run.sh").write_text("#!/bin/sh\n")
+        (claude_dir / "hooks" / "run.sh").chmod(0o755)
+        return claude_dir
+
+    def test_targets_share_objects_and_sync_relinks(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that every target links the same inode and a change gets a new object."""
+        store = ObjectStore(tmp_path / "store")
+        targets = [tmp_path / "a", tmp_path / "b"]
+
+        results = deploy_many(mock_claude_dir, targets, store=store)
+
+        assert [r.strategy for r in results] == ["store-hardlink", "store-hardlink"]
+        hooks = [t / ".claude" / "hooks" / "run.sh" for t in targets]
+        assert hooks[0].stat().st_ino == hooks[1].stat().st_ino
+        assert hooks[0].stat().st_mode & 0o777 == 0o755
+        assert store.stats().objects == 3 and store.stats().links == 6
+
+        (mock_claude_dir / "commands" / "A.md").write_text("b")
+        summary = sync_claude_folder(mock_claude_dir, targets[0], store=ObjectStore(store.root))
+
+        assert summary.updated == ["commands/A.md"]
+        assert (targets[1] / ".claude" / "commands" / "A.md").read_text() == "a"
+        assert store.stats().objects == 4
+
+    def test_verify_and_gc(self, mock_claude_dir: Path, tmp_path: Path) -> None:
+        """test that edits through a hardlink are found and unlinked objects collected."""
+        store = ObjectStore(tmp_path / "store")
+        copy_claude_folder(mock_claude_dir, tmp_path / "a", store=store)
+        copy_claude_folder(mock_claude_dir, tmp_path / "b", store=store)
+
+        with open(tmp_path / "a" / ".claude" / "settings.json", "a") as f:
+            f.write(" ")
+        problems = store.verify()
+        assert [problem for problem in problems.values()] == [
+            "content changed (2 linked target files)"
+        ]
+
+        assert store.gc(grace=0) == (0, 0)
+        shutil.rmtree(tmp_path / "a")
+        shutil.rmtree(tmp_path / "b")
+        assert store.gc(grace=3600) == (0, 0)
+        removed, freed = store.gc(grace=0)
+        assert removed == 3 and store.stats().objects == 0
+
+
+class TestGenerations:
+    """test rollback generations kept by overwrite and sync."""
+
+    @pytest.fixture
+    def mock_claude_dir(self, tmp_path: Path) -> Path:
+        """create mock .claude/ directory for testing."""
+        claude_dir = tmp_path / "source" / ".claude"
+        for sub in ("commands", "skills", "hooks"):
+            (claude_dir / sub).mkdir(parents=True)
+        (claude_dir / "settings.json").write_text('{"test": true}')
+        (claude_dir / "commands" / "A.md").write_text("a1")
+        return claude_dir
+
+    def test_overwrite_keeps_generation_and_rollback_restores_it(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that the replaced tree is kept, independent of the live one and restorable."""
+        target = tmp_path / "target"
+        policy = GenerationPolicy(keep=2)
+        copy_claude_folder(mock_claude_dir, target)
+        (mock_claude_dir / "commands" / "A.md").write_text("a2")
+        copy_claude_folder(mock_claude_dir, target, overwrite=True, generations=policy)
+
+        [kept] = list_generations(target)
+        assert kept.reason == "overwrite"
+        assert (kept.path / "commands" / "A.md").read_text() == "a1"
+        live_settings = target / ".claude" / "settings.json"
+        assert (kept.path / "settings.json").stat().st_ino != live_settings.stat().st_ino
+        live_settings.write_text('{"edited": true}')
+        assert (kept.path / "settings.json").read_text() == '{"test": true}'
+        assert (target / ".claude.gen" / ".gitignore").read_text().splitlines()[-1] == "*"
+
+        restored, replaced = rollback(target, policy=policy)
+        assert restored.name == kept.name
+        assert (target / ".claude" / "commands" / "A.md").read_text() == "a1"
+        assert replaced is not None
+        assert [g.name for g in list_generations(target)] == [replaced.name]
+
+        for _ in range(3):
+            copy_claude_folder(mock_claude_dir, target, overwrite=True, generations=policy)
+        assert len(list_generations(target)) == 2
+        assert prune_generations(target, GenerationPolicy(keep=1, max_age=-1))
+        assert list_generations(target) == []
+
+    def test_sync_snapshots_only_when_something_changes(
+        self, mock_claude_dir: Path, tmp_path: Path
+    ) -> None:
+        """test that a no-op sync keeps nothing and a real one keeps the old files."""
+        target = tmp_path / "target"
+        policy = GenerationPolicy()
+        sync_claude_folder(mock_claude_dir, target, generations=policy)
+        sync_claude_folder(mock_claude_dir, target, generations=policy)
+        assert list_generations(target) == []
+
+        (mock_claude_dir / "commands" / "A.md").unlink()
+        (mock_claude_dir / "commands" / "B.md").write_text("b")
+        sync_claude_folder(mock_claude_dir, target, generations=policy)
+
+        [kept] = list_generations(target)
+        assert kept.reason == "sync"
+        assert sorted(p.name for p in (kept.path / "commands").iterdir()) == ["A.md"]
+        assert sorted(p.name for p in (target / ".claude" / "commands").iterdir()) == ["B.md"]
+        live_settings = target / ".claude" / "settings.json"
+        assert (kept.path / "settings.json").stat().st_ino != live_settings.stat().st_ino
+
+
 class TestIntegration:
     """integration tests for full workflow."""
 
@@ -0,0 +1,103 @@
+"""
+tests for scripts/convert-icon.py.
+
+tests the resampling pyramid, the icns writer and the png cache.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+
+class TestConvertIcon:
+    """test icon rendering and the icns writer (scripts/convert-icon.py)."""
+
+    @pytest.fixture
+    def converter(self, monkeypatch: pytest.MonkeyPatch) -> object:
+        """load the hyphenated icon script as a module."""
+        import importlib.util
+
+        pytest.importorskip("PIL")
+        path = Path(__file__).parent.parent / "scripts" / "convert-icon.py"
+        spec = importlib.util.spec_from_file_location("convert_icon", path)
+        module = importlib.util.module_from_spec(spec)  # type: ignore[arg-type]
+        monkeypatch.setitem(sys.modules, "convert_icon", module)
+        spec.loader.exec_module(module)  # type: ignore[union-attr]
+        return module
+
+    def test_icns_holds_every_size_and_cache_is_reused(
+        self, converter: object, tmp_path: Path
+    ) -> None:
+        """test that the icns written without iconutil reads back in pillow."""
+        from PIL import Image, IcnsImagePlugin
+
+        source = tmp_path / "icon.png"
+        Image.new("RGBA", (300, 300), (200, 40, 40, 255)).save(source)
+        cache = tmp_path / "cache"
+        digest = converter.file_hash(source)  # type: ignore[attr-defined]
+        sizes = converter.icns_sizes()  # type: ignore[attr-defined]
+
+        rendered = converter.render_sizes(  # type: ignore[attr-defined]
+            source, digest, sizes, cache, jobs=1, quality=True
+        )
+        assert converter.create_icns(rendered, tmp_path / "icon.icns")  # type: ignore[attr-defined]
+
+        with open(tmp_path / "icon.icns", "rb") as f:
+            icns = IcnsImagePlugin.IcnsFile(f)
+            assert (16, 16, 1) in icns.itersizes()
+            assert icns.getimage((512, 512, 2)).size == (1024, 1024)
+        assert not list(tmp_path.glob("*.iconset"))
+
+        cached = converter.render_sizes(  # type: ignore[attr-defined]
+            source, digest, sizes, cache, jobs=1, quality=True
+        )
+        assert cached.levels == {}
+
+    def test_cache_is_keyed_by_render_settings_and_pruned(
+        self, converter: object, tmp_path: Path
+    ) -> None:
+        """test that other quality settings re-render and prune drops old entries."""
+        from PIL import Image
+
+        source = tmp_path / "icon.png"
+        Image.new("RGBA", (64, 64), (40, 200, 40, 255)).save(source)
+        cache = tmp_path / "cache"
+        digest = converter.file_hash(source)  # type: ignore[attr-defined]
+        sizes = [16, 32]
+
+        checked = converter.render_sizes(  # type: ignore[attr-defined]
+            source, digest, sizes, cache, jobs=1, quality=True
+        )
+        default = converter.render_sizes(  # type: ignore[attr-defined]
+            source, digest, sizes, cache, jobs=1
+        )
+        assert set(default.levels) == {16, 32}
+        assert checked.path(16) != default.path(16)
+
+        stale = cache / "0123456789abcdef0123-v1-64-35db-16.png"
+        stale.write_bytes(b"")
+        assert default.prune() == 3
+        assert sorted(p.name for p in cache.glob("*.png")) == sorted(
+            default.path(size).name for size in sizes
+        )
+
+    def test_small_levels_meet_min_psnr_by_default(
+        self, converter: object, tmp_path: Path
+    ) -> None:
+        """test that small levels are checked even without --check-quality."""
+        from PIL import Image
+
+        # the app icon's 16px level drifts to ~30 db when built from the 32px one
+        source = Path(__file__).parent.parent / "assets" / "DEV-WF-ICON.png"
+        rendered = converter.render_sizes(  # type: ignore[attr-defined]
+            source, converter.file_hash(source),  # type: ignore[attr-defined]
+            converter.icns_sizes() + converter.PNG_SIZES,  # type: ignore[attr-defined]
+            tmp_path / "cache", jobs=1,
+        )
+        with Image.open(source) as img:
+            direct = img.convert("RGBA").resize((16, 16), Image.Resampling.LANCZOS)
+        score = converter.psnr(rendered.levels[16], direct)  # type: ignore[attr-defined]
+        assert score >= converter.MIN_PSNR  # type: ignore[attr-defined]